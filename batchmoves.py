@@ -0,0 +1,123 @@
+import numpy as np
+
+from rankcount import RANK_CNT, TWO, JOKER, STRAIGHT_TYPE
+
+COMBO_KIND = ('four with two single', 'four with two pair', 'three with pair', 'three with single')
+
+
+def to_count_matrix(hands):
+    """
+    将多手牌转化为(N × 14)的点数计数矩阵
+    :param hands: 点数计数向量或者PokerNode的序列
+    """
+    rows = [hand.get_rank_cnt() if hasattr(hand, 'get_rank_cnt') else hand for hand in hands]
+    return np.array(rows, dtype=np.int8).reshape(-1, RANK_CNT)
+
+
+def straight_runs(counts, gap, width, maxStart):
+    """
+    计算每手牌从每个起点开始、间隔为gap、每个点数至少width张的最长顺子
+    用累加和得到每个窗口中满足条件的点数个数，窗口全部满足时顺子可以延伸到该长度
+    :return: (N × maxStart)的最长点数个数
+    """
+    ok = (counts[:, :TWO] >= width).astype(np.int16)
+    runs = np.zeros((counts.shape[0], maxStart), dtype=np.int16)
+    for start in range(maxStart):
+        column = ok[:, start:TWO:gap]
+        prefix = np.cumsum(column, axis=1)
+        full = prefix == np.arange(1, column.shape[1] + 1) # 前缀中的点数全部满足条件
+        runs[:, start] = full.sum(axis=1)
+    return runs
+
+
+def batch_moves(counts):
+    """
+    批量计算多手牌的出牌情况，规则与rankcount.legal_moves一致
+    :param counts: (N × 14)的点数计数矩阵
+    :return:       字典，包括
+                   'single'、'pair'、'three'、'four'、'bomb'：(N × 14)的布尔矩阵，表示该点数能否单独出
+                   'rocket'：(N,)的布尔数组
+                   每种顺子类型：(N,)的出牌数量，以及'runs'中每个起点的最长点数个数
+                   每种带牌类型：(N,)的出牌数量
+                   'moveCnt'：(N,)的总出牌数量
+    """
+    counts = np.asarray(counts, dtype=np.int8)
+    result = {}
+    single = counts >= 1
+    pair = (counts == 2) | (counts == 3) # 四张的点数不拆成对子
+    three = counts >= 3
+    four = counts == 4
+    bomb = counts > 4 # 多副牌时超过四张的炸弹
+    rocket = pair[:, JOKER] # 两副牌有三张王时也可以出火箭，与对子相同不拆四张
+    pairNoJoker = pair.copy()
+    pairNoJoker[:, JOKER] = False
+    result['single'] = single
+    result['pair'] = pair & ~np.eye(RANK_CNT, dtype=bool)[JOKER]
+    result['three'] = three
+    result['four'] = four
+    result['bomb'] = bomb
+    result['rocket'] = rocket
+
+    singleCnt = single.sum(axis=1).astype(np.int64)
+    pairCnt = pair.sum(axis=1).astype(np.int64)
+    pairNoJokerCnt = pairNoJoker.sum(axis=1).astype(np.int64)
+    threeCnt = three.sum(axis=1).astype(np.int64)
+    fourCnt = four.sum(axis=1).astype(np.int64)
+    bombCnt = bomb.sum(axis=1).astype(np.int64)
+    # 三张的点数本身也可能在对子中，需要去掉
+    threeInPair = (three & pairNoJoker).sum(axis=1)
+    result['three with single'] = threeCnt * (singleCnt - 1)
+    result['three with pair'] = threeCnt * pairNoJokerCnt - threeInPair
+    otherSingle = singleCnt - 1
+    result['four with two single'] = fourCnt * (otherSingle * (otherSingle - 1) // 2 + pairCnt)
+    result['four with two pair'] = fourCnt * (pairNoJokerCnt * (pairNoJokerCnt - 1) // 2)
+
+    runs = {}
+    moveCnt = singleCnt + pairCnt + threeCnt + fourCnt + bombCnt
+    for kind in COMBO_KIND:
+        moveCnt = moveCnt + result[kind]
+    for kind, gap, width, minLen, maxStart in STRAIGHT_TYPE:
+        runs[kind] = straight_runs(counts, gap, width, maxStart)
+        result[kind] = np.clip(runs[kind].astype(np.int64) - minLen + 1, 0, None).sum(axis=1)
+        moveCnt = moveCnt + result[kind]
+    result['runs'] = runs
+    result['moveCnt'] = moveCnt
+    return result
+
+
+def batch_largest_cnt(counts):
+    """
+    批量计算PokerNode.search_step中的largestCnt，即不含顺子时一次最多能出的张数
+    """
+    counts = np.asarray(counts, dtype=np.int8)
+    size = counts.shape[0]
+    present = counts >= 1
+    pairNoJoker = (counts == 2) | (counts == 3)
+    pairNoJoker[:, JOKER] = False
+    pairCnt = ((counts == 2) | (counts == 3)).sum(axis=1)
+    pairNoJokerCnt = pairNoJoker.sum(axis=1)
+    presentCnt = present.sum(axis=1)
+    hasFour = (counts == 4).any(axis=1)
+    three = counts >= 3
+
+    largest = counts.max(axis=1).astype(np.int64) # 单张、对子、三张、四张和炸弹都是整个点数一起出
+    hasThree = three.any(axis=1)
+    largest = np.where(hasThree & (presentCnt >= 2), np.maximum(largest, 4), largest)
+    # 三带二：存在三张的点数，以及另一个不是王的对子
+    withPair = ((three & ~pairNoJoker).any(axis=1) & (pairNoJokerCnt >= 1)) | (hasThree & (pairNoJokerCnt >= 2))
+    largest = np.where(withPair, np.maximum(largest, 5), largest)
+    largest = np.where(hasFour & ((presentCnt >= 3) | (pairCnt >= 1)), np.maximum(largest, 6), largest)
+    largest = np.where(hasFour & (pairNoJokerCnt >= 2), np.maximum(largest, 8), largest)
+    return largest.reshape(size)
+
+
+def batch_path_cost(counts, steps):
+    """
+    批量计算与PokerNode.pathCost相同的启发值：已出步数 + ceil(剩余张数 / largestCnt)
+    :param counts: (N × 14)的点数计数矩阵
+    :param steps:  (N,)的已出步数，也可以是整数
+    """
+    counts = np.asarray(counts, dtype=np.int8)
+    total = counts.sum(axis=1, dtype=np.int64)
+    largest = batch_largest_cnt(counts)
+    return np.asarray(steps) + np.where(total > 0, -(-total // np.maximum(largest, 1)), 0)
@@ -0,0 +1,129 @@
+import sys
+from array import array
+
+from poker import Poker, Deck
+
+RANK_CNT = 14 # 点数的数量，与rankcount.RANK_CNT相同
+MASK_BYTES = 8 # 一副牌的手牌掩码占一个64位整数，多副牌时使用mask_bytes
+_pokers = [None] + [Poker(order) for order in range(1, Deck.SIZE * Deck.MAX_DECKS + 1)] # 扑克牌顺序对应的Poker
+
+
+def rank_of(order):
+    """
+    得到扑克牌顺序对应的点数下标，0~12依次为3~2，13为JOKER，多副牌时与第几副牌无关
+    """
+    return min((Deck.split(order)[1] - 1) // 4, RANK_CNT - 1)
+
+
+# 每个点数的所有牌对应的掩码，扑克牌顺序为order的牌对应第order - 1位
+RANK_MASKS = tuple(sum(1 << (order - 1) for order in range(1, Deck.SIZE * Deck.MAX_DECKS + 1) if rank_of(order) == rank)
+                   for rank in range(RANK_CNT))
+
+
+def mask_bytes(deck=None):
+    """
+    一手牌的掩码需要的字节数，一副牌为8字节，两副牌为14字节
+    """
+    return MASK_BYTES if deck is None or deck.decks == 1 else (deck.size + 7) // 8
+
+
+def from_orders(orders):
+    """
+    将扑克牌顺序序列转化为掩码
+    """
+    mask = 0
+    for order in orders:
+        mask |= 1 << (order - 1)
+    return mask
+
+
+def to_orders(mask):
+    """
+    将掩码转化为从小到大的扑克牌顺序列表，只遍历为1的位
+    """
+    orders = []
+    while mask:
+        low = mask & -mask
+        orders.append(low.bit_length())
+        mask ^= low
+    return orders
+
+
+def from_pokers(pokerLst):
+    """
+    将Poker的序列转化为掩码
+    :param pokerLst: Poker的序列，也可以是单张Poker
+    """
+    if isinstance(pokerLst, Poker):
+        return 1 << (Poker.get_order(pokerLst) - 1)
+    mask = 0
+    for poker in pokerLst:
+        mask |= 1 << (Poker.get_order(poker) - 1)
+    return mask
+
+
+def to_pokers(mask):
+    """
+    将掩码转化为按点数排好序的Poker列表，可以直接作为PokerNode的手牌
+    同一张牌总是对应同一个Poker对象
+    """
+    pokerLst = [_pokers[order] for order in to_orders(mask)]
+    pokerLst.sort()
+    return pokerLst
+
+
+def count(mask):
+    """
+    掩码中的张数
+    """
+    return mask.bit_count()
+
+
+def rank_counts(mask):
+    """
+    得到掩码的点数计数向量，与PokerNode.get_rank_cnt相同
+    :return: 长度为14的元组
+    """
+    return tuple((mask & rankMask).bit_count() for rankMask in RANK_MASKS)
+
+
+def is_subset(play, hand):
+    """
+    判断出的牌是否都在手牌中
+    """
+    return play & ~hand == 0
+
+
+def remove(hand, play):
+    """
+    得到出牌之后的手牌掩码
+    """
+    if not is_subset(play, hand):
+        raise ValueError("Play is not in hand")
+    return hand & ~play
+
+
+def pack(masks, size=MASK_BYTES):
+    """
+    将掩码序列打包成bytes，用于批量存储或者在进程之间传递
+    :param size: 每个掩码的字节数，一副牌为8，参见mask_bytes
+    """
+    if size == MASK_BYTES:
+        masks = array('Q', masks)
+        if sys.byteorder == 'big': # 统一为小端序
+            masks.byteswap()
+        return masks.tobytes()
+    return b''.join(mask.to_bytes(size, 'little') for mask in masks)
+
+
+def unpack(data, size=MASK_BYTES):
+    """
+    将pack得到的bytes还原为掩码列表
+    """
+    if size == MASK_BYTES:
+        masks = array('Q')
+        masks.frombytes(data)
+        if sys.byteorder == 'big':
+            masks.byteswap()
+        return masks.tolist()
+    return [int.from_bytes(data[pos: pos + size], 'little') for pos in range(0, len(data), size)]
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+from cardmask import from_orders, rank_counts
+from poker import PokerPlayer
+from process import Process
+from rankcount import RANK_CNT
+from simulator import deal_game, parse_cnt
+
+MANIFEST = 'manifest.json'
+VERSION = 1
+FIELDS = ('counts', 'steps', 'score', 'firstMove') # 每个分片中的数组
+
+
+def label_hand(seed, pokerCnt, withScore=True):
+    """
+    用种子发一手牌并求解，每次求解都使用新的PokerPlayer，互不影响
+    :param seed:        发牌用的随机种子
+    :param pokerCnt:    手牌数量，可以是整数或者(最少, 最多)的元组
+    :param withScore:   是否求解第二问，不求解时score为NaN
+    :return:            (点数计数向量, 最少步数, 最高score, 最少步数解中第一步的点数计数向量)
+    """
+    orders = deal_game(seed, pokerCnt, 0)[0]
+    player = PokerPlayer()
+    player.deal_order(orders)
+    player.solve_without_score()
+    firstMove = list(rank_counts(from_orders(Process.to_order(player.path[0])))) if player.path else [0] * RANK_CNT
+    score = float('nan')
+    if withScore:
+        scorer = PokerPlayer()
+        scorer.deal_order(orders)
+        scorer.solve_with_score(scorer.initNode, 0, 0)
+        score = scorer.score
+    return list(rank_counts(from_orders(orders))), player.step, score, firstMove
+
+
+def _label_chunk(args):
+    """
+    进程池中执行的任务，求解一批连续种子的手牌
+    """
+    seedStart, seedEnd, pokerCnt, withScore = args
+    return [label_hand(seed, pokerCnt, withScore) for seed in range(seedStart, seedEnd)]
+
+
+class ShardWriter:
+    """
+    将求解结果按固定行数写入分片文件，每个分片写完后再更新清单
+    分片和清单都先写入临时文件再改名，中断时不会留下不完整的文件
+    再次运行时从最后一个完整的分片之后继续
+    """
+    def __init__(self, directory, hands, pokerCnt, seed=0, shardSize=1 << 16, withScore=True):
+        """
+        :param directory:   输出文件夹
+        :param hands:       总手牌数量，第i手牌使用seed + i作为种子
+        :param pokerCnt:    每手牌的数量，可以是整数或者(最少, 最多)的元组
+        :param seed:        第一手牌的种子
+        :param shardSize:   每个分片的行数，最后一个分片可能不满
+        :param withScore:   是否求解第二问
+        """
+        self.directory = directory
+        self.config = {'version': VERSION, 'hands': hands, 'pokerCnt': pokerCnt, 'seed': seed,
+                       'shardSize': shardSize, 'withScore': withScore}
+        self.shards = [] # 已经完成的分片，每项为{'file', 'start', 'rows'}
+        os.makedirs(directory, exist_ok=True)
+        manifest = self.load_manifest(directory)
+        if manifest:
+            config = {key: manifest[key] for key in self.config}
+            if isinstance(config['pokerCnt'], list):
+                config['pokerCnt'] = tuple(config['pokerCnt'])
+            if config != self.config:
+                raise ValueError("Existing manifest was generated with different parameters: %s" % config)
+            # 只保留文件仍然存在的连续分片
+            for shard in manifest['shards']:
+                if not os.path.exists(os.path.join(directory, shard['file'])):
+                    break
+                self.shards.append(shard)
+
+    @staticmethod
+    def load_manifest(directory):
+        path = os.path.join(directory, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def done(self):
+        """
+        已经完成的行数
+        """
+        return sum(shard['rows'] for shard in self.shards)
+
+    def write(self, rows):
+        """
+        写入一个分片
+        :param rows: label_hand的结果列表
+        """
+        idx = len(self.shards)
+        name = 'shard-%05d.npz' % idx
+        counts, steps, score, firstMove = zip(*rows)
+        arrays = {'counts': np.array(counts, dtype=np.int8), 'steps': np.array(steps, dtype=np.int16),
+                  'score': np.array(score, dtype=np.float32), 'firstMove': np.array(firstMove, dtype=np.int8)}
+        tmpPath = os.path.join(self.directory, name + '.tmp')
+        with open(tmpPath, 'wb') as f: # 传入文件对象，np.savez不会再添加.npz后缀
+            np.savez(f, **arrays)
+        os.replace(tmpPath, os.path.join(self.directory, name))
+        self.shards.append({'file': name, 'start': self.config['seed'] + self.done(), 'rows': len(rows)})
+        self.__save_manifest()
+
+    def __save_manifest(self):
+        manifest = dict(self.config, fields=FIELDS, rows=self.done(), shards=self.shards)
+        tmpPath = os.path.join(self.directory, MANIFEST + '.tmp')
+        with open(tmpPath, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmpPath, os.path.join(self.directory, MANIFEST))
+
+
+def generate(directory, hands, pokerCnt, seed=0, shardSize=1 << 16, withScore=True, workers=None,
+             chunkSize=256, callback=None):
+    """
+    在进程池中生成训练数据，可以中断后重新运行继续生成
+    同时进行的任务数有上限，内存中最多保存一个分片和这些任务的结果
+    :param directory:   输出文件夹
+    :param hands:       总手牌数量
+    :param pokerCnt:    每手牌的数量，可以是整数或者(最少, 最多)的元组
+    :param seed:        第一手牌的种子
+    :param shardSize:   每个分片的行数
+    :param withScore:   是否求解第二问
+    :param workers:     进程数量，None为CPU核数，0或1时在当前进程中执行
+    :param chunkSize:   每个任务包含的手牌数量
+    :param callback:    每写完一个分片以(已完成的行数, 总行数)为参数调用
+    :return:            ShardWriter
+    """
+    writer = ShardWriter(directory, hands, pokerCnt, seed, shardSize, withScore)
+    start = seed + writer.done()
+    end = seed + hands
+    tasks = []
+    for shardStart in range(start, end, shardSize): # 任务不跨越分片，每个分片的结果按顺序拼接
+        shardEnd = min(shardStart + shardSize, end)
+        tasks.extend((chunkStart, min(chunkStart + chunkSize, shardEnd), pokerCnt, withScore)
+                     for chunkStart in range(shardStart, shardEnd, chunkSize))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pool = Pool(workers) if workers > 1 else None
+    window = deque() # 正在进行的任务，按种子顺序取回结果
+    rows = []
+    try:
+        for task in tasks:
+            window.append(pool.apply_async(_label_chunk, (task,)) if pool else task)
+            if len(window) < 2 * workers:
+                continue
+            rows = _collect(writer, window.popleft(), rows, end, callback)
+        while window:
+            rows = _collect(writer, window.popleft(), rows, end, callback)
+    finally:
+        if pool:
+            pool.terminate()
+    return writer
+
+
+def _collect(writer, pending, rows, end, callback):
+    """
+    取回一个任务的结果，凑满一个分片或者到达最后一手牌时写入
+    """
+    rows.extend(pending.get() if hasattr(pending, 'get') else _label_chunk(pending))
+    shardSize = writer.config['shardSize']
+    if len(rows) == shardSize or writer.config['seed'] + writer.done() + len(rows) == end:
+        writer.write(rows)
+        if callback:
+            callback(writer.done(), writer.config['hands'])
+        return []
+    return rows
+
+
+def load(directory, fields=FIELDS):
+    """
+    逐个分片读取生成的数据
+    :return: 生成器，每个分片产生一个以字段名为键的数组字典
+    """
+    manifest = ShardWriter.load_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError("No manifest in %s" % directory)
+    for shard in manifest['shards']:
+        with np.load(os.path.join(directory, shard['file'])) as data:
+            yield {field: data[field] for field in fields}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成训练数据：(点数计数向量, 最少步数, 最高score, 第一步)')
+    parser.add_argument('directory', help='输出文件夹，已有清单时从最后一个完整的分片之后继续')
+    parser.add_argument('-n', '--hands', type=int, default=1000000, help='总手牌数量')
+    parser.add_argument('--cards', type=parse_cnt, default=17, help='每手牌的数量，如17或10-20')
+    parser.add_argument('--seed', type=int, default=0, help='第一手牌的种子')
+    parser.add_argument('--shard', type=int, default=1 << 16, help='每个分片的行数')
+    parser.add_argument('--no-score', action='store_true', help='不求解第二问，score为NaN')
+    parser.add_argument('--workers', type=int, default=None, help='进程数量')
+    parser.add_argument('--chunk', type=int, default=256, help='每个任务包含的手牌数量')
+    args = parser.parse_args()
+    begin = time.perf_counter()
+
+    def report(done, total):
+        cost = time.perf_counter() - begin
+        print('%d/%d rows, %.2fs' % (done, total, cost))
+
+    result = generate(args.directory, args.hands, args.cards, args.seed, args.shard, not args.no_score,
+                      args.workers, args.chunk, report)
+    print('%d rows in %d shards' % (result.done(), len(result.shards)))
@@ -0,0 +1,318 @@
+import argparse
+import random
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import rankcount
+from rankcount import Move, RANK_CNT, TWO, JOKER, STRAIGHT_TYPE
+from poker import PokerPlayer, Deck
+
+HIGH_CNT = 4 # 张数达到该值的点数有不单调的出牌限制：四张不拆对子，超过四张只能整体作为炸弹
+
+
+def anchored_children(counts):
+    """
+    得到锚定规则下需要考虑的出牌之后的计数向量，相同的结果只保留一个
+    锚定规则：设r为最小的点数，H为张数不少于4的点数，只需考虑包含r或者H中点数的出牌
+    证明：任取一个最优出牌序列，若第一个包含r的出牌在当前就合法，把它提到最前面；
+    否则它用到的某个H中的点数之前被出过，把第一个用到H中点数的出牌提到最前面，
+    它之前的出牌不涉及H，其余点数的出牌限制都是张数的下限，所以它在当前合法。
+    被提前的出牌只会减少其他出牌时的张数，而其他出牌需要的张数都还在，
+    对子要求的两张或三张、四张要求的恰好四张、炸弹要求的整个点数也都不受影响，所以步数不变
+    :param counts: 点数计数向量
+    :return:       出牌之后的计数向量的集合
+    """
+    anchor = next(rank for rank in range(RANK_CNT) if counts[rank])
+    touched = [cnt >= HIGH_CNT for cnt in counts] # 包含这些点数的出牌需要考虑
+    touched[anchor] = True
+    hasHigh = any(cnt >= HIGH_CNT for cnt in counts)
+    children = set()
+
+    def play(*pairs):
+        child = list(counts)
+        for rank, cnt in pairs:
+            child[rank] -= cnt
+        children.add(tuple(child))
+
+    for kind, gap, width, minLen, maxStart in STRAIGHT_TYPE:
+        # 比锚点小的点数都没有牌，所以没有H时包含锚点的顺子一定从锚点开始
+        for start in (range(maxStart) if hasHigh else range(anchor, min(anchor + 1, maxStart))):
+            run = []
+            rank = start
+            hit = False
+            while rank < TWO and counts[rank] >= width:
+                run.append(rank)
+                hit = hit or touched[rank]
+                if hit and len(run) >= minLen:
+                    play(*((r, width) for r in run))
+                rank += gap
+
+    singleLst = [rank for rank in range(RANK_CNT) if counts[rank]]
+    pairLst = [rank for rank in range(RANK_CNT) if counts[rank] in (2, 3)]
+    threeLst = [rank for rank in range(RANK_CNT) if counts[rank] >= 3]
+    fourLst = [rank for rank in range(RANK_CNT) if counts[rank] == 4]
+
+    for four in fourLst: # 四张都属于H，带牌的组合都需要考虑
+        for idx, single in enumerate(singleLst):
+            if single == four:
+                continue
+            for single2 in singleLst[idx + 1:]:
+                if single2 != four:
+                    play((four, 4), (single, 1), (single2, 1))
+        for idx, pair in enumerate(pairLst):
+            if pair == four:
+                continue
+            play((four, 4), (pair, 2))
+            if pair == JOKER:
+                continue
+            for pair2 in pairLst[idx + 1:]:
+                if pair2 != four and pair2 != JOKER:
+                    play((four, 4), (pair, 2), (pair2, 2))
+        play((four, 4))
+    for idx, four in enumerate(fourLst): # 四带四
+        for four2 in fourLst[idx + 1:]:
+            play((four, 4), (four2, 4))
+    for three in threeLst:
+        for pair in pairLst:
+            if pair != three and pair != JOKER and (touched[three] or touched[pair]):
+                play((three, 3), (pair, 2))
+        for single in singleLst:
+            if single != three and (touched[three] or touched[single]):
+                play((three, 3), (single, 1))
+        if touched[three]:
+            play((three, 3))
+    for rank in singleLst:
+        if not touched[rank]:
+            continue
+        if counts[rank] > 4:
+            play((rank, counts[rank])) # 炸弹
+        if counts[rank] in (2, 3):
+            play((rank, 2))
+        play((rank, 1))
+    return children
+
+
+def _straight_table(width):
+    """
+    对每个宽度为width的顺子可用的点数掩码(张数不少于width的点数)，得到(最长的顺子的张数, 可以组成顺子的点数的掩码)
+    """
+    types = [(gap, minLen) for kind, gap, typeWidth, minLen, maxStart in STRAIGHT_TYPE if typeWidth == width]
+    table = []
+    for mask in range(1 << TWO):
+        longest = inStraight = 0
+        for gap, minLen in types:
+            run = mask
+            length = 0
+            while run: # 每次去掉每段中最高的一个点数，循环次数为最长的一段的长度
+                run &= run >> gap
+                length += 1
+            if length >= minLen:
+                longest = max(longest, length * width)
+                starts = mask
+                for idx in range(1, minLen):
+                    starts &= mask >> (idx * gap)
+                for idx in range(minLen):
+                    inStraight |= starts << (idx * gap)
+        table.append((longest, inStraight))
+    return table
+
+
+_straights = [None] + [_straight_table(width) for width in (1, 2, 3)] # 下标为顺子的宽度
+
+
+@lru_cache(maxsize=1 << 20)
+def lower_bound(counts):
+    """
+    最少步数的下界，取以下两者中较大的一个：
+    总张数除以最长的出牌可能的张数；
+    不能组成顺子的点数只能由非顺子的出牌包含，每次出牌只有一个主体，三张和四张分别可以带一组和两组牌，
+    所以至少需要这些点数的个数减去所有三张和四张能带的组数
+    """
+    total = 0
+    longest = 0
+    present = 0 # 有牌的点数的掩码
+    runs = [0, 0, 0, 0] # 张数不少于1、2、3的点数的掩码，2和王不能组成顺子
+    slots = 0 # 三张和四张能带的组数的上限
+    for rank, cnt in enumerate(counts):
+        if not cnt:
+            continue
+        total += cnt
+        if cnt > longest:
+            longest = cnt
+        present |= 1 << rank
+        if rank < TWO:
+            runs[1] |= 1 << rank
+            if cnt >= 2:
+                runs[2] |= 1 << rank
+                if cnt >= 3:
+                    runs[3] |= 1 << rank
+        if cnt >= 3:
+            slots += cnt // 3 + (cnt >= HIGH_CNT)
+    if not total:
+        return 0
+    if HIGH_CNT in counts:
+        longest = max(longest, 8) # 四带两对或者四带四
+    elif longest == 3:
+        longest = 5 # 三带对
+    inStraight = 0 # 可以组成顺子的点数的掩码
+    for width in (1, 2, 3):
+        length, ranks = _straights[width][runs[width]]
+        longest = max(longest, length)
+        inStraight |= ranks
+    return max(-(-total // longest), (present & ~inStraight).bit_count() - slots)
+
+
+def greedy_steps(counts):
+    """
+    每次选择下界最小的出牌，得到的步数作为最少步数的上界
+    """
+    steps = 0
+    while any(counts):
+        counts = min(anchored_children(counts), key=lambda child: (lower_bound(child), sum(child)))
+        steps += 1
+    return steps
+
+
+def four_with_four(counts):
+    """
+    rankcount.legal_moves之外A*还会考虑的四带四
+    """
+    fourLst = [rank for rank in range(RANK_CNT) if counts[rank] == 4]
+    return tuple(Move('four with four', rankcount._unit((fourLst[idx], 4), (four2, 4)), four2, 8)
+                 for idx in range(len(fourLst)) for four2 in fourLst[idx + 1:])
+
+
+class DPSolver:
+    """
+    第一问的另一种求解引擎：在点数计数向量上记忆化递归，得到精确的最少出牌步数
+    剩余手牌的子问题只与点数计数向量有关，数量远少于具体扑克牌的搜索空间
+    出牌集合与A*相同(PokerNode.possibleStep加上四带四)，用锚定规则减少需要考虑的出牌
+    A*只展开顺子和四带四，其余出牌由贪心完成，不保证最少步数，少数手牌DP比A*少一步
+    以贪心得到的步数作为初始上限做分支限界，lower_bound超过上限的子问题不再展开
+    一副牌二十四张以内时比A*快(100手二十四张约3.4秒，A*约4.3秒，不限界时约7.4秒)，
+    三十张以上或者两副牌时下界较松，仍比A*慢(两副牌100手二十四张约4.8秒，A*约2.8秒)，所以A*仍是默认的引擎
+    记忆表是有上限的LRU，在多次求解之间保留
+    """
+    def __init__(self, memoSize=1 << 20):
+        """
+        :param memoSize: 记忆表的最大条目数
+        """
+        self.memoSize = memoSize
+        self.memo = OrderedDict() # 计数向量到(最少步数或者它的下界, 是否为精确值)
+        self.nodes = 0 # 上一次求解实际展开的子问题数
+
+    def steps(self, counts):
+        """
+        得到计数向量的最少出牌步数
+        """
+        return self.__bounded(counts, greedy_steps(counts))
+
+    def __bounded(self, counts, limit):
+        """
+        有界的记忆化搜索，只展开下界不超过上限的子问题
+        :param limit: 步数上限
+        :return:      最少步数不超过limit时为最少步数，否则为大于limit的下界
+        """
+        if not any(counts):
+            return 0
+        entry = self.memo.get(counts)
+        if entry is not None:
+            self.memo.move_to_end(counts)
+            bound, exact = entry
+            if exact or bound > limit:
+                return bound
+        else:
+            bound = lower_bound(counts)
+            if bound > limit:
+                return bound
+        self.nodes += 1
+        best = limit + 1 # 在上限之内找到的最少步数
+        floor = None # 没有找到时，各个子问题的下界加1的最小值
+        for childBound, child in sorted((lower_bound(child), child) for child in anchored_children(counts)):
+            if childBound + 1 >= best: # 按下界排序，之后的子问题都不会更好
+                if floor is None or childBound + 1 < floor:
+                    floor = childBound + 1
+                break
+            value = self.__bounded(child, best - 2) + 1
+            if value < best:
+                best = value
+                if best <= bound: # 已经达到下界
+                    break
+            elif floor is None or value < floor:
+                floor = value
+        entry = (best, True) if best <= limit else (floor, False)
+        self.memo[counts] = entry
+        if len(self.memo) > self.memoSize:
+            self.memo.popitem(last=False)
+        return entry[0]
+
+    def solve(self, counts):
+        """
+        求解并还原一条最优的出牌序列
+        :return: (最少步数, Move的列表)
+        """
+        self.nodes = 0
+        total = self.steps(counts)
+        path = []
+        while any(counts):
+            target = total - len(path) - 1
+            move = next(move for move in rankcount.legal_moves(counts) + four_with_four(counts)
+                        if self.__bounded(rankcount.apply(counts, move), target) == target)
+            path.append(move)
+            counts = rankcount.apply(counts, move)
+        return total, path
+
+    def solve_player(self, player):
+        """
+        PokerPlayer.solve_without_score使用的接口，结果存入player.path和player.step
+        """
+        node = player.initNode
+        step, moves = self.solve(node.get_rank_cnt())
+        path = []
+        for move in moves:
+            action = rankcount.to_action(node, move)
+            path.append(action)
+            node = node.get_child(action)
+        player.path = path
+        player.step = step
+
+
+def verify(handLst, solver=None):
+    """
+    与A*比较最少步数，DP是精确的，DP步数更少说明A*没有找到最优解，更多说明DP有错误
+    :param handLst: 扑克牌顺序序列的列表
+    :return:        步数不同的(手牌, DP步数, A*步数)列表，以及两种引擎的总耗时
+    """
+    solver = solver or DPSolver()
+    mismatches = []
+    dpTime = aStarTime = 0.0
+    for orders in handLst:
+        player = PokerPlayer()
+        player.deal_order(orders)
+        begin = time.perf_counter()
+        player.solve_without_score()
+        aStarTime += time.perf_counter() - begin
+        begin = time.perf_counter()
+        step, moves = solver.solve(player.initNode.get_rank_cnt())
+        dpTime += time.perf_counter() - begin
+        if step != player.step:
+            mismatches.append((orders, step, player.step))
+    return mismatches, dpTime, aStarTime
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='比较记忆化DP与A*的最少步数和耗时')
+    parser.add_argument('-n', '--hands', type=int, default=100, help='手牌数量')
+    parser.add_argument('--cards', type=int, default=17, help='每手牌的数量')
+    parser.add_argument('--decks', type=int, default=1, help='牌的副数')
+    parser.add_argument('--seed', type=int, default=0, help='第一手牌的种子')
+    args = parser.parse_args()
+    hands = [random.Random(seed).sample(Deck(args.decks).orders(), args.cards)
+             for seed in range(args.seed, args.seed + args.hands)]
+    mismatchLst, dpCost, aStarCost = verify(hands)
+    for hand, dpStep, aStarStep in mismatchLst:
+        print('%s: %s dp %d astar %d' % ('dp fewer' if dpStep < aStarStep else 'DP MORE', hand, dpStep, aStarStep))
+    fewer = sum(1 for hand, dpStep, aStarStep in mismatchLst if dpStep < aStarStep)
+    print('%d hands, dp fewer %d, dp more %d, dp %.4fs, astar %.4fs'
+          % (len(hands), fewer, len(mismatchLst) - fewer, dpCost, aStarCost))
@@ -0,0 +1,279 @@
+import time
+
+import rankcount
+import zobrist
+from sharedtable import NO_MOVE
+
+WIN = 10000 # 必胜局面的分数，启发值的绝对值一定小于WIN
+EXACT, LOWER, UPPER = 0, 1, 2 # 置换表中分数的类型
+SOLVED_DEPTH = 1 << 10 # 必胜或必败的结果与搜索深度无关
+GUARD = sum(16 << (5 * rank) for rank in range(rankcount.RANK_CNT)) # 每个点数占5位时各自的最高位
+
+
+def pack(counts):
+    """
+    将计数向量压缩成整数，每个点数占5位，最高位留作借位检测，两副牌时每个点数最多8张
+    """
+    packed = 0
+    for rank, cnt in enumerate(counts):
+        packed |= cnt << (5 * rank)
+    return packed
+
+
+def is_subset(small, large):
+    """
+    判断压缩后的计数向量small是否每个点数都不超过large，相减时没有借位说明是子集
+    """
+    return ((large | GUARD) - small) & GUARD == GUARD
+
+
+class SearchTimeout(Exception):
+    """
+    单步搜索超时
+    """
+    pass
+
+
+class AlphaBetaEngine:
+    """
+    双方手牌都已知时的1v1决策引擎
+    在(自己的手牌, 对手的手牌, 桌上的牌)上进行迭代加深的alpha-beta搜索
+    使用置换表和出牌排序进行剪枝，每一步有时间上限，小的手牌可以精确求解
+    """
+    perfectInformation = True # 可以看到对手的手牌，PokerPlayer.gaming会先查询终局库
+
+    def __init__(self, timeLimit=1.0, maxDepth=128, tableSize=1 << 20, sharedTable=None):
+        """
+        :param timeLimit:   每一步的搜索时间上限(秒)
+        :param maxDepth:    迭代加深的最大深度
+        :param tableSize:   置换表的最大条目数，超过时淘汰剩余张数最多的一层中最早加入的条目
+        :param sharedTable: 多个进程共用的sharedtable.SharedTable，作为本地置换表之后的第二级，None表示不使用
+        """
+        self.timeLimit = timeLimit
+        self.maxDepth = maxDepth
+        self.tableSize = tableSize
+        self.sharedTable = sharedTable
+        # 置换表，按双方剩余的总张数分层，每层的键为局面的Zobrist键(参见zobrist.position_key)
+        # 值为(深度, 分数, 分数类型, 最佳出牌, 出牌方手牌, 对手手牌)，手牌用于回合之间的筛选
+        # 置换表在回合之间保留，作为下一回合的搜索树
+        self.table = {}
+        self.size = 0 # 置换表中的条目数
+        self.reused = 0 # 上一次决策开始时从之前的回合保留下来的条目数
+        self.nodes = 0 # 上一次决策搜索的节点数
+        self.depth = 0 # 上一次决策完成的搜索深度
+        self.solved = False # 上一次决策是否得到了精确的胜负
+        self.__deadline = 0
+
+    def decide(self, player, opponentAction):
+        """
+        PokerPlayer.gaming使用的接口
+        :param player:          当前的PokerPlayer，需要通过player.opponent得到对手的手牌
+        :param opponentAction:  对手出的牌，(出牌类型, 实际出的牌)，没有出牌时为None
+        :return:                (出牌类型, 实际出的牌)，不出时为None
+        """
+        last = rankcount.from_action(*opponentAction) if opponentAction else None
+        myCounts = player.curNode.get_rank_cnt()
+        oppCounts = player.opponent.curNode.get_rank_cnt()
+        self.promote(myCounts, oppCounts)
+        move = self.search(myCounts, oppCounts, last)
+        if move is None:
+            return None
+        return move.kind, rankcount.to_action(player.curNode, move)
+
+    def search(self, myCounts, oppCounts, last=None):
+        """
+        迭代加深搜索当前局面下的最佳出牌
+        :param myCounts:    自己的点数计数向量
+        :param oppCounts:   对手的点数计数向量
+        :param last:        需要压过的Move，自由出牌时为None
+        :return:            最佳的Move，不出时为None
+        """
+        self.nodes = 0
+        self.solved = False
+        self.__deadline = time.perf_counter() + self.timeLimit
+        total = sum(myCounts) + sum(oppCounts)
+        myKey = zobrist.count_key(myCounts)
+        oppKey = zobrist.count_key(oppCounts)
+        entry = self.__lookup(total, zobrist.position_key(myKey, oppKey, last), myCounts)
+        moves = self.__ordered_moves(myCounts, last, entry is not None, entry and entry[3])
+        best = moves[0]
+        if len(moves) == 1:
+            return best
+        for depth in range(1, self.maxDepth + 1):
+            try:
+                value, move = self.__root(myCounts, oppCounts, last, total, myKey, oppKey, depth, moves)
+            except SearchTimeout:
+                break
+            best = move
+            self.depth = depth
+            if abs(value) == WIN: # 启发值的绝对值小于WIN，所以得到了精确的胜负
+                self.solved = True
+                break
+            moves.remove(move) # 上一轮的最佳出牌在下一轮优先搜索
+            moves.insert(0, move)
+        return best
+
+    def __root(self, myCounts, oppCounts, last, total, myKey, oppKey, depth, moves):
+        alpha = -WIN - 1
+        bestMove = moves[0]
+        for move in moves:
+            value = -self.__negamax(*self.__next(myCounts, oppCounts, move, last, total, myKey, oppKey),
+                                    depth - 1, -WIN - 1, -alpha)
+            if value > alpha:
+                alpha = value
+                bestMove = move
+                if value == WIN:
+                    break
+        self.__store(total, zobrist.position_key(myKey, oppKey, last), SOLVED_DEPTH if abs(alpha) == WIN else depth,
+                     alpha, EXACT, bestMove, myCounts, oppCounts)
+        return alpha, bestMove
+
+    @staticmethod
+    def __next(myCounts, oppCounts, move, last, total, myKey, oppKey):
+        """
+        得到出牌之后轮到对手时的局面，出牌方手牌的键只更新出牌涉及的点数
+        """
+        if move is None: # 不出，对手自由出牌
+            return oppCounts, myCounts, None, total, oppKey, myKey
+        return (oppCounts, rankcount.apply(myCounts, move), move, total - move.length,
+                oppKey, zobrist.play_counts(myKey, myCounts, move.cards))
+
+    def __negamax(self, myCounts, oppCounts, last, total, myKey, oppKey, depth, alpha, beta):
+        """
+        以当前出牌的一方为视角的负极大值搜索
+        """
+        if not any(oppCounts): # 对手已经出完牌
+            return -WIN
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self.__deadline:
+            raise SearchTimeout()
+        key = zobrist.position_key(myKey, oppKey, last)
+        entry = self.__lookup(total, key, myCounts)
+        if entry:
+            if entry[0] >= depth:
+                if entry[2] == EXACT:
+                    return entry[1]
+                if entry[2] == LOWER and entry[1] >= beta:
+                    return entry[1]
+                if entry[2] == UPPER and entry[1] <= alpha:
+                    return entry[1]
+        if depth <= 0:
+            return self.evaluate(myCounts, oppCounts)
+
+        originAlpha = alpha
+        bestValue = -WIN - 1
+        bestMove = None
+        for move in self.__ordered_moves(myCounts, last, entry is not None, entry and entry[3]):
+            value = -self.__negamax(*self.__next(myCounts, oppCounts, move, last, total, myKey, oppKey),
+                                    depth - 1, -beta, -alpha)
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+        if bestValue <= originAlpha:
+            flag = UPPER
+        elif bestValue >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.__store(total, key, SOLVED_DEPTH if abs(bestValue) == WIN else depth, bestValue, flag, bestMove,
+                     myCounts, oppCounts)
+        return bestValue
+
+    def __lookup(self, total, key, myCounts):
+        """
+        先查本地置换表，没有命中时再查共享置换表，共享表中的出牌编号还原为Move
+        """
+        level = self.table.get(total)
+        entry = level.get(key) if level else None
+        if entry is None and self.sharedTable is not None:
+            shared = self.sharedTable.probe(key)
+            if shared:
+                depth, value, flag, code = shared
+                moves = rankcount.legal_moves(myCounts)
+                if code == NO_MOVE or code < len(moves):
+                    entry = (depth, value, flag, None if code == NO_MOVE else moves[code])
+        return entry
+
+    def __store(self, total, key, depth, value, flag, move, myCounts, oppCounts):
+        """
+        写入置换表，表满时淘汰剩余张数最多的一层中最早加入的条目
+        对局只会向张数少的方向进行，所以张数多的局面最先变得不可达
+        """
+        level = self.table.get(total)
+        entry = level.get(key) if level else None
+        if entry and entry[0] > depth:
+            return
+        if entry is None:
+            if self.size >= self.tableSize and self.table:
+                # 先淘汰再建立新的一层，表中不会出现空的层
+                highest = max(self.table)
+                oldest = self.table[highest]
+                del oldest[next(iter(oldest))]
+                if not oldest:
+                    del self.table[highest]
+                self.size -= 1
+            self.size += 1
+            level = self.table.get(total)
+            if level is None:
+                level = self.table[total] = {}
+        level[key] = (depth, value, flag, move, myCounts, oppCounts)
+        if self.sharedTable is not None:
+            self.sharedTable.store(key, depth, value, flag,
+                                   NO_MOVE if move is None else rankcount.move_index(myCounts)[move])
+
+    def promote(self, myCounts, oppCounts):
+        """
+        回合开始时把当前局面对应的子树保留下来，释放其余的部分
+        之后可能到达的局面中，双方的手牌一定分别是当前手牌的子集，其余的条目都不会再用到
+        """
+        total = sum(myCounts) + sum(oppCounts)
+        for levelTotal in [levelTotal for levelTotal in self.table if levelTotal > total]:
+            self.size -= len(self.table.pop(levelTotal))
+        myMask = pack(myCounts)
+        oppMask = pack(oppCounts)
+        packed = {} # 计数向量到压缩整数的缓存，很多条目共用相同的手牌
+        for levelTotal in list(self.table):
+            level = self.table[levelTotal]
+            kept = {}
+            for key, entry in level.items():
+                mover = packed.get(entry[4])
+                if mover is None:
+                    mover = packed[entry[4]] = pack(entry[4])
+                other = packed.get(entry[5])
+                if other is None:
+                    other = packed[entry[5]] = pack(entry[5])
+                if ((is_subset(mover, myMask) and is_subset(other, oppMask))
+                        or (is_subset(mover, oppMask) and is_subset(other, myMask))):
+                    kept[key] = entry
+            self.size -= len(level) - len(kept)
+            if kept:
+                self.table[levelTotal] = kept
+            else:
+                del self.table[levelTotal]
+        self.reused = self.size
+
+    @staticmethod
+    def __ordered_moves(myCounts, last, hasTTMove=False, ttMove=None):
+        """
+        出牌排序：置换表中的最佳出牌优先，其次张数多的牌(能直接出完的牌一定在最前)，最后是不出
+        """
+        moves = sorted(rankcount.responses(myCounts, last), key=lambda move: (-move.length, move.lead))
+        if last is not None:
+            moves.append(None)
+        if hasTTMove and ttMove in moves:
+            moves.remove(ttMove)
+            moves.insert(0, ttMove)
+        return moves
+
+    @staticmethod
+    def evaluate(myCounts, oppCounts):
+        """
+        启发值：以不同点数的数量近似剩余出牌的次数，次数越少越好
+        """
+        myGroups = sum(1 for cnt in myCounts if cnt)
+        oppGroups = sum(1 for cnt in oppCounts if cnt)
+        return (oppGroups - myGroups) * 100 + (sum(oppCounts) - sum(myCounts))
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import rankcount
+from cardmask import from_orders, rank_counts, rank_of
+from rankcount import RANK_CNT, CAPS
+from endgame import AlphaBetaEngine
+from pimc import PimcEngine, rollout_move
+
+SERVER_ENGINES = {'greedy': None, 'alphabeta': AlphaBetaEngine, 'pimc': PimcEngine} # 服务器一方可选的决策引擎
+_engines = {} # 每个工作进程中常驻的决策引擎，以(引擎名称, 时间上限)为键
+
+
+def take_orders(hand, cards):
+    """
+    从手牌中取出与点数计数向量对应的扑克牌，同一点数取顺序最小的牌
+    :param hand:  扑克牌顺序的bytes
+    :param cards: 出牌的点数计数向量
+    :return:      (出的牌的列表, 剩余手牌的bytes)
+    """
+    need = list(cards)
+    taken = []
+    rest = bytearray()
+    for order in hand:
+        rank = rank_of(order)
+        if need[rank]:
+            need[rank] -= 1
+            taken.append(order)
+        else:
+            rest.append(order)
+    return taken, bytes(rest)
+
+
+def _decide(engineName, timeLimit, myCounts, oppCounts, pool, last):
+    """
+    在工作进程中计算服务器一方的出牌，可以在进程池中执行
+    :param pool: 对服务器未知的牌，PIMC使用，完全信息的引擎直接使用对手的手牌
+    :return:     Move，不出时为None
+    """
+    key = (engineName, timeLimit)
+    if key not in _engines:
+        _engines[key] = SERVER_ENGINES[engineName](timeLimit=timeLimit)
+    engine = _engines[key]
+    if engineName == 'pimc':
+        return engine.search(myCounts, pool, sum(oppCounts), last)
+    return engine.search(myCounts, oppCounts, last)
+
+
+class GameState:
+    """
+    一局1v1对战的紧凑状态，只保存双方的手牌、已出的牌和桌上的牌，不保存PokerNode
+    玩家0为客户端，玩家1为服务器
+    """
+    __slots__ = ('gameId', 'hands', 'counts', 'played', 'last', 'lastPlayer', 'engine', 'winner',
+                 'lastActive', 'busy')
+
+    def __init__(self, gameId, clientHand, serverHand, engine):
+        self.gameId = gameId
+        self.hands = [bytes(sorted(clientHand)), bytes(sorted(serverHand))] # 扑克牌顺序
+        self.counts = [rank_counts(from_orders(clientHand)), rank_counts(from_orders(serverHand))] # 点数计数向量
+        self.played = [(0,) * RANK_CNT, (0,) * RANK_CNT] # 双方已经出过的牌，PIMC用来推断客户端的手牌
+        self.last = None # 桌上需要压过的Move，None表示自由出牌
+        self.lastPlayer = None # 打出self.last的一方
+        self.engine = engine
+        self.winner = None # 获胜的一方，0为客户端，1为服务器
+        self.lastActive = time.monotonic()
+        self.busy = False # 正在处理这一局的请求
+
+    def play(self, player, move):
+        """
+        执行一方的出牌，move为None时表示不出，桌上的牌清空
+        :return: 出的扑克牌顺序列表
+        """
+        if move is None:
+            self.last = None
+            self.lastPlayer = None
+            return []
+        taken, self.hands[player] = take_orders(self.hands[player], move.cards)
+        self.counts[player] = rankcount.apply(self.counts[player], move)
+        self.played[player] = tuple(a + b for a, b in zip(self.played[player], move.cards))
+        self.last = move
+        self.lastPlayer = player
+        if not any(self.counts[player]):
+            self.winner = player
+        return taken
+
+    def to_dict(self):
+        return {'game': self.gameId, 'hand': list(self.hands[0]), 'opponentCount': sum(self.counts[1]),
+                'last': self.last and {'kind': self.last.kind, 'player': self.lastPlayer},
+                'winner': self.winner}
+
+
+class GameServer:
+    """
+    同时托管大量1v1对局的服务器，客户端(机器人或者人)与服务器的决策引擎对战
+    请求和响应都是一行JSON，服务器的出牌在进程池中计算，超过延迟目标时改为贪心出牌
+    长时间没有请求的对局会被清除
+    """
+    def __init__(self, workers=None, latency=0.5, idleTimeout=600.0, timeLimit=None):
+        """
+        :param workers:     计算出牌的进程数量，None表示CPU核数
+        :param latency:     每个请求的延迟目标(秒)
+        :param idleTimeout: 对局没有请求超过该时间(秒)后被清除
+        :param timeLimit:   决策引擎每一步的时间上限(秒)，默认为延迟目标的一半
+        """
+        self.executor = ProcessPoolExecutor(workers)
+        self.latency = latency
+        self.idleTimeout = idleTimeout
+        self.timeLimit = timeLimit if timeLimit is not None else latency / 2
+        self.games = {} # 对局编号到GameState
+        self.__ids = itertools.count(1)
+        self.rng = random.Random()
+        self.created = 0 # 创建的对局数
+        self.evicted = 0 # 因空闲被清除的对局数
+        self.fallbacks = 0 # 超过延迟目标改为贪心出牌的次数
+
+    async def handle(self, request):
+        """
+        处理一个请求
+        :param request: 字典，op为new、play、state或close
+        :return:        响应字典
+        """
+        begin = time.perf_counter()
+        response = {'id': request.get('id')}
+        try:
+            op = request['op']
+            if op == 'new':
+                result = await self.__new(request)
+            elif op in ('play', 'state', 'close'):
+                game = self.games.get(request['game'])
+                if game is None:
+                    raise KeyError("No such game %r" % request['game'])
+                game.lastActive = time.monotonic()
+                if op == 'play':
+                    result = await self.__play(game, request['cards'])
+                elif op == 'state':
+                    result = game.to_dict()
+                else:
+                    del self.games[game.gameId]
+                    result = {'game': game.gameId}
+            else:
+                raise ValueError("Unknown op '%s'" % op)
+        except (KeyError, TypeError, ValueError) as e:
+            response.update(ok=False, error='%s: %s' % (type(e).__name__, e))
+            return response
+        response['ok'] = True
+        response['result'] = result
+        response['time'] = time.perf_counter() - begin
+        return response
+
+    async def __new(self, request):
+        """
+        发牌并创建一局对战，服务器先出牌时同时返回服务器的出牌
+        请求中可选cards(客户端的张数)、opponentCards(服务器的张数)、engine、first(client或server)、seed
+        """
+        clientCnt = int(request.get('cards', 17))
+        serverCnt = int(request.get('opponentCards', 17))
+        engine = request.get('engine', 'greedy')
+        if engine not in SERVER_ENGINES:
+            raise ValueError("Unknown engine '%s'" % engine)
+        if clientCnt < 1 or serverCnt < 1 or clientCnt + serverCnt > 54:
+            raise ValueError("Card counts must be positive and at most 54 in total")
+        rng = random.Random(request['seed']) if 'seed' in request else self.rng
+        deck = list(range(1, 55))
+        rng.shuffle(deck)
+        game = GameState(next(self.__ids), deck[:clientCnt], deck[clientCnt: clientCnt + serverCnt], engine)
+        self.games[game.gameId] = game
+        self.created += 1
+        result = game.to_dict()
+        if request.get('first', 'client') == 'server':
+            result['serverPlay'] = await self.__server_turn(game)
+            result['opponentCount'] = sum(game.counts[1])
+        return result
+
+    async def __play(self, game, cards):
+        """
+        执行客户端的出牌，然后计算服务器的出牌
+        :param cards: 客户端出的扑克牌顺序列表，空列表表示不出
+        """
+        if game.winner is not None:
+            raise ValueError("Game is over")
+        if game.busy:
+            raise ValueError("Previous play is still being processed")
+        cards = list(cards)
+        if cards:
+            if any(order not in game.hands[0] for order in cards) or len(set(cards)) != len(cards):
+                raise ValueError("Cards are not in hand")
+            played = rank_counts(from_orders(cards))
+            move = None
+            for candidate in rankcount.responses(game.counts[0], game.last):
+                if candidate.cards == played:
+                    move = candidate
+                    break
+            if move is None:
+                raise ValueError("Illegal play")
+        elif game.last is None:
+            raise ValueError("Cannot pass when leading")
+        else:
+            move = None
+        game.play(0, move)
+        result = {'winner': game.winner}
+        if game.winner is None:
+            result['serverPlay'] = await self.__server_turn(game)
+            result['winner'] = game.winner
+        result['opponentCount'] = sum(game.counts[1])
+        return result
+
+    async def __server_turn(self, game):
+        """
+        计算并执行服务器的出牌，超过延迟目标时使用贪心出牌
+        :return: 服务器出牌的字典，不出时为None
+        """
+        myCounts, oppCounts, last = game.counts[1], game.counts[0], game.last
+        move = rollout_move(myCounts, last) # 贪心出牌，同时作为超时时的结果
+        if game.engine != 'greedy' and sum(myCounts) + sum(oppCounts) > 2:
+            pool = tuple(cap - a - b - c for cap, a, b, c in zip(CAPS, myCounts, game.played[1], game.played[0]))
+            game.busy = True
+            try:
+                future = asyncio.get_running_loop().run_in_executor(
+                    self.executor, _decide, game.engine, self.timeLimit, myCounts, oppCounts, pool, last)
+                move = await asyncio.wait_for(asyncio.shield(future), self.latency)
+            except Exception: # 超时或者引擎出错时使用贪心出牌
+                self.fallbacks += 1
+            finally:
+                game.busy = False
+        taken = game.play(1, move)
+        if move is None:
+            return None
+        return {'kind': move.kind, 'cards': taken}
+
+    async def evict_idle(self, interval=None):
+        """
+        定期清除空闲的对局
+        """
+        interval = interval or max(1.0, self.idleTimeout / 10)
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self.idleTimeout
+            idleLst = [gameId for gameId, game in self.games.items() if game.lastActive < deadline and not game.busy]
+            for gameId in idleLst:
+                del self.games[gameId]
+            self.evicted += len(idleLst)
+
+    async def serve_client(self, reader, writer):
+        """
+        处理一个连接，每一行是一个请求，请求并发处理，响应按完成的顺序写回，用id对应
+        """
+        tasks = set()
+
+        async def reply(request):
+            response = await self.handle(request)
+            writer.write((json.dumps(response, separators=(',', ':')) + '\n').encode())
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Request must be a JSON object")
+                except ValueError as e:
+                    writer.write((json.dumps({'id': None, 'ok': False, 'error': str(e)}) + '\n').encode())
+                    continue
+                task = asyncio.ensure_future(reply(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8766, unixPath=None, backlog=4096):
+        """
+        启动服务器，unixPath不为None时监听Unix socket，否则监听host:port
+        :param backlog: 等待接受的连接数量上限，大量客户端同时连接时需要足够大
+        """
+        if unixPath:
+            server = await asyncio.start_unix_server(self.serve_client, unixPath, backlog=backlog)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port, backlog=backlog)
+        evictor = asyncio.ensure_future(self.evict_idle())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='1v1多对局服务器，每行一个JSON请求')
+    parser.add_argument('--host', default='127.0.0.1', help='监听的地址')
+    parser.add_argument('--port', type=int, default=8766, help='监听的端口')
+    parser.add_argument('--unix', default=None, help='监听的Unix socket路径，设置时不监听端口')
+    parser.add_argument('--workers', type=int, default=None, help='计算出牌的进程数量')
+    parser.add_argument('--latency', type=float, default=0.5, help='每个请求的延迟目标(秒)')
+    parser.add_argument('--idle', type=float, default=600.0, help='对局空闲多久后被清除(秒)')
+    parser.add_argument('--time', type=float, default=None, help='决策引擎每一步的时间上限(秒)')
+    args = parser.parse_args()
+    gameServer = GameServer(args.workers, args.latency, args.idle, args.time)
+    try:
+        asyncio.run(gameServer.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gameServer.close()
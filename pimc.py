@@ -0,0 +1,184 @@
+import random
+import time
+from multiprocessing import Pool
+
+import rankcount
+from rankcount import RANK_CNT
+
+
+def rollout_move(counts, last):
+    """
+    快速模拟用的出牌策略
+    自由出牌时按照PokerNode.possibleStep的顺序出第一种牌，应答时出能压过的最小的同类型牌，其次炸弹和火箭
+    :return: Move，不出时为None
+    """
+    if last is None:
+        return rankcount.legal_moves(counts)[0]
+    best = None
+    for move in rankcount.responses(counts, last):
+        order = (move.kind != last.kind, move.kind == 'rocket', move.lead)
+        if best is None or order < best[0]:
+            best = (order, move)
+    return best and best[1]
+
+
+def rollout(myCounts, oppCounts, last, maxPly=200):
+    """
+    从轮到对手出牌的局面开始快速模拟到结束
+    :param myCounts:    自己的手牌
+    :param oppCounts:   对手的手牌
+    :param last:        自己刚出的牌，不出时为None
+    :return:            自己获胜时为1，否则为0
+    """
+    hands = [oppCounts, myCounts] # 下标0为当前出牌的一方
+    isMe = False
+    for _ in range(maxPly):
+        move = rollout_move(hands[0], last)
+        if move is not None:
+            hands[0] = rankcount.apply(hands[0], move)
+            if not any(hands[0]):
+                return 1 if isMe else 0
+        last = move
+        hands.reverse()
+        isMe = not isMe
+    return 0
+
+
+def sample_hand(rng, pool, size):
+    """
+    从未知的牌中随机抽取对手的手牌
+    :param pool: 未知牌的点数计数向量
+    :param size: 对手手牌的张数
+    """
+    cards = [rank for rank in range(RANK_CNT) for _ in range(pool[rank])]
+    counts = [0] * RANK_CNT
+    for rank in rng.sample(cards, min(size, len(cards))):
+        counts[rank] += 1
+    return tuple(counts)
+
+
+def _evaluate(args):
+    """
+    对一批确定化的对手手牌，评估所有候选出牌的胜局数，可以在进程池中执行
+    """
+    myCounts, pool, oppSize, last, candidates, start, sampleCnt, seed, deadline = args
+    wins = [0] * len(candidates)
+    done = 0
+    while done < sampleCnt and time.time() < deadline:
+        oppCounts = sample_hand(random.Random(seed + start + done), pool, oppSize) # 每次确定化使用各自的种子
+        for idx, move in enumerate(candidates):
+            if move is None:
+                wins[idx] += rollout(myCounts, oppCounts, None)
+            else:
+                myNext = rankcount.apply(myCounts, move)
+                wins[idx] += 1 if not any(myNext) else rollout(myNext, oppCounts, move)
+        done += 1
+    return wins, done
+
+
+class PimcEngine:
+    """
+    只知道自己手牌时的1v1决策引擎(Perfect Information Monte Carlo)
+    根据已经出过的牌随机生成对手的手牌，对每个候选出牌在所有确定化的局面上快速模拟，选择期望胜率最高的出牌
+    确定化的局面可以分配到进程池中并行模拟，共享样本数量和时间上限
+    """
+    perfectInformation = False # 不查看对手的手牌，PokerPlayer.gaming不会为它查询终局库
+
+    def __init__(self, sampleCnt=200, timeLimit=1.0, workers=0, sharedDeck=True, seed=None):
+        """
+        :param sampleCnt:   每一步确定化的次数
+        :param timeLimit:   每一步的时间上限(秒)
+        :param workers:     进程数量，0表示在当前进程中模拟
+        :param sharedDeck:  双方的牌是否来自同一副牌，为True时自己的牌不会出现在对手手中
+        :param seed:        随机种子
+        """
+        self.sampleCnt = sampleCnt
+        self.timeLimit = timeLimit
+        self.workers = workers
+        self.sharedDeck = sharedDeck
+        self.rng = random.Random(seed)
+        self.samples = 0 # 上一次决策实际完成的确定化次数
+        self.winRate = 0.0 # 上一次决策中最佳出牌的胜率
+        self.__pool = None
+        self.__initNode = None # 当前对局的初始手牌，用于判断是否开始了新的一局
+        self.__oppPlayed = None # 对手已经出过的牌
+
+    def observe(self, player, opponentAction):
+        """
+        记录对手出的牌，PokerPlayer.gaming在每个回合都会调用
+        :param opponentAction: 对手出的牌，(出牌类型, 实际出的牌)，没有出牌时为None
+        """
+        if player.initNode is not self.__initNode:
+            self.__initNode = player.initNode
+            self.__oppPlayed = (0,) * RANK_CNT
+        if opponentAction:
+            cards = rankcount.from_action(*opponentAction).cards
+            self.__oppPlayed = tuple(a + b for a, b in zip(self.__oppPlayed, cards))
+
+    def decide(self, player, opponentAction):
+        """
+        PokerPlayer.gaming使用的接口，只使用对手的手牌张数，不查看对手的手牌
+        对手出过的牌由observe记录，不经过PokerPlayer.gaming调用时需要先对本回合调用observe
+        :return: (出牌类型, 实际出的牌)，不出时为None
+        """
+        if player.initNode is not self.__initNode:
+            raise RuntimeError("observe must be called before decide in each game")
+        last = rankcount.from_action(*opponentAction) if opponentAction else None
+        myCounts = player.curNode.get_rank_cnt()
+        known = player.initNode.get_rank_cnt() if self.sharedDeck else (0,) * RANK_CNT
+        pool = tuple(max(0, cap - a - b) for cap, a, b in zip(player.deck.caps, known, self.__oppPlayed))
+        move = self.search(myCounts, pool, len(player.opponent.curNode), last)
+        if move is None:
+            return None
+        return move.kind, rankcount.to_action(player.curNode, move)
+
+    def search(self, myCounts, pool, oppSize, last=None):
+        """
+        :param myCounts:    自己的手牌
+        :param pool:        对手手牌可能包含的牌
+        :param oppSize:     对手手牌的张数
+        :param last:        需要压过的Move，自由出牌时为None
+        :return:            期望胜率最高的Move，不出时为None
+        """
+        candidates = list(rankcount.responses(myCounts, last))
+        if last is not None:
+            candidates.append(None)
+        if len(candidates) == 1:
+            return candidates[0]
+        for move in candidates: # 能直接出完的牌一定最好
+            if move is not None and move.length == sum(myCounts):
+                return move
+        deadline = time.time() + self.timeLimit
+        workers = max(1, self.workers)
+        share = [self.sampleCnt // workers + (idx < self.sampleCnt % workers) for idx in range(workers)]
+        seed = self.rng.getrandbits(32) # 第i次确定化的种子为seed+i，没有超时时结果与进程数量无关
+        tasks = [(myCounts, pool, oppSize, last, candidates, sum(share[:idx]), cnt, seed, deadline)
+                 for idx, cnt in enumerate(share) if cnt]
+        if self.workers > 0:
+            if self.__pool is None:
+                self.__pool = Pool(self.workers)
+            results = self.__pool.map(_evaluate, tasks)
+        else:
+            results = map(_evaluate, tasks)
+        wins = [0] * len(candidates)
+        self.samples = 0
+        for taskWins, done in results:
+            self.samples += done
+            for idx, cnt in enumerate(taskWins):
+                wins[idx] += cnt
+        best = max(range(len(candidates)), key=lambda idx: wins[idx])
+        self.winRate = wins[best] / self.samples if self.samples else 0.0
+        return candidates[best]
+
+    def close(self):
+        """
+        关闭进程池
+        """
+        if self.__pool:
+            self.__pool.terminate()
+            self.__pool = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_PimcEngine__pool'] = None # 进程池不能被pickle
+        return state
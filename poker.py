@@ -2,6 +2,10 @@ import random
 from math import ceil, log
 import sortedcontainers
 from collections import OrderedDict
+from bisect import bisect_right
+
+import zobrist
+
 
 
 class PriorityQueue(object):
@@ -25,6 +29,8 @@ class PriorityQueue(object):
         if node < self._queue[i]:
             self._queue.pop(index=i)
             self._queue.add(node)
+            return True
+        return False
 
     def find(self, node):
         try:
@@ -51,11 +57,52 @@ class PriorityQueue(object):
         return len(self._queue)
 
 
+class Deck:
+    """
+    一副或多副牌，每副牌54张，第k副牌(从0开始)的扑克牌顺序为该牌在一副牌中的顺序加上54 * k
+    多副牌时同一点数最多有4 * decks张，张数超过4的同点数牌作为炸弹'bomb'
+    """
+    SIZE = 54 # 一副牌的张数
+    MAX_DECKS = 2 # 规范化编号每个点数占一位、endgame.pack每个点数占5位，所以同一点数最多8张
+
+    def __init__(self, decks=1):
+        """
+        :param decks: 牌的副数，1~Deck.MAX_DECKS
+        """
+        if decks < 1 or decks > Deck.MAX_DECKS:
+            raise ValueError("Deck count must be between 1 and %d" % Deck.MAX_DECKS)
+        self.decks = decks
+        self.size = Deck.SIZE * decks # 总张数
+        self.caps = (4 * decks,) * 13 + (2 * decks,) # 每个点数的数量上限
+
+    def orders(self):
+        """
+        :return: 所有扑克牌顺序的列表
+        """
+        return list(range(1, self.size + 1))
+
+    @staticmethod
+    def split(order):
+        """
+        将扑克牌顺序分解为(第几副牌, 在一副牌中的顺序1~54)
+        """
+        return (order - 1) // Deck.SIZE, (order - 1) % Deck.SIZE + 1
+
+    @staticmethod
+    def order_of(rank, copy):
+        """
+        得到规范化手牌中点数下标为rank的第copy张牌(从0开始)的扑克牌顺序
+        每副牌依次使用红桃、黑桃、梅花、方块，王只有红桃和黑桃，用完之后使用下一副牌
+        """
+        suitCnt = 2 if rank == 13 else 4
+        return rank * 4 + copy % suitCnt + 1 + Deck.SIZE * (copy // suitCnt)
+
+
 class Poker:
     """
     扑克牌类，用于存储比较扑克牌
     大小王均为JOKER，利用花色进行区分，小王为红桃，大王为黑桃
-    比较大小和相等关系时不考虑牌的类型
+    比较大小和相等关系时不考虑牌的类型，也不考虑属于第几副牌
     """
     __pokerMap = {'3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9,
                   '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14, '2': 15,
@@ -66,19 +113,20 @@ class Poker:
     __suitType = ['heart', 'spade', 'club', 'diamond']
 
     def __init__(self, *args):
-        if len(args) == 2:
-            self.__init(args[0], args[1])
+        if len(args) >= 2:
+            self.__init(*args)
         elif len(args) == 1:
-            if args[0] < 1 or args[0] > 54:
+            if args[0] < 1 or args[0] > Deck.SIZE * Deck.MAX_DECKS:
                 raise ValueError("Out of range")
 
-            num = ceil(args[0] / 4) + 2
-            suit = (args[0] - 1) % 4# 得到扑克牌
+            deck, order = Deck.split(args[0])
+            num = ceil(order / 4) + 2
+            suit = (order - 1) % 4# 得到扑克牌
             suit = Poker.__suitType[suit]
             num = Poker.__rePokerMap[num]# 得到对应的键
-            self.__init(num, suit)
+            self.__init(num, suit, deck)
 
-    def __init(self, num, suit):
+    def __init(self, num, suit, deck=0):
         num = str(num).upper()# 将num转化为大写的字符串
         if num not in Poker.__pokerMap:# 如果键不存在，就触发异常
             raise KeyError("Error key!")
@@ -91,6 +139,10 @@ class Poker:
         if Poker.__pokerMap[self.num] >= 16 and (self.suit == 'club' or self.suit == 'diamond'):# 如果牌的号和牌的花色不匹配就触发异常
             raise ValueError("Num and suit doesn't match")
 
+        self.deck = deck# 属于第几副牌
+        if self.deck < 0 or self.deck >= Deck.MAX_DECKS:
+            raise ValueError("No such deck")
+
     @staticmethod
     def get_num_value(num):
         """
@@ -125,9 +177,11 @@ class Poker:
             order = order * 4 + 3
         elif poker.suit == 'diamond':
             order = order * 4 + 4
-        return order
+        return order + poker.deck * Deck.SIZE
 
     def __repr__(self):
+        if self.deck:
+            return str((self.num, self.suit, self.deck))
         return str((self.num, self.suit))
 
     def __lt__(self, other):
@@ -169,8 +223,10 @@ class PokerNode:
         self.state = pokerState
         self.parent = parent
         self.__count_poker()
+        self.__key = None # 与花色无关的Zobrist键，在第一次使用时由父节点的键增量得到
         self.step = 0
         self.action = action
+        self.responseIndex = None # 应答对手出牌的索引，在第一次使用时建立
         if parent:
             self.step = parent.step + 1
         if len(pokerState) > 0:
@@ -190,6 +246,36 @@ class PokerNode:
             except KeyError:
                 self.pokerCnt[poker.num] = [poker]
 
+    @property
+    def key(self):
+        """
+        与花色无关的64位Zobrist键，相等的手牌键一定相等，可以用于去重、置换表和缓存
+        有父节点时由父节点的键异或出牌涉及的点数得到，不需要遍历整手牌
+        """
+        if self.__key is None:
+            if self.parent is None or self.action is None:
+                self.__key = zobrist.count_key(self.get_rank_cnt())
+            else:
+                self.__key = self.parent.get_child_key(self.action)
+        return self.__key
+
+    def get_child_key(self, action):
+        """
+        得到出牌之后手牌的键，不构造新的节点
+        只异或出牌涉及的点数的张数对应的键，代价与出牌的张数有关，与手牌的张数无关
+        :param action:  出的牌
+        """
+        if isinstance(action, Poker):
+            action = [action]
+        used = {}
+        for poker in action:
+            used[poker.num] = used.get(poker.num, 0) + 1
+        key = self.key
+        for num, cnt in used.items():
+            old = len(self.pokerCnt[num])
+            key = zobrist.update(key, Poker.get_num_value(num) - 3, old, old - cnt)
+        return key
+
     def get_child(self, action):
         """
         得到新的节点
@@ -204,6 +290,24 @@ class PokerNode:
             newState.remove(action)
         return PokerNode(newState, self, action)
 
+    def get_rank_cnt(self):
+        """
+        得到与花色无关的点数计数向量，下标0~13依次对应3~2和JOKER
+        :return: 长度为14的元组
+        """
+        rankCnt = [0] * 14
+        for num in self.pokerCnt:
+            rankCnt[Poker.get_num_value(num) - 3] = len(self.pokerCnt[num])
+        return tuple(rankCnt)
+
+    def get_canonical_id(self):
+        """
+        得到手牌的规范化编号，即点数计数向量拼成的字符串
+        搜索过程与花色无关，所以相同编号的手牌搜索行为相同，可用于复现
+        :return: 例如'21000300010002'
+        """
+        return ''.join(str(cnt) for cnt in self.get_rank_cnt())
+
     def path(self):
         """
         Returns list of nodes from this node to the root node
@@ -223,85 +327,52 @@ class PokerNode:
         self.possibleStep为有序字典，以便于后续出牌
         将启发函数值存入self.pathCost中
         """
-        largestCnt = 0
+        countLst = sorted(self.pokerCnt.values(), key=len) # 每个点数的牌，按张数从少到多，张数相同时按点数
         self.possibleStep['three straight'] = []
         self.possibleStep['three straight with gap'] = []
         self.possibleStep['pair straight'] = []
         self.possibleStep['pair straight with gap'] = []
         self.possibleStep['single straight'] = []
         self.possibleStep['single straight with gap'] = []
-        self.possibleStep['four with two single'] = []
-        self.possibleStep['four with two pair'] = []
-        self.possibleStep['three with pair'] = []
-        self.possibleStep['three with single'] = []
+        self.possibleStep['four with two single'] = None # 带牌的组合在单张、对子、三张和四张之后生成
+        self.possibleStep['four with two pair'] = None
+        self.possibleStep['three with pair'] = None
+        self.possibleStep['three with single'] = None
+        hasBomb = len(countLst[-1]) > 4
+        if hasBomb:
+            self.possibleStep['bomb'] = [] # 多副牌时超过四张的炸弹
         self.possibleStep['four'] = []
         self.possibleStep['three'] = []
         self.possibleStep['pair'] = []
-        self.possibleStep['single'] = [] # 一张一张出
-        for length in range(1, 5):
-            for num in self.pokerCnt:
-                if len(self.pokerCnt[num]) == length:
-                    self.possibleStep['single'].append(self.pokerCnt[num][0])
-        if len(self.possibleStep['single']):
-            largestCnt = 1
+        self.possibleStep['single'] = [lst[0] for lst in countLst] # 一张一张出
 
         for num in self.pokerCnt: # 寻找可以两张一起出的组合
             lst = self.pokerCnt[num]
             if len(lst) == 2:
-                if largestCnt < 2:
-                    largestCnt = 2
                 self.possibleStep['pair'].append(lst)
 
         for num in self.pokerCnt:  # 寻找可以两张一起出的组合
             lst = self.pokerCnt[num]
             if len(lst) == 3:
-                if largestCnt < 3:
-                    largestCnt = 3
                 self.possibleStep['three'].append(lst)
                 self.possibleStep['pair'].append(lst[0: 2])
 
         for num in self.pokerCnt:  # 寻找可以两张一起出的组合
             lst = self.pokerCnt[num]
             if len(lst) == 4:
-                if largestCnt < 4:
-                    largestCnt = 4
                 self.possibleStep['four'].append(lst)
                 self.possibleStep['three'].append(lst[0: 3])
 
-        for item in self.possibleStep['three']:
-            for single in self.possibleStep['single']:# 寻找三带一的组合
-                if single != item[0]:
-                    if largestCnt < 4:
-                        largestCnt = 4
-                    self.possibleStep['three with single'].append(item + [single])
-            for pair in self.possibleStep['pair']:# 寻找三带二组合
-                if pair[0] != item[0] and pair[0].num != 'JOKER': # 保证三带二的一对牌不同于三张牌，火箭不算对子
-                    if largestCnt < 5:
-                        largestCnt = 5
-                    self.possibleStep['three with pair'].append(item + pair)
+        if hasBomb:
+            for lst in self.pokerCnt.values():  # 多副牌时超过四张的点数整体作为炸弹
+                if len(lst) > 4:
+                    self.possibleStep['bomb'].append(lst)
+                    self.possibleStep['three'].append(lst[0: 3])
 
-        for item in self.possibleStep['four']:
-            for single in self.possibleStep['single']:# 寻找四带二
-                if single != item[0]:
-                    for single2 in self.possibleStep['single'][self.possibleStep['single'].index(single) + 1:]:
-                        if single2 != item[0]:
-                            if largestCnt < 6:
-                                largestCnt = 6
-                            self.possibleStep['four with two single'].append(item + [single] + [single2])
-            for pair in self.possibleStep['pair']:# 寻找四带二对
-                if pair[0] != item[0] and pair[0].num != 'JOKER':
-                    if largestCnt < 6:
-                        largestCnt = 6
-                    self.possibleStep['four with two single'].append(item + pair)
-                    for pair2 in self.possibleStep['pair'][self.possibleStep['pair'].index(pair) + 1:]:
-                        if pair2[0] != item[0] and pair2[0].num != 'JOKER':
-                            if largestCnt < 8:
-                                largestCnt = 8
-                            self.possibleStep['four with two pair'].append(item + pair + pair2)
-                elif pair[0] != item[0] and pair[0].num == 'JOKER':
-                    if largestCnt < 6:
-                        largestCnt = 6
-                    self.possibleStep['four with two single'].append(item + pair)
+        self.possibleStep['four with two single'] = self.__four_with_two_single()
+        self.possibleStep['four with two pair'] = self.__four_with_two_pair()
+        self.possibleStep['three with pair'] = self.__three_with_pair()
+        self.possibleStep['three with single'] = self.__three_with_single()
 
         for num in self.pokerCnt:
             if Poker.get_num_value(num) >= 11:# 对于大于以J的扑克牌作为开始的顺子不可能存在
@@ -451,8 +522,125 @@ class PokerNode:
         if not self.possibleStep['three straight with gap']:
             self.possibleStep.pop('three straight with gap')
 
+        largestCnt = 1 # 不含顺子时一次最多能出的张数
+        for kind, cnt in (('pair', 2), ('three', 3), ('four', 4), ('three with single', 4), ('three with pair', 5),
+                          ('four with two single', 6), ('four with two pair', 8)):
+            if self.possibleStep[kind]:
+                largestCnt = max(largestCnt, cnt)
+        for bomb in self.possibleStep.get('bomb', ()):
+            largestCnt = max(largestCnt, len(bomb))
         self.pathCost = self.step + ceil(len(self.state) / largestCnt)
 
+    def __three_with_single(self):
+        steps = []
+        for item in self.possibleStep['three']:
+            for single in self.possibleStep['single']:# 寻找三带一的组合
+                if single != item[0]:
+                    steps.append(item + [single])
+        return steps
+
+    def __three_with_pair(self):
+        steps = []
+        for item in self.possibleStep['three']:
+            for pair in self.possibleStep['pair']:# 寻找三带二组合
+                if pair[0] != item[0] and pair[0].num != 'JOKER': # 保证三带二的一对牌不同于三张牌，火箭不算对子
+                    steps.append(item + pair)
+        return steps
+
+    def __four_with_two_single(self):
+        steps = []
+        singleLst = self.possibleStep['single']
+        for item in self.possibleStep['four']:
+            for idx, single in enumerate(singleLst):# 寻找四带二
+                if single != item[0]:
+                    for single2 in singleLst[idx + 1:]:
+                        if single2 != item[0]:
+                            steps.append(item + [single] + [single2])
+            for pair in self.possibleStep['pair']:# 四带一对，一对王也可以作为两张单牌带出
+                if pair[0] != item[0]:
+                    steps.append(item + pair)
+        return steps
+
+    def __four_with_two_pair(self):
+        steps = []
+        pairLst = self.possibleStep['pair']
+        for item in self.possibleStep['four']:
+            for idx, pair in enumerate(pairLst):# 寻找四带二对
+                if pair[0] != item[0] and pair[0].num != 'JOKER':
+                    for pair2 in pairLst[idx + 1:]:
+                        if pair2[0] != item[0] and pair2[0].num != 'JOKER':
+                            steps.append(item + pair + pair2)
+        return steps
+
+    @staticmethod
+    def get_action_kind(kind, action):
+        """
+        得到对战时出牌的类型，possibleStep中的一对王单独作为火箭'rocket'
+        """
+        if kind == 'pair' and action[0].num == 'JOKER':
+            return 'rocket'
+        return kind
+
+    def get_response_index(self):
+        """
+        得到应答对手出牌用的索引，以(出牌类型, 牌数)为键
+        值为按首张牌点数排序的(点数列表, 出牌列表)，用于二分查找能压过对手的最小出牌
+        :return: 索引字典
+        """
+        if self.responseIndex is None:
+            index = {}
+            for kind in self.possibleStep:
+                for action in self.possibleStep[kind]:
+                    if kind == 'single':
+                        key = (kind, 1)
+                        lead = Poker.get_num_value(action.num)
+                    else:
+                        key = (PokerNode.get_action_kind(kind, action), len(action))
+                        lead = Poker.get_num_value(action[0].num)
+                    index.setdefault(key, []).append((lead, action))
+            fourLst = self.possibleStep['four']
+            for idx1 in range(len(fourLst)):# 四带四按照四带两对应答
+                for idx2 in range(idx1 + 1, len(fourLst)):
+                    index.setdefault(('four with two pair', 8), []).append(
+                        (Poker.get_num_value(fourLst[idx1][0].num), fourLst[idx1] + fourLst[idx2]))
+            self.responseIndex = {}
+            for key in index:
+                index[key].sort(key=lambda item: item[0])# 稳定排序，点数相同时保持原来的出牌顺序
+                self.responseIndex[key] = ([item[0] for item in index[key]], [item[1] for item in index[key]])
+        return self.responseIndex
+
+    def find_response(self, kind, opponentPoker):
+        """
+        查找能压过对手出牌的最小出牌，同类型的牌都压不过时使用炸弹，最后使用火箭
+        多副牌时炸弹先比较张数，张数相同时比较点数
+        :param kind:            对手出的牌的类型
+        :param opponentPoker:   对手实际出的牌，单张时为Poker，其他为Poker的数组
+        :return:                (出牌类型, 实际出的牌)，没有能压过的牌时返回None
+        """
+        index = self.get_response_index()
+        if kind == 'single':
+            length = 1
+            lead = Poker.get_num_value(opponentPoker.num)
+        else:
+            kind = PokerNode.get_action_kind(kind, opponentPoker)
+            length = len(opponentPoker)
+            lead = Poker.get_num_value(opponentPoker[0].num)
+        if kind == 'rocket':# 火箭是最大的牌
+            return None
+        if (kind, length) in index:
+            leadLst, actionLst = index[(kind, length)]
+            pos = bisect_right(leadLst, lead)
+            if pos < len(leadLst):
+                return kind, actionLst[pos]
+        if kind != 'four' and kind != 'bomb' and ('four', 4) in index:# 炸弹可以压过除炸弹和火箭以外的所有牌
+            return 'four', index[('four', 4)][1][0]
+        for bombLength in sorted(key[1] for key in index if key[0] == 'bomb'):# 多副牌时张数多的炸弹压过张数少的炸弹
+            if (kind != 'four' and kind != 'bomb') or bombLength > length:
+                return 'bomb', index[('bomb', bombLength)][1][0]
+        if ('rocket', 2) in index:
+            return 'rocket', index[('rocket', 2)][1][0]
+        return None
+
     def __len__(self):
         return len(self.state)
 
@@ -468,18 +656,41 @@ class PokerNode:
     def __ne__(self, other):
         return self.state != other.state
 
+    def __hash__(self):
+        return self.key # 只有放入集合或字典时才计算键，开节点表的查找不需要
+
     def __repr__(self):
         return str(self.state)
 
 
+class SolveCancelled(Exception):
+    """
+    求解被PokerPlayer.cancel取消
+    """
+    pass
+
+
 class PokerPlayer:
     """
     用于处理斗地主的问题
     """
-    def __init__(self):
+    def __init__(self, deck=None):
+        """
+        :param deck: 随机发牌使用的Deck，None表示一副牌
+        """
+        self.deck = deck or Deck()
         self.score = -2 # 初始化score，用于第二问的求解
         self.path = None # 出牌步骤
         self.step = 0 # 初始化出牌步数
+        self.tracer = None # 搜索事件记录器，参见searchtrace.SearchTracer
+        self.engine = None # 对战用的决策引擎，None表示使用贪心出牌，参见endgame.AlphaBetaEngine
+        self.opponent = None # 对战中的对手，完全信息的决策引擎需要对手的手牌
+        self.tablebase = None # 终局库，双方手牌都足够少时直接查表，参见tablebase.Tablebase，engine.perfectInformation为False时不使用
+        self.stepEngine = None # 第一问的求解引擎，None表示使用A*，参见dpsolver.DPSolver
+        self.progress = None # 求解进度的回调函数，参数为(已扩展的节点数, 当前最优值)
+        self.progressInterval = 256 # 每扩展多少个节点回调一次进度
+        self.nodes = 0 # 已扩展的节点数
+        self.cancelled = False # 为True时求解在下一次扩展节点时抛出SolveCancelled
 
     def deal_random(self, pokerCnt):
         """
@@ -488,7 +699,7 @@ class PokerPlayer:
         结果存在self.initNode中
         self.curNode设置为self.initNode，用于第三问两个玩家对战
         """
-        dealOrder = list(range(1, 55))# 得到随机的发牌顺序
+        dealOrder = self.deck.orders()# 得到随机的发牌顺序
         random.shuffle(dealOrder)
         initPoker = []# 初始的扑克牌列表
         for i in range(pokerCnt):
@@ -500,19 +711,71 @@ class PokerPlayer:
     def deal_specified(self, pokerLst):
         """
         指定牌型的发牌，不用于第三问两个对战
-        :param pokerLst:    指定的扑克牌序列，每个扑克牌用一个点数加花色的元组进行
+        :param pokerLst:    指定的扑克牌序列，每个扑克牌用一个点数加花色的元组进行，多副牌时可以再加上第几副牌
         结果存在self.initNode中
         """
         initPoker = []
         for item in pokerLst:
-            initPoker.append(Poker(item[0], item[1]))
+            initPoker.append(Poker(*item))
+        initPoker.sort()
+        self.initNode = PokerNode(initPoker)
+        self.curNode = self.initNode
+
+    def deal_order(self, orderLst):
+        """
+        按照扑克牌的顺序发牌
+        :param orderLst: 扑克牌顺序序列，一副牌时在1~54之间
+        """
+        initPoker = [Poker(order) for order in orderLst]
         initPoker.sort()
         self.initNode = PokerNode(initPoker)
         self.curNode = self.initNode
 
+    def deal_mask(self, mask):
+        """
+        按照手牌掩码发牌，第order - 1位为1表示有扑克牌顺序为order的牌，参见cardmask
+        """
+        from cardmask import to_pokers # cardmask依赖本模块，只能在使用时导入
+        self.initNode = PokerNode(to_pokers(mask))
+        self.curNode = self.initNode
+
+    def deal_canonical(self, canonicalId):
+        """
+        按照规范化编号发牌，用于复现性能分析报告中的手牌
+        :param canonicalId: PokerNode.get_canonical_id()得到的编号
+        """
+        self.deal_order([Deck.order_of(idx, copy) for idx, cnt in enumerate(canonicalId) for copy in range(int(cnt))])
+
+    def set_progress(self, callback, interval=256):
+        """
+        设置求解进度的回调函数，并将已扩展的节点数清零
+        :param callback: 回调函数，参数为(已扩展的节点数, 当前最优值)，在求解的线程中调用
+        :param interval: 每扩展多少个节点回调一次
+        """
+        self.progress = callback
+        self.progressInterval = interval
+        self.nodes = 0
+
+    def cancel(self):
+        """
+        取消正在进行的求解，可以在其他线程中调用
+        """
+        self.cancelled = True
+
+    def __report(self, best):
+        """
+        扩展节点时调用，检查是否被取消，并按间隔回调进度
+        :param best: 当前最优值，第一问为代价的下界，第二问为最高的score
+        """
+        self.nodes += 1
+        if self.cancelled:
+            raise SolveCancelled()
+        if self.progress and self.nodes % self.progressInterval == 0:
+            self.progress(self.nodes, best)
+
     def get_init_order(self):
         """
-        得到初始牌的顺序，即将扑克牌的点数和花色转成1~54之间的数字
+        得到初始牌的顺序，即将扑克牌的点数和花色转成1~54之间的数字，多副牌时再加上54 * 第几副牌
         :return: 初始牌的顺序序列
         """
         pokerOrderLst = []
@@ -520,15 +783,30 @@ class PokerPlayer:
             pokerOrderLst.append(Poker.get_order(item))
         return pokerOrderLst
 
+    def get_init_mask(self):
+        """
+        得到初始牌的掩码，参见cardmask
+        """
+        mask = 0
+        for item in self.initNode.state:
+            mask |= 1 << (Poker.get_order(item) - 1)
+        return mask
+
     def solve_without_score(self):
         """
-        用最少的步骤出完牌，使用的是A*算法
+        用最少的步骤出完牌，使用的是A*算法，设置了self.stepEngine时交给它求解
         出牌步骤顺序存在self.path中
         出牌的步数存在self.step中
         """
+        if self.stepEngine:
+            self.stepEngine.solve_player(self)
+            return
         nodeQ = PriorityQueue(self.initNode)
         while True:
             curNode = nodeQ.pop()  # 提取代价最短的状态
+            self.__report(curNode.pathCost)
+            if self.tracer:
+                self.tracer.record('goal' if len(curNode) == 0 else 'expand', curNode, open=len(nodeQ))
             if len(curNode) == 0:
                 self.path = curNode.path()
                 self.step = len(self.path)
@@ -540,19 +818,11 @@ class PokerPlayer:
                             for idx2 in range(idx1 + 1, len(curNode.possibleStep['four'])):
                                 nextNode = curNode.get_child(curNode.possibleStep['four'][idx1]
                                                              + curNode.possibleStep['four'][idx2])
-                                idx = nodeQ.find(nextNode)
-                                if idx is None:  # 如果不存在于开节点表中，就压入开节点表
-                                    nodeQ.push(nextNode)
-                                else:  # 如果存在，就根据代价的大小判断是否需要替换
-                                    nodeQ.compare_and_replace(idx, nextNode)
+                                self.__push(nodeQ, nextNode, 'four with four')
                     break
                 for action in curNode.possibleStep[kind]:
                     nextNode = curNode.get_child(action)
-                    idx = nodeQ.find(nextNode)
-                    if idx is None:  # 如果不存在于开节点表中，就压入开节点表
-                        nodeQ.push(nextNode)
-                    else:  # 如果存在，就根据代价的大小判断是否需要替换
-                        nodeQ.compare_and_replace(idx, nextNode)
+                    self.__push(nodeQ, nextNode, kind)
 
             while len(curNode):
                 kindLst = []# 不出所有顺子
@@ -585,11 +855,25 @@ class PokerPlayer:
                         nextNode = curNode.get_child(curNode.possibleStep[kind][0])
                         curNode = nextNode
                         break
-            idx = nodeQ.find(curNode)
-            if idx is None:  # 如果不存在于开节点表中，就压入开节点表
-                nodeQ.push(curNode)
-            else:  # 如果存在，就根据代价的大小判断是否需要替换
-                nodeQ.compare_and_replace(idx, curNode)
+            self.__push(nodeQ, curNode, 'greedy')
+
+    def __push(self, nodeQ, nextNode, kind):
+        """
+        将新的节点压入开节点表，并记录搜索事件
+        :param nodeQ:    开节点表
+        :param nextNode: 新的节点
+        :param kind:     得到新节点所出的牌的类型
+        """
+        idx = nodeQ.find(nextNode)
+        if idx is None:  # 如果不存在于开节点表中，就压入开节点表
+            nodeQ.push(nextNode)
+            event = 'push'
+        elif nodeQ.compare_and_replace(idx, nextNode):  # 如果存在，就根据代价的大小判断是否需要替换
+            event = 'replace'
+        else:
+            event = 'dup'
+        if self.tracer:
+            self.tracer.record(event, nextNode, kind=kind)
 
     def solve_with_score(self, curNode, stepCnt, value):
         """
@@ -607,6 +891,8 @@ class PokerPlayer:
             except ZeroDivisionError: # stepCnt为1，改为1.01
                 score = log(value, 1.01)
             finally:
+                if self.tracer:
+                    self.tracer.record('leaf', curNode, value=value, score=score, best=score > self.score)
                 if score > self.score: # 如果当前的score更高，就用新的score和path进行更新
                     self.score = score
                     self.path = curNode.path()
@@ -623,6 +909,9 @@ class PokerPlayer:
         #     finally:
         #         if score < self.score:
         #             return
+        self.__report(self.score)
+        if self.tracer:
+            self.tracer.record('expand', curNode, value=value)
         for kind in curNode.possibleStep:
             if kind == 'four with two single':
                 if len(curNode.possibleStep['four']) > 1:  # 考虑四带四
@@ -690,7 +979,7 @@ class PokerPlayer:
                     stepCnt += 1
                     if kind == 'four with two pair' or kind == 'four with two single':  # 如果是四带一对或者四带两对，则value加4
                         value += 4
-                    elif (kind == 'three' or kind == 'four'
+                    elif (kind == 'three' or kind == 'four' or kind == 'bomb'
                             or kind == 'three with pair' or kind == 'three with single'):
                         value += 3
                     break
@@ -709,6 +998,8 @@ class PokerPlayer:
             except ZeroDivisionError: # stepCnt为1
                 score = 0
             finally:
+                if self.tracer:
+                    self.tracer.record('leaf', curNode, value=value, score=score, best=score > self.score)
                 if score > self.score: # 如果当前的score更高，就用新的score和path进行更新
                     self.score = score
                     self.path = curNode.path()
@@ -725,6 +1016,9 @@ class PokerPlayer:
         #     finally:
         #         if score < self.score:
         #             return
+        self.__report(self.score)
+        if self.tracer:
+            self.tracer.record('expand', curNode, value=value, deep=True)
         kindLst = []  # 不出所有顺子
         for kind in curNode.possibleStep:
             if kind == 'four with two single':
@@ -741,7 +1035,7 @@ class PokerPlayer:
                 tmpCnt += 1
                 if kind == 'four with two pair' or kind == 'four with two single':  # 如果是四带一对或者四带两对，则value加4
                     newValue = value + 4
-                elif (kind == 'three' or kind == 'four'
+                elif (kind == 'three' or kind == 'four' or kind == 'bomb'
                       or kind == 'three with pair' or kind == 'three with single'):
                     newValue = value + 3
 
@@ -763,35 +1057,32 @@ class PokerPlayer:
         :param opponentAction:  元组类型，(对手出的牌的类型, 实际出的牌的数组)
         :return:                (自己出的牌的类型, 实际出的牌的数组)
         """
+        self.__report(len(self.curNode))
+        if self.engine and hasattr(self.engine, 'observe'): # 需要对手出牌历史的引擎在每个回合都要记录
+            self.engine.observe(self, opponentAction)
+        # 如果局面在终局库的范围内，就直接查表，查表需要对手的手牌，不能用于只知道自己手牌的引擎
+        if self.tablebase and self.opponent and getattr(self.engine, 'perfectInformation', True):
+            found, response = self.tablebase.decide(self, opponentAction)
+            if found:
+                if response:
+                    self.curNode = self.curNode.get_child(response[1])
+                return response
+        if self.engine: # 如果设置了决策引擎，就由引擎决定出牌
+            response = self.engine.decide(self, opponentAction)
+            if response:
+                self.curNode = self.curNode.get_child(response[1])
+            return response
         if not opponentAction: # 如果对手没有出牌，就按可能出牌种类的顺序进行出牌
             for kind in self.curNode.possibleStep:
                 if self.curNode.possibleStep[kind]:
                     action = self.curNode.possibleStep[kind][0]
                     self.curNode = self.curNode.get_child(action)
-                    return kind, action
-        else: # 如果对手出牌了，就根据对手出牌的类型在自己所有出牌可能中进行搜索
-            kind = opponentAction[0]
-            if kind in self.curNode.possibleStep:
-                for action in self.curNode.possibleStep[kind]:
-                    if kind != 'single':
-                        # 根据情况判断是否可以出牌
-                        if len(action) == len(opponentAction[1]) and action[0] > opponentAction[1][0]:
-                            self.curNode = self.curNode.get_child(action)
-                            return kind, action
-                    else:
-                        if action > opponentAction[1]:
-                            self.curNode = self.curNode.get_child(action)
-                            return kind, action
-            elif kind == 'four with two pair':
-                if len(self.curNode.possibleStep['four']) > 1:
-                    if self.curNode.possibleStep['four'][0][0] > opponentAction[1][0]:
-                        action = self.curNode.possibleStep['four'][0] + self.curNode.possibleStep['four'][1]
-                        return kind, action
-                    else:
-                        for four in self.curNode.possibleStep['four']:
-                            if four[0] > opponentAction[1][0]:
-                                action = self.curNode.possibleStep['four'][0] + four
-                                return kind, action
+                    return PokerNode.get_action_kind(kind, action), action
+        else: # 如果对手出牌了，就在应答索引中二分查找能压过对手的最小出牌
+            response = self.curNode.find_response(opponentAction[0], opponentAction[1])
+            if response:
+                self.curNode = self.curNode.get_child(response[1])
+                return response
         return None
 
 
@@ -1,10 +1,11 @@
 # -*- coding=utf-8 -*-
 from PyQt6.QtGui import QIcon, QGuiApplication, QPixmap, QPalette, QIntValidator
-from PyQt6.QtWidgets import QMainWindow, QApplication, QPushButton, QGridLayout, QHBoxLayout, QWidget, QLabel, \
-    QLineEdit, QMessageBox, QVBoxLayout
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QMainWindow, QApplication, QPushButton, QGridLayout, QWidget, QLabel, \
+    QLineEdit, QMessageBox, QVBoxLayout, QSpinBox
+from PyQt6.QtCore import Qt, QTimer, QPoint
 from PyQt6 import QtCore
-from poker import Poker
+from poker import Poker, SolveCancelled, Deck
+import os
 import sys
 from process import Process
 from math import floor
@@ -25,6 +26,167 @@ class MyQLabel(QLabel):
         self.button_clicked_signal.connect(func)
 
 
+class CardSprites:
+    """
+    扑克牌图片的缓存
+    启动时一次性读取54张图片并缩放到显示大小，之后发牌时所有标签共用这些QPixmap，不再读取和解码文件
+    多副牌时不同副的同一张牌共用一张图片
+    """
+    width = 102 # 扑克牌显示的宽度
+    height = 142 # 扑克牌显示的高度
+    __pixmaps = None
+
+    @staticmethod
+    def load(directory="Cards"):
+        """
+        读取并缩放所有扑克牌图片，需要在创建QApplication之后调用
+        :param directory: 图片所在的文件夹，图片名为扑克牌顺序1~54
+        """
+        if CardSprites.__pixmaps is not None:
+            return
+        CardSprites.__pixmaps = [None]
+        for order in range(1, 55):
+            pixmap = QPixmap(os.path.join(directory, str(order) + ".png"))
+            CardSprites.__pixmaps.append(pixmap.scaled(CardSprites.width, CardSprites.height,
+                                                       Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                       Qt.TransformationMode.SmoothTransformation))
+
+    @staticmethod
+    def get(order):
+        """
+        :param order: 扑克牌顺序，多副牌时可以超过54
+        :return:      缩放好的QPixmap
+        """
+        CardSprites.load()
+        return CardSprites.__pixmaps[Deck.split(order)[1]]
+
+
+class CardView(QWidget):
+    """
+    显示一排相互重叠的扑克牌
+    扑克牌标签在不同的CardView之间移动，每次变化只移动位置改变了的标签，不重建布局
+    不再显示的标签回收到标签池中，下一次发牌时重复使用
+    """
+    pool = [] # 空闲的扑克牌标签，所有CardView共用
+
+    def __init__(self, parent=None, overlap=80):
+        """
+        :param overlap: 相邻两张牌重叠的宽度
+        """
+        super(CardView, self).__init__(parent)
+        self.overlap = overlap
+        self.maxWidth = None # 最大显示宽度，超过时缩小牌的间隔
+        self.cards = [] # 当前显示的(扑克牌顺序, 标签)，从左到右排列
+
+    def deal(self, orders):
+        """
+        回收当前的牌，按照扑克牌顺序显示新的一手牌
+        :param orders: 扑克牌顺序的序列
+        """
+        self.clear()
+        for order in sorted(orders):
+            label = CardView.pool.pop() if CardView.pool else QLabel()
+            label.setFixedSize(CardSprites.width, CardSprites.height)
+            label.setPixmap(CardSprites.get(order))
+            self.cards.append((order, label))
+            self.__attach(label)
+        self.relayout()
+
+    def add(self, cards):
+        """
+        把从其他CardView中取出的牌放在最右边
+        :param cards: take返回的(扑克牌顺序, 标签)列表
+        """
+        for order, label in cards:
+            self.cards.append((order, label))
+            self.__attach(label)
+        self.relayout()
+
+    def take(self, orders):
+        """
+        取出指定的牌，剩下的牌向左靠拢
+        :param orders: 扑克牌顺序的序列
+        :return:       (扑克牌顺序, 标签)列表
+        """
+        orders = set(orders)
+        taken = [card for card in self.cards if card[0] in orders]
+        self.cards = [card for card in self.cards if card[0] not in orders]
+        self.relayout()
+        return taken
+
+    def clear(self):
+        """
+        回收所有的牌
+        """
+        for order, label in self.cards:
+            label.hide()
+            CardView.pool.append(label)
+        self.cards = []
+        self.relayout()
+
+    def set_max_width(self, maxWidth):
+        self.maxWidth = maxWidth
+        self.relayout()
+
+    def __attach(self, label):
+        if label.parent() is not self:
+            label.setParent(self)
+        label.raise_() # 后加入的牌显示在上面
+        label.show()
+
+    def relayout(self):
+        """
+        重新计算每张牌的位置，只移动位置发生变化的标签
+        """
+        gap = CardSprites.width - self.overlap
+        if self.maxWidth and len(self.cards) > 1:
+            gap = max(1, min(gap, (self.maxWidth - CardSprites.width) // (len(self.cards) - 1)))
+        for idx, (order, label) in enumerate(self.cards):
+            pos = QPoint(idx * gap, 0)
+            if label.pos() != pos:
+                label.move(pos)
+        width = gap * (len(self.cards) - 1) + CardSprites.width if self.cards else 0
+        self.setFixedSize(width, CardSprites.height)
+
+
+class SolveWorker(QtCore.QThread):
+    """
+    在后台线程中求解，避免界面卡住
+    求解的进度、结果和取消都通过信号传回界面线程
+    求解函数为生成器时，每产生一项就通过item_signal传回，结果为None
+    """
+    progress_signal = QtCore.pyqtSignal(int, float)
+    item_signal = QtCore.pyqtSignal(object)
+    result_signal = QtCore.pyqtSignal(object)
+    cancelled_signal = QtCore.pyqtSignal()
+
+    def __init__(self, solve, stream=False, parent=None):
+        """
+        :param solve:  求解函数，如Process.solve_without_score
+        :param stream: 求解函数是否为生成器，如Process.iter_gaming
+        """
+        super(SolveWorker, self).__init__(parent)
+        self.solve = solve
+        self.stream = stream
+
+    def run(self):
+        try:
+            if self.stream:
+                for item in self.solve():
+                    self.item_signal.emit(item)
+                result = None
+            else:
+                result = self.solve()
+        except SolveCancelled:
+            self.cancelled_signal.emit()
+            return
+        self.result_signal.emit(result)
+
+    def report(self, nodes, best):
+        # 在求解的线程中调用，信号会排队到界面线程
+        self.progress_signal.emit(nodes, float(best))
+
+
 class PokerWindow(QMainWindow):
     """
     斗地主主窗口
@@ -34,6 +196,12 @@ class PokerWindow(QMainWindow):
         super().__init__()
         self.task = 0 # 当前的题目
         self.process = Process()
+        self.worker = None # 后台求解的线程
+        CardSprites.load()
+        self.autoPlayTimer = QTimer(self) # 自动播放出牌步骤的定时器
+        self.autoPlayTimer.timeout.connect(lambda: self.showNext())
+        self.playInterval = 500 # 自动播放时每一步的间隔(毫秒)
+        self.showNext = None # 显示下一步出牌的函数
         self.resize(821, 472)
         self.setMinimumSize(821, 472)
         self.center()
@@ -50,6 +218,9 @@ class PokerWindow(QMainWindow):
         self.homeBtn.hide()
 
         self.homeBtn.clicked.connect(self.clicked_home_btn)
+        self.pokerView = CardView(self) # 下方的手牌，第一二问的手牌和第三问玩家1的手牌
+        self.player2PokerView = CardView(self) # 上方第三问玩家2的手牌
+        self.actionView = CardView(self) # 中间刚出的牌
         self.win = QWidget(self)
         self.__init_page()
         self.init_first_page()
@@ -65,7 +236,14 @@ class PokerWindow(QMainWindow):
             if pos[0] == 0 and pos[1] == 6:
                 self.grid.addWidget(self.homeBtn, *pos)
                 continue
+            if pos[0] == 0 and pos[1] == 3:
+                self.grid.addWidget(self.player2PokerView, *pos)
+                continue
+            if pos[0] == 6 and pos[1] == 3:
+                self.grid.addWidget(self.pokerView, *pos)
+                continue
             self.grid.addWidget(QWidget(self), *pos)
+        self.grid.addWidget(self.actionView, 3, 3)
         self.centerWidget.setLayout(self.centerLayout)
         self.win.setLayout(self.grid)
         self.setCentralWidget(self.win)
@@ -133,6 +311,7 @@ class PokerWindow(QMainWindow):
         self.centerLayout.addSpacing(20)
         self.centerLayout.addWidget(self.pokerCntInput)
         self.centerLayout.addSpacing(20)
+        self.add_deck_cnt_input()
         self.centerLayout.addWidget(confirmBtn)
         
     def init_random_deal_page_task3(self):
@@ -161,8 +340,23 @@ class PokerWindow(QMainWindow):
         self.centerLayout.addSpacing(20)
         self.centerLayout.addWidget(self.player2PokerCntInput)
         self.centerLayout.addSpacing(20)
+        self.add_deck_cnt_input()
         self.centerLayout.addWidget(confirmBtn)
 
+    def add_deck_cnt_input(self):
+        """
+        随机发牌界面中选择牌的副数
+        """
+        deckHint = QLabel("牌的副数: ")
+        deckHint.setStyleSheet("color:white")
+        self.deckCntInput = QSpinBox(self)
+        self.deckCntInput.setRange(1, Deck.MAX_DECKS)
+        self.deckCntInput.setValue(self.process.deck.decks)
+        self.centerLayout.addWidget(deckHint)
+        self.centerLayout.addSpacing(20)
+        self.centerLayout.addWidget(self.deckCntInput)
+        self.centerLayout.addSpacing(20)
+
     def init_specified_deal_page(self):
         """
         自行选择牌数
@@ -172,7 +366,6 @@ class PokerWindow(QMainWindow):
             if child.widget():
                 child.widget().deleteLater()
         self.pokerOrder = []
-        self.pokerImgs = [0 for _ in range(55)]
         self.selectWidget = QWidget(self)
         self.selectWidget.setMaximumSize(self.width() - 160, self.height() - 80)
         selectLayout = QGridLayout(self.selectWidget)
@@ -202,13 +395,7 @@ class PokerWindow(QMainWindow):
         self.selectWidget.deleteLater()
         self.confirmBtn.deleteLater()
         self.process.specified_deal(self.pokerOrder)
-        for order in self.pokerOrder:
-            pixmapLbl = QLabel(self)
-            pixmapLbl.setFixedSize(102, 142)
-            tmpPixmap = QPixmap("Cards\\" + str(order) + ".png")
-            pixmapLbl.setScaledContents(True)
-            pixmapLbl.setPixmap(tmpPixmap)
-            self.pokerImgs[order] = pixmapLbl  # 扑克图片数组
+        self.pokerView.deal(self.pokerOrder)
         self.show_poker_task12()
         if self.task == 1:
             self.task_one()
@@ -219,6 +406,8 @@ class PokerWindow(QMainWindow):
         """
         点击返回键后的函数
         """
+        self.stop_solve()
+        self.stop_auto_play()
         self.task = 0
         self.init_first_page()
         self.homeBtn.hide()
@@ -228,30 +417,6 @@ class PokerWindow(QMainWindow):
             pass
         except AttributeError:
             pass
-        try:
-            self.pokerWidget.deleteLater()
-        except RuntimeError:
-            pass
-        except AttributeError:
-            pass
-        try:
-            self.player1PokerWidget.deleteLater()
-        except RuntimeError:
-            pass
-        except AttributeError:
-            pass
-        try:
-            self.player2PokerWidget.deleteLater()
-        except RuntimeError:
-            pass
-        except AttributeError:
-            pass
-        try:
-            self.actionWidget.deleteLater()
-        except RuntimeError:
-            pass
-        except AttributeError:
-            pass
         try:
             self.passPlayLbl.deleteLater()
         except RuntimeError:
@@ -276,6 +441,17 @@ class PokerWindow(QMainWindow):
             pass
         except AttributeError:
             pass
+        for name in ('autoPlayBtn', 'playIntervalInput'):
+            try:
+                getattr(self, name).deleteLater()
+            except RuntimeError:
+                pass
+            except AttributeError:
+                pass
+        self.hide_progress()
+        for view in (self.pokerView, self.player2PokerView, self.actionView):
+            view.clear()
+        self.actionView.show()
 
     def clicked_task_btn(self):
         """
@@ -299,10 +475,12 @@ class PokerWindow(QMainWindow):
         if not self.pokerCntInput.text():
             warning = QMessageBox()
             warning.warning(self, '警告', '未输入扑克牌数量', QMessageBox.standardButtons(warning).Yes)
-        elif int(self.pokerCntInput.text()) > 54 or int(self.pokerCntInput.text()) < 1:
+        elif int(self.pokerCntInput.text()) > self.deck_size() or int(self.pokerCntInput.text()) < 1:
             warning = QMessageBox()
-            warning.warning(self, '警告', '扑克牌数量需要在1~54之间', QMessageBox.standardButtons(warning).Yes)
+            warning.warning(self, '警告', '扑克牌数量需要在1~%d之间' % self.deck_size(),
+                            QMessageBox.standardButtons(warning).Yes)
         else:
+            self.process.set_decks(self.deckCntInput.value())
             while self.centerLayout.count():
                 child = self.centerLayout.takeAt(0)
                 if child.widget():
@@ -317,31 +495,32 @@ class PokerWindow(QMainWindow):
         if not self.player1PokerCntInput.text() or not self.player2PokerCntInput.text():
             warning = QMessageBox()
             warning.warning(self, '警告', '未输入扑克牌数量', QMessageBox.standardButtons(warning).Yes)
-        elif (int(self.player1PokerCntInput.text()) > 54 or int(self.player1PokerCntInput.text()) < 1 or
-                int(self.player2PokerCntInput.text()) > 54 or int(self.player2PokerCntInput.text()) < 1):
+        elif (int(self.player1PokerCntInput.text()) > self.deck_size() or int(self.player1PokerCntInput.text()) < 1 or
+                int(self.player2PokerCntInput.text()) > self.deck_size() or int(self.player2PokerCntInput.text()) < 1):
             warning = QMessageBox()
-            warning.warning(self, '警告', '扑克牌数量需要在1~54之间', QMessageBox.standardButtons(warning).Yes)
+            warning.warning(self, '警告', '扑克牌数量需要在1~%d之间' % self.deck_size(),
+                            QMessageBox.standardButtons(warning).Yes)
         else:
+            self.process.set_decks(self.deckCntInput.value())
             while self.centerLayout.count():
                 child = self.centerLayout.takeAt(0)
                 if child.widget():
                     child.widget().deleteLater()
             self.random_deal_task3(int(self.player1PokerCntInput.text()), int(self.player2PokerCntInput.text()))
 
+    def deck_size(self):
+        """
+        当前选择的副数对应的总张数
+        """
+        return Deck.SIZE * self.deckCntInput.value()
+
     def random_deal(self, pokerCnt):
         """
         随机发牌
         :param pokerCnt: 发牌的数量
         """
         self.pokerOrder = self.process.random_deal(pokerCnt)
-        self.pokerImgs = [0 for _ in range(55)]
-        for order in self.pokerOrder:
-            pixmapLbl = QLabel(self)
-            pixmapLbl.setFixedSize(102, 142)
-            tmpPixmap = QPixmap("Cards\\" + str(order) + ".png")
-            pixmapLbl.setScaledContents(True)
-            pixmapLbl.setPixmap(tmpPixmap)
-            self.pokerImgs[order] = pixmapLbl  # 扑克图片数组
+        self.pokerView.deal(self.pokerOrder)
         self.show_poker_task12()
         if self.task == 1:
             self.task_one()
@@ -350,147 +529,221 @@ class PokerWindow(QMainWindow):
 
     def random_deal_task3(self, player1PokerCnt, player2PokerCnt):
         self.player1PokerOrder = self.process.deal_player1(player1PokerCnt)
-        self.player1PokerImgs = [0 for _ in range(55)]
-        for order in self.player1PokerOrder:
-            pixmapLbl = QLabel(self)
-            pixmapLbl.setFixedSize(102, 142)
-            tmpPixmap = QPixmap("Cards\\" + str(order) + ".png")
-            pixmapLbl.setScaledContents(True)
-            pixmapLbl.setPixmap(tmpPixmap)
-            self.player1PokerImgs[order] = pixmapLbl  # 扑克图片数组
+        self.pokerView.deal(self.player1PokerOrder)
         self.player2PokerOrder = self.process.deal_player2(player2PokerCnt)
-        self.player2PokerImgs = [0 for _ in range(55)]
-        for order in self.player2PokerOrder:
-            pixmapLbl = QLabel(self)
-            pixmapLbl.setFixedSize(102, 142)
-            tmpPixmap = QPixmap("Cards\\" + str(order) + ".png")
-            pixmapLbl.setScaledContents(True)
-            pixmapLbl.setPixmap(tmpPixmap)
-            self.player2PokerImgs[order] = pixmapLbl  # 扑克图片数组
+        self.player2PokerView.deal(self.player2PokerOrder)
         self.show_poker_task3()
         self.task_three()
 
     def show_poker_task12(self):
         """
         显示扑克牌，第一二问
-        :param pos: 显示的位置，0表示下方，1表示上方
         """
-        try:
-            self.pokerWidget.deleteLater()
-        except AttributeError:
-            pass
-        except RuntimeError:
-            pass
-        pokerLayout = QHBoxLayout(self)
-        pokerLayout.addSpacing(80)
-        for pixmapLbl in self.pokerImgs:
-            if pixmapLbl:
-                pokerLayout.addWidget(pixmapLbl)
-                pokerLayout.addSpacing(-80)
-        pokerLayout.addSpacing(80)
-        self.pokerWidget = QWidget(self)
-        self.pokerWidget.setMaximumWidth(self.width() - 160)
-        self.pokerWidget.setLayout(pokerLayout)
-        self.grid.addWidget(self.pokerWidget, 6, 3)
+        self.actionView.clear()
+        self.pokerView.set_max_width(self.width() - 160)
 
     def show_poker_task3(self):
+        self.actionView.clear()
+        self.pokerView.set_max_width(self.width() - 160)
+        self.player2PokerView.set_max_width(self.width() - 160)
+
+    def start_solve(self, solve, finish, progressText, receive=None):
+        """
+        在后台线程中求解，求解过程中显示进度和取消按钮，"下一步"按钮在求解完成后才能使用
+        :param solve:        求解函数
+        :param finish:       求解完成后在界面线程中调用的函数，参数为求解结果
+        :param progressText: 进度的格式字符串，参数为(已扩展的节点数, 当前最优值)
+        :param receive:      求解函数为生成器时，每产生一项在界面线程中调用的函数
+        """
+        self.stop_solve()
+        self.progressText = progressText
+        self.progressLbl = QLabel("求解中...", self)
+        self.progressLbl.setStyleSheet("color:white")
+        self.grid.addWidget(self.progressLbl, 2, 6)
+        self.cancelBtn = QPushButton("取消", self)
+        self.cancelBtn.clicked.connect(self.clicked_cancel_btn)
+        self.grid.addWidget(self.cancelBtn, 4, 6)
+        self.worker = SolveWorker(solve, receive is not None, self)
+        self.worker.progress_signal.connect(self.show_progress)
+        if receive:
+            self.worker.item_signal.connect(receive)
+        self.worker.result_signal.connect(self.finish_solve)
+        self.worker.result_signal.connect(finish)
+        self.worker.cancelled_signal.connect(self.clicked_home_btn)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.process.set_progress(self.worker.report)
+        self.worker.start()
+
+    def show_progress(self, nodes, best):
+        self.progressLbl.setText(self.progressText % (nodes, best))
+
+    def finish_solve(self):
+        """
+        求解完成后隐藏进度，启用"下一步"按钮
+        """
+        self.worker = None
+        self.hide_progress()
+        self.nextBtn.setEnabled(True)
+        self.autoPlayBtn.setEnabled(True)
+
+    def hide_progress(self):
         try:
-            self.player1PokerWidget.deleteLater()
+            self.progressLbl.deleteLater()
+        except RuntimeError:
+            pass
         except AttributeError:
             pass
+        try:
+            self.cancelBtn.deleteLater()
         except RuntimeError:
             pass
-        try:
-            self.player2PokerWidget.deleteLater()
         except AttributeError:
             pass
+
+    def clicked_cancel_btn(self):
+        """
+        点击取消键后的函数，求解在下一次扩展节点时停止，之后返回主页
+        """
+        self.cancelBtn.setEnabled(False)
+        self.progressLbl.setText("正在取消...")
+        self.process.cancel()
+
+    def stop_solve(self):
+        """
+        停止后台求解并等待线程结束，不再处理它的结果
+        """
+        if self.worker is None:
+            return
+        worker = self.worker
+        self.worker = None
+        worker.progress_signal.disconnect()
+        if worker.stream:
+            worker.item_signal.disconnect()
+        worker.result_signal.disconnect()
+        worker.cancelled_signal.disconnect()
+        self.process.cancel()
+        worker.wait()
+
+    def closeEvent(self, event):
+        self.stop_solve()
+        super().closeEvent(event)
+
+    def init_play_buttons(self, showNext):
+        """
+        创建"下一步"按钮和自动播放的控件，求解完成之前不能使用
+        :param showNext: 显示下一步出牌的函数
+        """
+        self.showNext = showNext
+        self.nextBtn = QPushButton("下一步", self)
+        self.nextBtn.clicked.connect(showNext)
+        self.nextBtn.setEnabled(False)
+        self.grid.addWidget(self.nextBtn, 3, 6)
+        self.autoPlayBtn = QPushButton("自动播放", self)
+        self.autoPlayBtn.clicked.connect(self.clicked_auto_play_btn)
+        self.autoPlayBtn.setEnabled(False)
+        self.grid.addWidget(self.autoPlayBtn, 5, 6)
+        self.playIntervalInput = QSpinBox(self)
+        self.playIntervalInput.setRange(16, 5000) # 16毫秒约为一帧
+        self.playIntervalInput.setSingleStep(100)
+        self.playIntervalInput.setSuffix(" ms")
+        self.playIntervalInput.setValue(self.playInterval)
+        self.playIntervalInput.valueChanged.connect(self.set_play_interval)
+        self.grid.addWidget(self.playIntervalInput, 6, 6)
+
+    def clicked_auto_play_btn(self):
+        """
+        开始或暂停自动播放
+        """
+        if self.autoPlayTimer.isActive():
+            self.stop_auto_play()
+        else:
+            self.autoPlayTimer.start(self.playInterval)
+            self.autoPlayBtn.setText("暂停")
+
+    def set_play_interval(self, interval):
+        self.playInterval = interval
+        if self.autoPlayTimer.isActive():
+            self.autoPlayTimer.setInterval(interval)
+
+    def stop_auto_play(self):
+        self.autoPlayTimer.stop()
+        try:
+            self.autoPlayBtn.setText("自动播放")
         except RuntimeError:
             pass
-        pokerLayout = QHBoxLayout(self)
-        pokerLayout.addSpacing(80)
-        for pixmapLbl in self.player1PokerImgs:
-            if pixmapLbl:
-                pokerLayout.addWidget(pixmapLbl)
-                pokerLayout.addSpacing(-80)
-        pokerLayout.addSpacing(80)
-        self.player1PokerWidget = QWidget(self)
-        self.player1PokerWidget.setMaximumWidth(self.width() - 160)
-        self.player1PokerWidget.setLayout(pokerLayout)
-        self.grid.addWidget(self.player1PokerWidget, 6, 3)
-
-        pokerLayout = QHBoxLayout(self)
-        pokerLayout.addSpacing(80)
-        for pixmapLbl in self.player2PokerImgs:
-            if pixmapLbl:
-                pokerLayout.addWidget(pixmapLbl)
-                pokerLayout.addSpacing(-80)
-        pokerLayout.addSpacing(80)
-        self.player2PokerWidget = QWidget(self)
-        self.player2PokerWidget.setMaximumWidth(self.width() - 160)
-        self.player2PokerWidget.setLayout(pokerLayout)
-        self.grid.addWidget(self.player2PokerWidget, 0, 3)
+        except AttributeError:
+            pass
 
     def task_one(self):
         """
         搜索最少的步骤的函数
         """
-        self.nextBtn = QPushButton("下一步", self)
-        self.nextBtn.clicked.connect(self.show_next_action_task_12)
-        self.grid.addWidget(self.nextBtn, 3, 6)
-        [self.step, self.path] = self.process.solve_without_score()
+        self.init_play_buttons(self.show_next_action_task_12)
+        self.start_solve(self.process.solve_without_score, self.finish_task_one, "已扩展%d个节点\n代价下界: %g")
+
+    def finish_task_one(self, result):
+        [self.step, self.path] = result
 
     def task_two(self):
         """
         搜索score最大的出牌步骤
         """
-        self.nextBtn = QPushButton("下一步", self)
-        self.nextBtn.clicked.connect(self.show_next_action_task_12)
-        self.grid.addWidget(self.nextBtn, 3, 6)
-        [self.score, self.step,  self.path] = self.process.solve_with_score()
+        self.init_play_buttons(self.show_next_action_task_12)
+        self.start_solve(self.process.solve_with_score, self.finish_task_two, "已扩展%d个节点\n最高score: %.4f")
+
+    def finish_task_two(self, result):
+        [self.score, self.step,  self.path] = result
 
     def task_three(self):
         """
-        对战
+        对战，对战在后台逐步进行，每决定一次出牌就可以显示
         """
-        self.nextBtn = QPushButton("下一步", self)
-        self.nextBtn.clicked.connect(self.show_next_action_task3)
-        self.grid.addWidget(self.nextBtn, 3, 6)
+        self.init_play_buttons(self.show_next_action_task3)
         self.curPlayerLbl = QLabel("玩家1出牌", self)
         self.curPlayerLbl.setStyleSheet("color:white")
         self.grid.addWidget(self.curPlayerLbl, 3, 0)
-        [self.player1Actions, self.player2Actions, self.winner] = self.process.gaming()
-        self.curPlayer = 1 # 当前的出牌玩家
         self.passPlayLbl = QLabel("不出", self)
         self.passPlayLbl.setStyleSheet("color:white")
         self.grid.addWidget(self.passPlayLbl, 3, 3)
         self.passPlayLbl.hide()
+        self.plays = [] # 已经决定但还没有显示的(玩家编号, 出牌)
+        self.start_solve(self.process.iter_gaming, self.finish_task_three, "已出牌%d次\n剩余%d张", self.receive_play)
+
+    def receive_play(self, play):
+        """
+        收到后台对战决定的一次出牌
+        """
+        self.plays.append(play)
+        self.nextBtn.setEnabled(True)
+        self.autoPlayBtn.setEnabled(True)
+
+    def finish_task_three(self, result):
+        self.winner = self.process.winner
+        self.check_game_over()
+
+    def check_game_over(self):
+        """
+        对战已经结束并且所有出牌都显示完时，显示获胜的玩家
+        """
+        if self.plays or self.worker is not None:
+            return
+        self.stop_auto_play()
+        self.nextBtn.deleteLater()
+        self.passPlayLbl.deleteLater()
+        self.curPlayerLbl.deleteLater()
+        QMessageBox.about(self, "提示", "玩家" + str(self.winner) + "获胜")
+        self.clicked_home_btn()
 
     def show_next_action_task_12(self):
         """
         显示第一二问的出牌步骤
         """
         if self.path:
-            try:
-                self.actionWidget.deleteLater()
-            except AttributeError:
-                pass
-            except RuntimeError:
-                pass
             action = self.path.pop(0)# 得到下一个步骤
-            actionLayout = QHBoxLayout(self)
-            actionLayout.addSpacing(80)
-            for order in action:
-                pixmapLbl = self.pokerImgs[order]
-                self.pokerImgs[order] = 0
-                actionLayout.addWidget(pixmapLbl)
-                actionLayout.addSpacing(-80)
-            actionLayout.addSpacing(80)
-            self.actionWidget = QWidget(self)
-            self.actionWidget.setMaximumWidth(self.width() - 160)
-            self.actionWidget.setLayout(actionLayout)
-            self.grid.addWidget(self.actionWidget, 3, 3)
-            self.show_poker_task12()
+            self.actionView.clear()
+            self.actionView.add(self.pokerView.take(action))
         if not self.path:
+            self.stop_auto_play()
             self.nextBtn.deleteLater()
             if self.task == 1:
                 QMessageBox.about(self, "提示", "总共用了" + str(self.step) + "步")
@@ -500,66 +753,22 @@ class PokerWindow(QMainWindow):
 
     def show_next_action_task3(self):
         """
-        显示第一二问的出牌步骤
-        """
-        if self.player1Actions or self.player2Actions:
-            try:
-                self.actionWidget.deleteLater()
-            except AttributeError:
-                pass
-            except RuntimeError:
-                pass
-            if self.curPlayer == 1:
-                self.curPlayerLbl.setText("玩家1出牌")
-                action = self.player1Actions.pop(0)# 得到下一个步骤
-                if action: # 如果出牌的话
-                    self.passPlayLbl.hide()
-                    actionLayout = QHBoxLayout(self)
-                    actionLayout.addSpacing(80)
-                    for order in action:
-                        pixmapLbl = self.player1PokerImgs[order]
-                        self.player1PokerImgs[order] = 0
-                        actionLayout.addWidget(pixmapLbl)
-                        actionLayout.addSpacing(-80)
-                    actionLayout.addSpacing(80)
-                    self.actionWidget = QWidget(self)
-                    self.actionWidget.setMaximumWidth(self.width() - 160)
-                    self.actionWidget.setLayout(actionLayout)
-                    self.grid.addWidget(self.actionWidget, 3, 3)
-                    self.show_poker_task3()
-                else: # 如果不出牌
-                    self.actionWidget.hide()
-                    self.passPlayLbl.show()
-                self.curPlayer = 2
-            elif self.curPlayer == 2:
-                self.passPlayLbl.hide()
-                self.curPlayerLbl.setText("玩家2出牌")
-                action = self.player2Actions.pop(0)# 得到下一个步骤
-                if action: # 如果出牌的话
-                    actionLayout = QHBoxLayout(self)
-                    actionLayout.addSpacing(80)
-                    for order in action:
-                        pixmapLbl = self.player2PokerImgs[order]
-                        self.player2PokerImgs[order] = 0
-                        actionLayout.addWidget(pixmapLbl)
-                        actionLayout.addSpacing(-80)
-                    actionLayout.addSpacing(80)
-                    self.actionWidget = QWidget(self)
-                    self.actionWidget.setMaximumWidth(self.width() - 160)
-                    self.actionWidget.setLayout(actionLayout)
-                    self.grid.addWidget(self.actionWidget, 3, 3)
-                    self.show_poker_task3()
-                else:  # 如果不出牌
-                    self.actionWidget.hide()
-                    self.passPlayLbl.show()
-                self.curPlayer = 1
-        if not (self.player1Actions or self.player2Actions):
-            self.nextBtn.deleteLater()
-            self.passPlayLbl.deleteLater()
-            self.curPlayerLbl.deleteLater()
-            QMessageBox.about(self, "提示", "玩家" + str(self.winner) + "获胜")
-            self.clicked_home_btn()
-            
+        显示第三问的出牌步骤，下一次出牌还没有决定时等待
+        """
+        if not self.plays:
+            return
+        player, action = self.plays.pop(0)# 得到下一个步骤
+        self.curPlayerLbl.setText("玩家" + str(player) + "出牌")
+        if action: # 如果出牌的话
+            self.passPlayLbl.hide()
+            self.actionView.clear()
+            self.actionView.add((self.pokerView if player == 1 else self.player2PokerView).take(action))
+            self.actionView.show()
+        else: # 如果不出牌
+            self.actionView.hide()
+            self.passPlayLbl.show()
+        self.check_game_over()
+
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
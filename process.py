@@ -1,4 +1,6 @@
-from poker import PokerPlayer, Poker
+from poker import PokerPlayer, Poker, Deck
+from profiler import SolveProfiler
+from contextlib import nullcontext
 
 
 class Process:
@@ -7,90 +9,208 @@ class Process:
     """
 
     def __init__(self):
+        self.profiler = SolveProfiler.from_env() # 性能分析器，None表示不分析
+        self.player1Engine = None # 玩家1的决策引擎，None表示贪心出牌
+        self.player2Engine = None # 玩家2的决策引擎
+        self.tablebase = None # 双方共用的终局库，参见tablebase.Tablebase
+        self.stepEngine = None # 第一问的求解引擎，None表示A*，参见dpsolver.DPSolver
+        self.progress = None # 求解进度的回调函数，参见PokerPlayer.set_progress
+        self.winner = 0 # 上一次对战获胜的玩家
+        self.deck = Deck() # 随机发牌使用的牌
         self.__reset()
 
     def __reset(self):
-        self.problem = PokerPlayer()
-        self.player1 = PokerPlayer()
-        self.player2 = PokerPlayer()
+        self.problem = PokerPlayer(self.deck)
+        self.player1 = PokerPlayer(self.deck)
+        self.player2 = PokerPlayer(self.deck)
+
+    def set_decks(self, decks):
+        """
+        设置随机发牌使用几副牌
+        """
+        self.deck = Deck(decks)
+        self.__reset()
 
     def random_deal(self, pokerCnt):
         self.__reset()
         self.problem.deal_random(pokerCnt)
         return self.problem.get_init_order()
 
+    def random_deal_mask(self, pokerCnt):
+        """
+        随机发牌，返回初始牌的掩码，参见cardmask
+        """
+        self.__reset()
+        self.problem.deal_random(pokerCnt)
+        return self.problem.get_init_mask()
+
+    def mask_deal(self, mask):
+        """
+        按照手牌掩码发牌，与specified_deal相同但不需要转换扑克牌顺序列表
+        """
+        self.__reset()
+        self.problem.deal_mask(mask)
+
     def specified_deal(self, pokerOrderLst):
         self.__reset()
-        pokerLst = []
-        for order in pokerOrderLst:
-            pokerLst.append((Poker(order).num, Poker(order).suit))
-        self.problem.deal_specified(pokerLst)
-
-    def solve_without_score(self):
-        self.problem.solve_without_score()
-        path = []
+        self.problem.deal_order(pokerOrderLst) # 多副牌时需要保留第几副牌，不能只用点数和花色
+
+    def set_progress(self, callback):
+        """
+        设置求解进度的回调函数，第一二问的参数为(已扩展的节点数, 当前最优值)，第三问为(已出牌的次数, 剩余张数)
+        """
+        self.progress = callback
+
+    def cancel(self):
+        """
+        取消正在进行的求解，可以在其他线程中调用，求解的方法会抛出poker.SolveCancelled
+        """
+        self.problem.cancel()
+        self.player1.cancel()
+        self.player2.cancel()
+
+    def __profile(self, method, *nodes):
+        """
+        得到求解时使用的性能分析上下文
+        :param method: 求解方法名
+        :param nodes:  参与求解的手牌节点，用于生成报告名
+        """
+        if not self.profiler:
+            return nullcontext()
+        tag = method + '-' + '-'.join(node.get_canonical_id() for node in nodes)
+        return self.profiler.profile(tag)
+
+    @staticmethod
+    def to_order(action):
+        """
+        将出的牌转化为扑克牌顺序的列表
+        :param action: 出的牌，单张时为Poker，其他为Poker的数组
+        :return:       扑克牌顺序列表，参见Poker.get_order
+        """
+        try:
+            return [Poker.get_order(item) for item in action]
+        except TypeError:
+            return [Poker.get_order(action)]
+
+    @staticmethod
+    def to_mask(action):
+        """
+        将出的牌转化为掩码，参见cardmask
+        :param action: 出的牌，单张时为Poker，其他为Poker的数组
+        """
+        try:
+            mask = 0
+            for item in action:
+                mask |= 1 << (Poker.get_order(item) - 1)
+            return mask
+        except TypeError:
+            return 1 << (Poker.get_order(action) - 1)
+
+    def iter_solve_without_score(self, mask=False):
+        """
+        逐步产生第一问出牌步骤的生成器，每一步为扑克牌顺序列表
+        A*只有找到终点之后才能确定路径，所以第一步在求解完成后产生，之后的步骤按需转换
+        步数存在self.problem.step中
+        :param mask: 为True时每一步为掩码
+        """
+        self.problem.set_progress(self.progress)
+        self.problem.stepEngine = self.stepEngine
+        with self.__profile('solve_without_score', self.problem.initNode):
+            self.problem.solve_without_score()
+        convert = Process.to_mask if mask else Process.to_order
         for action in self.problem.path:
-            actionOrder = []
-            try:
-                for item in action:
-                    actionOrder.append(Poker.get_order(item))
-            except TypeError:
-                actionOrder.append(Poker.get_order(action))
-            path.append(actionOrder)
+            yield convert(action)
+
+    def solve_without_score(self, mask=False):
+        path = list(self.iter_solve_without_score(mask))
         return self.problem.step, path
 
-    def solve_with_score(self):
-        self.problem.solve_with_score(self.problem.initNode, 0, 0)
-        path = []
+    def iter_solve_with_score(self, mask=False):
+        """
+        逐步产生第二问出牌步骤的生成器，每一步为扑克牌顺序列表
+        score和步数存在self.problem.score和self.problem.step中
+        :param mask: 为True时每一步为掩码
+        """
+        self.problem.set_progress(self.progress)
+        with self.__profile('solve_with_score', self.problem.initNode):
+            self.problem.solve_with_score(self.problem.initNode, 0, 0)
+        convert = Process.to_mask if mask else Process.to_order
         for action in self.problem.path:
-            actionOrder = []
-            try:
-                for item in action:
-                    actionOrder.append(Poker.get_order(item))
-            except TypeError:
-                actionOrder.append(Poker.get_order(action))
-            path.append(actionOrder)
+            yield convert(action)
+
+    def solve_with_score(self, mask=False):
+        path = list(self.iter_solve_with_score(mask))
         return self.problem.score, self.problem.step, path
 
     def deal_player1(self, pokerCnt):
-        self.player1 = PokerPlayer()
+        self.player1 = PokerPlayer(self.deck)
         self.player1.deal_random(pokerCnt)
         return self.player1.get_init_order()
 
     def deal_player2(self, pokerCnt):
-        self.player2 = PokerPlayer()
+        self.player2 = PokerPlayer(self.deck)
         self.player2.deal_random(pokerCnt)
         return self.player2.get_init_order()
 
-    def gaming(self):
-        action = None
+    def deal_player_mask(self, player, mask):
+        """
+        按照手牌掩码给对战的玩家发牌
+        :param player: 1或2
+        """
+        pokerPlayer = PokerPlayer(self.deck)
+        pokerPlayer.deal_mask(mask)
+        if player == 1:
+            self.player1 = pokerPlayer
+        else:
+            self.player2 = pokerPlayer
+
+    def iter_gaming(self, mask=False):
+        """
+        对战的生成器，每决定一次出牌就产生(玩家编号, 扑克牌顺序列表)，不出时列表为空
+        不需要等整局对战结束就可以开始显示，对战结束后获胜的玩家存在self.winner中
+        :param mask: 为True时出牌为掩码，不出时为0
+        """
+        self.winner = 0
+        self.player1.set_progress(self.__count_turn, 1)
+        self.player2.set_progress(self.__count_turn, 1)
+        yield from self.__gaming(Process.to_mask if mask else Process.to_order)
+
+    def gaming(self, mask=False):
         player1ActionLst = []
         player2ActionLst = []
-        winner = 0
+        for player, actionLst in self.iter_gaming(mask):
+            if player == 1:
+                player1ActionLst.append(actionLst)
+            else:
+                player2ActionLst.append(actionLst)
+        return player1ActionLst, player2ActionLst, self.winner
+
+    def __count_turn(self, nodes, best):
+        """
+        对战时每次出牌的进度回调，出牌次数为双方出牌次数之和，剩余张数为当前出牌玩家的手牌张数
+        """
+        if self.progress:
+            self.progress(self.player1.nodes + self.player2.nodes, best)
+
+    def __gaming(self, convert):
+        self.player1.engine = self.player1Engine
+        self.player2.engine = self.player2Engine
+        self.player1.opponent = self.player2
+        self.player2.opponent = self.player1
+        self.player1.tablebase = self.tablebase
+        self.player2.tablebase = self.tablebase
+        action = None
         while self.player1.curNode and self.player2.curNode:
-            action = self.player1.gaming(action)
-            actionLst = []
-            if action:
-                try:
-                    for item in action[1]:
-                        actionLst.append(Poker.get_order(item))
-                except TypeError:
-                    actionLst.append(Poker.get_order(action[1]))
-            player1ActionLst.append(actionLst)
+            # 每次出牌单独分析，不能包含yield，否则调用方处理出牌的时间也会算在求解上
+            with self.__profile('gaming1', self.player1.curNode, self.player2.curNode):
+                action = self.player1.gaming(action)
+            yield 1, convert(action[1] if action else [])
             if len(self.player1.curNode.state) == 0:
-                winner = 1
+                self.winner = 1
                 break
-            action = self.player2.gaming(action)
-            actionLst = []
-            if action:
-                try:
-                    for item in action[1]:
-                        actionLst.append(Poker.get_order(item))
-                except TypeError:
-                    actionLst.append(Poker.get_order(action[1]))
-            player2ActionLst.append(actionLst)
+            with self.__profile('gaming2', self.player2.curNode, self.player1.curNode):
+                action = self.player2.gaming(action)
+            yield 2, convert(action[1] if action else [])
             if len(self.player2.curNode.state) == 0:
-                winner = 2
+                self.winner = 2
                 break
-
-        return player1ActionLst, player2ActionLst, winner
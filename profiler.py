@@ -0,0 +1,93 @@
+import cProfile
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+class SolveProfiler:
+    """
+    单次求解的性能分析钩子，可以同时开启cProfile和tracemalloc
+    报告以手牌的规范化编号加上求解的序号命名，可以用PokerPlayer.deal_canonical直接复现
+    相同的手牌多次求解时序号不同，报告不会互相覆盖
+    通过sampleRate进行采样，只分析每第N次求解
+    """
+    def __init__(self, cpu=True, memory=True, sampleRate=1, outputDir='profile', topCnt=20):
+        """
+        :param cpu:         是否开启cProfile
+        :param memory:      是否开启tracemalloc
+        :param sampleRate:  每sampleRate次求解分析一次
+        :param outputDir:   报告输出的文件夹
+        :param topCnt:      内存报告中保留的分配位置数量
+        """
+        self.cpu = cpu
+        self.memory = memory
+        self.sampleRate = max(1, sampleRate)
+        self.outputDir = outputDir
+        self.topCnt = topCnt
+        self.count = 0 # 已经经过的求解次数
+
+    @staticmethod
+    def from_env():
+        """
+        根据环境变量创建分析器，未开启时返回None
+        POKER_PROFILE:        'cpu'、'mem'或'cpu,mem'，'1'表示两者都开启
+        POKER_PROFILE_EVERY:  采样间隔，默认为1
+        POKER_PROFILE_DIR:    报告输出的文件夹，默认为profile
+        POKER_PROFILE_TOP:    内存报告中保留的分配位置数量，默认为20
+        """
+        flag = os.environ.get('POKER_PROFILE', '').lower()
+        if not flag or flag == '0':
+            return None
+        kinds = flag.split(',')
+        cpu = 'cpu' in kinds or '1' in kinds
+        memory = 'mem' in kinds or '1' in kinds
+        if not cpu and not memory:
+            return None
+        return SolveProfiler(cpu, memory,
+                             int(os.environ.get('POKER_PROFILE_EVERY', 1)),
+                             os.environ.get('POKER_PROFILE_DIR', 'profile'),
+                             int(os.environ.get('POKER_PROFILE_TOP', 20)))
+
+    def profile(self, tag):
+        """
+        得到一次求解使用的上下文管理器，没有被采样时不做任何事情
+        :param tag: 报告文件名的前缀，一般为求解方法名加手牌的规范化编号，之后加上求解的序号
+        """
+        self.count += 1
+        if (self.count - 1) % self.sampleRate:
+            return nullcontext()
+        return self.__profile('%s-%d' % (tag, self.count))
+
+    @contextmanager
+    def __profile(self, tag):
+        profile = None
+        startedTrace = False
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            startedTrace = True
+        if self.cpu:
+            profile = cProfile.Profile()
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            snapshot = None
+            if self.memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if startedTrace:
+                    tracemalloc.stop()
+            os.makedirs(self.outputDir, exist_ok=True)
+            prefix = os.path.join(self.outputDir, tag)
+            if profile:
+                profile.dump_stats(prefix + '.pstats')
+                with open(prefix + '.txt', 'w') as f:
+                    pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(self.topCnt)
+            if snapshot:
+                with open(prefix + '.mem.txt', 'w') as f:
+                    f.write('peak: %d bytes\n' % peak)
+                    for stat in snapshot.statistics('lineno')[:self.topCnt]:
+                        f.write(str(stat) + '\n')
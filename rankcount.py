@@ -0,0 +1,180 @@
+from collections import namedtuple
+from functools import lru_cache
+
+from poker import Poker, PokerNode, Deck
+
+RANK_CNT = 14 # 点数的数量，下标0~12依次为3~2，13为JOKER
+TWO = 12
+JOKER = 13
+CAPS = Deck().caps # 一副牌中每个点数的数量上限，多副牌时使用Deck(decks).caps
+BOMB_KIND = ('four', 'bomb') # 炸弹类型，多副牌时超过四张的炸弹为'bomb'
+
+Move = namedtuple('Move', ['kind', 'cards', 'lead', 'length'])
+Move.__doc__ = """
+基于点数计数向量的出牌
+kind为出牌类型，与PokerNode.possibleStep中的类型相同，一对王为'rocket'，多副牌时超过四张的同点数牌为'bomb'
+cards为长度14的元组，表示每个点数出的张数
+lead为用于比较大小的点数下标，length为出牌的张数
+"""
+
+# 顺子类型：(类型, 相邻点数的间隔, 每个点数的张数, 最少点数个数, 起始点数下标的上限)
+# 起始点数的上限与PokerNode.search_step保持一致
+STRAIGHT_TYPE = (('three straight', 1, 3, 2, 11),
+                 ('three straight with gap', 2, 3, 2, 10),
+                 ('pair straight', 1, 2, 3, 10),
+                 ('pair straight with gap', 2, 2, 3, 7),
+                 ('single straight', 1, 1, 5, 8),
+                 ('single straight with gap', 2, 1, 5, 4))
+
+
+def to_counts(pokerLst):
+    """
+    将扑克牌序列转化为点数计数向量
+    :param pokerLst: Poker的序列，也可以是单张Poker
+    :return:         长度为14的元组
+    """
+    counts = [0] * RANK_CNT
+    if isinstance(pokerLst, Poker):
+        pokerLst = [pokerLst]
+    for poker in pokerLst:
+        counts[Poker.get_num_value(poker.num) - 3] += 1
+    return tuple(counts)
+
+
+def from_action(kind, action):
+    """
+    将PokerPlayer.gaming使用的(出牌类型, 实际出的牌)转化为Move
+    """
+    if isinstance(action, Poker):
+        return Move(kind, to_counts(action), Poker.get_num_value(action.num) - 3, 1)
+    kind = PokerNode.get_action_kind(kind, action)
+    return Move(kind, to_counts(action), Poker.get_num_value(action[0].num) - 3, len(action))
+
+
+def to_action(node, move):
+    """
+    从节点的手牌中取出与Move对应的扑克牌
+    :param node: PokerNode
+    :param move: Move
+    :return:     单张时为Poker，其他为Poker的数组，主牌在前，带的牌按点数从小到大在后
+    """
+    ranks = [move.lead] + [rank for rank in range(RANK_CNT) if move.cards[rank] and rank != move.lead]
+    action = []
+    for rank in ranks:
+        num = Poker.get_next_poker_num('3', rank)
+        action += node.pokerCnt[num][:move.cards[rank]]
+    if move.kind == 'single':
+        return action[0]
+    return action
+
+
+def apply(counts, move):
+    """
+    得到出牌之后的点数计数向量
+    """
+    return tuple(cnt - used for cnt, used in zip(counts, move.cards))
+
+
+def _unit(*pairs):
+    """
+    由(点数下标, 张数)生成计数元组
+    """
+    cards = [0] * RANK_CNT
+    for rank, cnt in pairs:
+        cards[rank] += cnt
+    return tuple(cards)
+
+
+@lru_cache(maxsize=1 << 16)
+def legal_moves(counts):
+    """
+    得到所有可能的出牌，与PokerNode.search_step中的出牌规则一致，类型的顺序也相同
+    :param counts: 点数计数向量
+    :return:       Move的元组
+    """
+    moves = []
+    for kind, gap, width, minLen, maxStart in STRAIGHT_TYPE:
+        for start in range(maxStart):
+            run = []
+            rank = start
+            while rank < TWO and counts[rank] >= width:
+                run.append(rank)
+                rank += gap
+            for length in range(minLen, len(run) + 1):
+                moves.append(Move(kind, _unit(*((r, width) for r in run[:length])), start, length * width))
+
+    singleLst = [rank for rank in range(RANK_CNT) if counts[rank]]
+    pairLst = [rank for rank in range(RANK_CNT) if counts[rank] in (2, 3)] # 与search_step相同，四张的点数不拆对子
+    threeLst = [rank for rank in range(RANK_CNT) if counts[rank] >= 3]
+    fourLst = [rank for rank in range(RANK_CNT) if counts[rank] == 4]
+    bombLst = [rank for rank in range(RANK_CNT) if counts[rank] > 4]
+
+    for four in fourLst:
+        for idx, single in enumerate(singleLst):
+            if single == four:
+                continue
+            for single2 in singleLst[idx + 1:]:
+                if single2 != four:
+                    moves.append(Move('four with two single', _unit((four, 4), (single, 1), (single2, 1)), four, 6))
+        for pair in pairLst:
+            if pair != four:
+                moves.append(Move('four with two single', _unit((four, 4), (pair, 2)), four, 6))
+    for four in fourLst:
+        for idx, pair in enumerate(pairLst):
+            if pair == four or pair == JOKER:
+                continue
+            for pair2 in pairLst[idx + 1:]:
+                if pair2 != four and pair2 != JOKER:
+                    moves.append(Move('four with two pair', _unit((four, 4), (pair, 2), (pair2, 2)), four, 8))
+    for three in threeLst:
+        for pair in pairLst:
+            if pair != three and pair != JOKER:
+                moves.append(Move('three with pair', _unit((three, 3), (pair, 2)), three, 5))
+    for three in threeLst:
+        for single in singleLst:
+            if single != three:
+                moves.append(Move('three with single', _unit((three, 3), (single, 1)), three, 4))
+    for bomb in bombLst:
+        moves.append(Move('bomb', _unit((bomb, counts[bomb])), bomb, counts[bomb]))
+    for four in fourLst:
+        moves.append(Move('four', _unit((four, 4)), four, 4))
+    for three in threeLst:
+        moves.append(Move('three', _unit((three, 3)), three, 3))
+    for pair in pairLst:
+        moves.append(Move('rocket' if pair == JOKER else 'pair', _unit((pair, 2)), pair, 2))
+    for single in singleLst:
+        moves.append(Move('single', _unit((single, 1)), single, 1))
+    return tuple(moves)
+
+
+@lru_cache(maxsize=1 << 16)
+def move_index(counts):
+    """
+    出牌在legal_moves(counts)中的下标，用于将出牌压缩成整数
+    :return: Move到下标的字典
+    """
+    return {move: idx for idx, move in enumerate(legal_moves(counts))}
+
+
+def beats(move, last):
+    """
+    判断move能否压过last，炸弹之间先比较张数，张数相同时比较点数
+    """
+    if last.kind == 'rocket':
+        return False
+    if move.kind == 'rocket':
+        return True
+    if move.kind == last.kind and move.length == last.length:
+        return move.lead > last.lead
+    if move.kind in BOMB_KIND:
+        return last.kind not in BOMB_KIND or move.length > last.length
+    return False
+
+
+def responses(counts, last):
+    """
+    得到能压过last的所有出牌，last为None时为所有可能的出牌
+    """
+    if last is None:
+        return legal_moves(counts)
+    return tuple(move for move in legal_moves(counts) if beats(move, last))
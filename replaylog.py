@@ -0,0 +1,268 @@
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+
+MAGIC = b'PKRL'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHH') # 魔数, 版本, 保留
+# 记录长度, 种子, 玩家1张数, 玩家2张数, 获胜者, 记录类型, 出牌次数, score, 玩家1耗时, 玩家2耗时
+RECORD_HEADER = struct.Struct('<IqBBbBHfff')
+FOOTER = struct.Struct('<QQ4s') # 索引位置, 记录数量, 魔数
+FOOTER_MAGIC = b'PKRX'
+OFFSET = struct.Struct('<Q')
+GAME, SOLVE = 0, 1 # 记录类型：1v1对战，单人求解(第一二问)
+
+ReplayHeader = namedtuple('ReplayHeader', ['seed', 'player1Cnt', 'player2Cnt', 'winner', 'kind', 'plies',
+                                           'score', 'player1Time', 'player2Time'])
+ReplayHeader.__doc__ = """
+一条记录的头部
+winner为1或2，没有结果或者单人求解时为0
+kind为GAME或SOLVE，单人求解时只有玩家1的手牌，score为第二问的score，不适用时为NaN
+"""
+
+Replay = namedtuple('Replay', ReplayHeader._fields + ('hands', 'plays'))
+Replay.__doc__ = """
+一条完整的记录，hands为两名玩家的初始手牌，plays为依次的出牌，都是扑克牌顺序的memoryview，不出时长度为0
+对战时出牌由玩家1开始交替进行
+"""
+
+
+def encode(header, hands, plays):
+    """
+    将一条记录编码为bytes
+    :param header: ReplayHeader，张数和出牌次数由hands和plays决定
+    :param hands:  两名玩家的初始手牌，扑克牌顺序的序列
+    :param plays:  每次出牌的扑克牌顺序序列，不出时为空
+    """
+    body = bytearray()
+    body += bytes(hands[0])
+    body += bytes(hands[1])
+    for play in plays:
+        body.append(len(play)) # 每次出牌以张数开头
+        body += bytes(play)
+    head = RECORD_HEADER.pack(RECORD_HEADER.size + len(body), header.seed, len(hands[0]), len(hands[1]),
+                              header.winner, header.kind, len(plays), header.score,
+                              header.player1Time, header.player2Time)
+    return head + body
+
+
+class ReplayWriter:
+    """
+    只追加的二进制对局记录文件
+    每条记录由固定长度的头部、双方的初始手牌(每张牌一个字节)和以张数开头的出牌组成
+    关闭时在文件末尾写入每条记录位置的索引，再次打开时去掉索引继续追加
+    没有正常关闭的文件没有索引，打开时按记录长度重新扫描，丢弃最后不完整的记录
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offsets = [] # 每条记录在文件中的位置
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.offsets, end = _load_index(path)
+            self.file = open(path, 'r+b')
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+
+    def append(self, header, hands, plays):
+        """
+        追加一条记录，参数同encode
+        """
+        self.offsets.append(self.file.tell())
+        self.file.write(encode(header, hands, plays))
+
+    def append_game(self, record):
+        """
+        追加simulator.play_game(recordPlays=True)得到的GameRecord
+        """
+        header = ReplayHeader(record.seed, 0, 0, record.winner, GAME, 0, float('nan'),
+                              record.player1Time, record.player2Time)
+        self.append(header, record.hands, record.plays)
+
+    def append_solve(self, hand, path, score=float('nan'), elapsed=0.0):
+        """
+        追加一次单人求解的结果
+        :param hand:    初始手牌的扑克牌顺序
+        :param path:    Process.solve_without_score或solve_with_score得到的出牌步骤
+        :param score:   第二问的score
+        :param elapsed: 求解耗时(秒)
+        """
+        self.append(ReplayHeader(0, 0, 0, 0, SOLVE, 0, score, elapsed, 0.0), (hand, ()), path)
+
+    def close(self):
+        """
+        写入索引并关闭文件
+        """
+        if self.file.closed:
+            return
+        indexOffset = self.file.tell()
+        self.file.write(b''.join(OFFSET.pack(offset) for offset in self.offsets))
+        self.file.write(FOOTER.pack(indexOffset, len(self.offsets), FOOTER_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+def _load_index(path):
+    """
+    读取已有文件的记录位置，有索引时只读取文件头、文件尾和索引，没有索引时以内存映射的方式扫描
+    :return: (记录位置的列表, 最后一条记录的结束位置)
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        magic, version, _ = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay log file")
+        f.seek(max(0, size - FOOTER.size))
+        footer = _read_footer(f.read(FOOTER.size), size)
+        if footer:
+            indexOffset, count = footer
+            f.seek(indexOffset)
+            return [offset for offset, in OFFSET.iter_unpack(f.read(count * OFFSET.size))], indexOffset
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _scan_offsets(data)
+
+
+def _read_footer(tail, size):
+    """
+    :param tail: 文件最后FOOTER.size个字节
+    :param size: 文件的长度
+    :return:     (索引位置, 记录数量)，没有索引时为None
+    """
+    if size < FILE_HEADER.size + FOOTER.size:
+        return None
+    indexOffset, count, magic = FOOTER.unpack(tail)
+    if magic != FOOTER_MAGIC or indexOffset + count * OFFSET.size + FOOTER.size != size:
+        return None
+    return indexOffset, count
+
+
+def _scan_offsets(data):
+    """
+    没有索引时按记录长度逐条扫描
+    :return: (记录位置的列表, 最后一条完整记录的结束位置)
+    """
+    offsets = []
+    pos = FILE_HEADER.size
+    while pos + RECORD_HEADER.size <= len(data):
+        length = RECORD_HEADER.unpack_from(data, pos)[0]
+        if length < RECORD_HEADER.size or pos + length > len(data):
+            break
+        offsets.append(pos)
+        pos += length
+    return offsets, pos
+
+
+class ReplayReader:
+    """
+    以内存映射的方式读取对局记录文件，读取头部、手牌和出牌时不复制数据
+    可以顺序扫描，也可以按编号随机访问
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.data)
+        magic, version, _ = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay log file")
+        footer = _read_footer(self.data[-FOOTER.size:], len(self.data))
+        if footer:
+            self.indexOffset, self.count = footer
+            self.offsets = None
+        else: # 没有正常关闭的文件，重新扫描得到记录位置
+            self.offsets, _ = _scan_offsets(self.data)
+            self.count = len(self.offsets)
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, idx):
+        if idx < 0:
+            idx += self.count
+        if idx < 0 or idx >= self.count:
+            raise IndexError("Record index out of range")
+        if self.offsets is not None:
+            return self.offsets[idx]
+        return OFFSET.unpack_from(self.data, self.indexOffset + idx * OFFSET.size)[0]
+
+    def header(self, idx):
+        """
+        只读取一条记录的头部
+        :return: ReplayHeader
+        """
+        fields = RECORD_HEADER.unpack_from(self.data, self.offset(idx))
+        return ReplayHeader(*fields[1:])
+
+    def __getitem__(self, idx):
+        """
+        :return: Replay
+        """
+        pos = self.offset(idx)
+        fields = RECORD_HEADER.unpack_from(self.data, pos)
+        header = ReplayHeader(*fields[1:])
+        pos += RECORD_HEADER.size
+        hands = (self.view[pos: pos + header.player1Cnt],
+                 self.view[pos + header.player1Cnt: pos + header.player1Cnt + header.player2Cnt])
+        pos += header.player1Cnt + header.player2Cnt
+        plays = []
+        for _ in range(header.plies):
+            length = self.data[pos]
+            plays.append(self.view[pos + 1: pos + 1 + length])
+            pos += 1 + length
+        return Replay(*header, hands, plays)
+
+    def headers(self):
+        """
+        按顺序扫描所有记录的头部
+        """
+        for idx in range(self.count):
+            yield self.header(idx)
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield self[idx]
+
+    def close(self):
+        """
+        关闭文件，仍有记录的memoryview在使用时，映射在这些记录释放之后才会解除
+        """
+        self.view.release()
+        try:
+            self.data.close()
+        except BufferError:
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: python replaylog.py replay.rpl [index]')
+        sys.exit(1)
+    with ReplayReader(sys.argv[1]) as reader:
+        if len(sys.argv) > 2:
+            replay = reader[int(sys.argv[2])]
+            print(ReplayHeader(*replay[:len(ReplayHeader._fields)]))
+            print('hands:', [list(hand) for hand in replay.hands])
+            print('plays:', [list(play) for play in replay.plays])
+        else:
+            wins = [0, 0, 0]
+            plies = 0
+            for header in reader.headers():
+                wins[header.winner] += 1
+                plies += header.plies
+            count = max(len(reader), 1)
+            print('records: %d, player1 win: %.4f, player2 win: %.4f, no result: %d, plies: %.2f'
+                  % (len(reader), wins[1] / count, wins[2] / count, wins[0], plies / count))
@@ -0,0 +1,125 @@
+import json
+import sys
+import time
+from collections import deque, defaultdict
+
+
+class SearchTracer:
+    """
+    搜索过程的事件记录器，将每次扩展、f/g值、出牌类型和剪枝决定写成NDJSON
+    支持按频率限流，以及只保留最后N个事件的环形缓冲模式
+    """
+    def __init__(self, path, ringSize=0, maxRate=0):
+        """
+        :param path:     输出的NDJSON文件
+        :param ringSize: 大于0时只保留最后ringSize个事件，在close时写出
+        :param maxRate:  每秒最多记录的事件数，0表示不限流
+        """
+        self.path = path
+        self.maxRate = maxRate
+        self.dropped = 0 # 因为限流而丢弃的事件数
+        self.__start = time.perf_counter()
+        self.__tokens = maxRate # 令牌桶中剩余的令牌
+        self.__lastTime = self.__start
+        if ringSize > 0:
+            self.__ring = deque(maxlen=ringSize)
+            self.__file = None
+        else:
+            self.__ring = None
+            self.__file = open(path, 'w')
+
+    def record(self, event, node, **fields):
+        """
+        记录一个事件
+        :param event:  事件类型，如'expand'、'push'、'dup'、'goal'
+        :param node:   事件对应的PokerNode
+        :param fields: 其他字段，如kind、value等
+        """
+        now = time.perf_counter()
+        if self.maxRate:
+            self.__tokens = min(self.maxRate, self.__tokens + (now - self.__lastTime) * self.maxRate)
+            self.__lastTime = now
+            if self.__tokens < 1:
+                self.dropped += 1
+                return
+            self.__tokens -= 1
+        item = {'t': round(now - self.__start, 6), 'ev': event, 'depth': node.step, 'n': len(node)}
+        if hasattr(node, 'pathCost'):
+            item['g'] = node.step
+            item['f'] = node.pathCost
+        item.update(fields)
+        if self.__ring is not None:
+            self.__ring.append(item)
+        else:
+            self.__file.write(json.dumps(item, separators=(',', ':')) + '\n')
+
+    def close(self):
+        """
+        写出缓冲中的事件并关闭文件
+        """
+        if self.__ring is not None:
+            with open(self.path, 'w') as f:
+                for item in self.__ring:
+                    f.write(json.dumps(item, separators=(',', ':')) + '\n')
+            self.__ring.clear()
+        elif self.__file:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+
+def summarize(path, column='ev'):
+    """
+    将一个trace文件汇总成按深度统计的热力图
+    :param path:   NDJSON trace文件
+    :param column: 列的分组字段，'ev'按事件类型，'kind'按出牌类型
+    :return:       (深度列表, 列名列表, {(深度, 列名): 数量})
+    """
+    counter = defaultdict(int)
+    depths = set()
+    columns = set()
+    with open(path) as f:
+        for line in f:
+            item = json.loads(line)
+            key = item.get(column)
+            if key is None:
+                continue
+            depths.add(item['depth'])
+            columns.add(key)
+            counter[(item['depth'], key)] += 1
+    return sorted(depths), sorted(columns), counter
+
+
+def print_heat_map(path, column='ev', out=sys.stdout):
+    """
+    以文本热力图的形式打印每一层的事件数量
+    """
+    shades = ' .:-=+*#%@'
+    depths, columns, counter = summarize(path, column)
+    if not depths:
+        out.write('empty trace\n')
+        return
+    largest = max(counter.values())
+    width = max(len(str(col)) for col in columns)
+    for col in columns:
+        out.write('%*s ' % (width, col))
+        for depth in depths:
+            cnt = counter.get((depth, col), 0)
+            out.write(shades[0] if cnt == 0 else shades[1 + (len(shades) - 2) * cnt // largest])
+        out.write('\n')
+    out.write('%*s %s\n' % (width, 'depth', ''.join(str(depth % 10) for depth in depths)))
+    for depth in depths:
+        out.write('depth %d: ' % depth + ', '.join('%s=%d' % (col, counter[(depth, col)])
+                                                 for col in columns if (depth, col) in counter) + '\n')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('usage: python searchtrace.py trace.ndjson [ev|kind]')
+        sys.exit(1)
+    print_heat_map(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'ev')
@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import cardmask
+from poker import Poker, PokerPlayer, Deck
+from process import Process
+from simulator import ENGINES
+
+OPS = ('solve_without_score', 'solve_with_score', 'gaming')
+NONDETERMINISTIC = frozenset(('alphabeta', 'pimc')) # 结果与时间上限内的搜索进度或随机采样有关的决策引擎
+ENCODINGS = ('orders', 'mask') # 请求和响应中手牌和出牌的表示：扑克牌顺序列表，或者掩码整数(参见cardmask)
+_process = None # 每个工作进程中常驻的Process
+
+
+def canonical_id(orders):
+    """
+    得到一手牌的规范化编号，与PokerNode.get_canonical_id相同
+    :param orders: 扑克牌顺序序列，多副牌时可以超过54
+    """
+    rankCnt = [0] * 14
+    for order in orders:
+        rankCnt[Poker.get_num_value(Poker(order).num) - 3] += 1
+    return ''.join(str(cnt) for cnt in rankCnt)
+
+
+def canonical_orders(canonicalId):
+    """
+    得到规范化编号对应的手牌，与PokerPlayer.deal_canonical相同，参见Deck.order_of
+    """
+    return [Deck.order_of(idx, copy) for idx, cnt in enumerate(canonicalId) for copy in range(int(cnt))]
+
+
+def order_map(canonicalId, orders):
+    """
+    得到规范化手牌到请求中实际手牌的映射，同一点数的牌按顺序一一对应
+    搜索过程与花色无关，所以规范化手牌的结果经过映射就是实际手牌的结果
+    """
+    actual = sorted(orders, key=lambda order: (Poker.get_num_value(Poker(order).num), order))
+    return dict(zip(canonical_orders(canonicalId), actual))
+
+
+def _solve(op, canonicalIds, engines=(None, None), timeLimit=0.1):
+    """
+    在工作进程中求解规范化的手牌，可以在进程池中执行
+    :param op:           OPS中的一种
+    :param canonicalIds: 规范化编号的元组，对战时为两名玩家的编号
+    :param engines:      对战时两名玩家的决策引擎名称
+    :param timeLimit:    决策引擎每一步的时间上限(秒)
+    :return:             (以规范化手牌表示的结果, 求解耗时)
+    """
+    global _process
+    if _process is None:
+        _process = Process()
+    begin = time.perf_counter()
+    if op == 'gaming':
+        _process.player1 = PokerPlayer()
+        _process.player1.deal_order(canonical_orders(canonicalIds[0]))
+        _process.player2 = PokerPlayer()
+        _process.player2.deal_order(canonical_orders(canonicalIds[1]))
+        _process.player1Engine, _process.player2Engine = [
+            ENGINES[name](timeLimit=timeLimit) if ENGINES[name] else None for name in engines]
+        player1Actions, player2Actions, winner = _process.gaming()
+        result = {'player1Actions': player1Actions, 'player2Actions': player2Actions, 'winner': winner}
+    else:
+        _process.specified_deal(canonical_orders(canonicalIds[0]))
+        if op == 'solve_without_score':
+            step, path = _process.solve_without_score()
+            result = {'step': step, 'path': path}
+        else:
+            score, step, path = _process.solve_with_score()
+            result = {'score': score, 'step': step, 'path': path}
+    return result, time.perf_counter() - begin
+
+
+class SolveService:
+    """
+    本地的求解服务，多个前端(界面、批处理脚本、对战程序)共用常驻的工作进程和结果缓存
+    请求和响应都是一行JSON，请求中的手牌为扑克牌顺序的列表，encoding为'mask'时手牌和出牌都是掩码整数
+    同时到达的相同规范化手牌的请求只求解一次，结果映射回每个请求的实际手牌
+    对战中使用有时间上限或者随机的决策引擎(NONDETERMINISTIC)时结果不确定，这样的请求每次单独求解，不缓存也不合并
+    """
+    def __init__(self, workers=None, cacheSize=1024):
+        """
+        :param workers:   工作进程数量，None表示CPU核数
+        :param cacheSize: 结果缓存的最大条目数，0表示不缓存
+        """
+        self.executor = ProcessPoolExecutor(workers)
+        self.cacheSize = cacheSize
+        self.cache = OrderedDict() # 以(op, 规范化编号, 引擎参数)为键的LRU结果缓存
+        self.pending = {} # 正在求解的请求，值为asyncio.Future
+        self.requests = 0 # 收到的请求数
+        self.solves = 0 # 实际求解的次数
+
+    async def handle(self, request):
+        """
+        处理一个请求
+        :param request: 字典，包括op、手牌(cards，对战时为player1和player2)，可选id、encoding、engine1、engine2、time
+        :return:        响应字典，包括id、ok、result或error、timing
+        """
+        begin = time.perf_counter()
+        response = {'id': request.get('id')}
+        try:
+            op, handLst, key, task, encoding = self.__parse(request)
+        except (KeyError, TypeError, ValueError) as e:
+            response.update(ok=False, error='%s: %s' % (type(e).__name__, e))
+            return response
+        self.requests += 1
+        timing = {'coalesced': False, 'cached': False}
+        if key is None:
+            try:
+                result, solveTime = await asyncio.get_running_loop().run_in_executor(self.executor, task)
+            except Exception as e:
+                response.update(ok=False, error='%s: %s' % (type(e).__name__, e))
+                return response
+            self.solves += 1
+        elif key in self.cache:
+            self.cache.move_to_end(key)
+            result, solveTime = self.cache[key]
+            timing['cached'] = True
+        else:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = asyncio.get_running_loop().create_future()
+                asyncio.ensure_future(self.__run(key, task))
+            else:
+                timing['coalesced'] = True
+            try:
+                result, solveTime = await asyncio.shield(future)
+            except Exception as e:
+                response.update(ok=False, error='%s: %s' % (type(e).__name__, e))
+                return response
+        response['ok'] = True
+        response['result'] = self.__remap(op, result, handLst, encoding)
+        timing['solve'] = solveTime
+        timing['total'] = time.perf_counter() - begin
+        response['timing'] = timing
+        return response
+
+    def __parse(self, request):
+        """
+        检查请求，得到规范化的键和求解任务，结果不确定时键为None
+        """
+        op = request['op']
+        if op not in OPS:
+            raise ValueError("Unknown op '%s'" % op)
+        encoding = request.get('encoding', 'orders')
+        if encoding not in ENCODINGS:
+            raise ValueError("Unknown encoding '%s'" % encoding)
+        handLst = [request['player1'], request['player2']] if op == 'gaming' else [request['cards']]
+        maxOrder = Deck.SIZE * Deck.MAX_DECKS
+        if encoding == 'mask':
+            for mask in handLst:
+                if not isinstance(mask, int) or mask <= 0 or mask >> maxOrder:
+                    raise ValueError("Cards must be positive masks below 2**%d" % maxOrder)
+            handLst = [cardmask.to_orders(mask) for mask in handLst]
+        else:
+            handLst = [list(hand) for hand in handLst]
+        for hand in handLst:
+            if not hand or any(not isinstance(order, int) or order < 1 or order > maxOrder for order in hand):
+                raise ValueError("Cards must be non-empty lists of orders in 1~%d" % maxOrder)
+            if len(set(hand)) != len(hand):
+                raise ValueError("Duplicate cards")
+        canonicalIds = tuple(canonical_id(hand) for hand in handLst)
+        if op == 'gaming':
+            engines = (request.get('engine1', 'greedy'), request.get('engine2', 'greedy'))
+            for name in engines:
+                if name not in ENGINES:
+                    raise ValueError("Unknown engine '%s'" % name)
+            timeLimit = float(request.get('time', 0.1))
+            key = None if NONDETERMINISTIC.intersection(engines) else (op, canonicalIds, engines, timeLimit)
+            task = partial(_solve, op, canonicalIds, engines, timeLimit)
+        else:
+            key = (op, canonicalIds)
+            task = partial(_solve, op, canonicalIds)
+        return op, handLst, key, task, encoding
+
+    async def __run(self, key, task):
+        """
+        在进程池中求解，结果同时交给所有等待这个键的请求
+        """
+        future = self.pending[key]
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, task)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception() # 没有请求等待时不报告未取得的异常
+        else:
+            self.solves += 1
+            if self.cacheSize:
+                self.cache[key] = result
+                if len(self.cache) > self.cacheSize:
+                    self.cache.popitem(last=False)
+            future.set_result(result)
+        finally:
+            del self.pending[key]
+
+    @staticmethod
+    def __remap(op, result, handLst, encoding='orders'):
+        """
+        将规范化手牌表示的结果映射回请求中的实际手牌
+        """
+        mapLst = [order_map(canonical_id(hand), hand) for hand in handLst]
+        if encoding == 'mask':
+            convert = lambda orderMap, action: cardmask.from_orders(orderMap[order] for order in action)
+        else:
+            convert = lambda orderMap, action: [orderMap[order] for order in action]
+        if op == 'gaming':
+            return {'player1Actions': [convert(mapLst[0], action) for action in result['player1Actions']],
+                    'player2Actions': [convert(mapLst[1], action) for action in result['player2Actions']],
+                    'winner': result['winner']}
+        remapped = dict(result)
+        remapped['path'] = [convert(mapLst[0], action) for action in result['path']]
+        return remapped
+
+    async def serve_client(self, reader, writer):
+        """
+        处理一个连接，每一行是一个请求，请求并发处理，响应按完成的顺序写回，用id对应
+        """
+        tasks = set()
+
+        async def reply(request):
+            response = await self.handle(request)
+            writer.write((json.dumps(response, separators=(',', ':')) + '\n').encode())
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Request must be a JSON object")
+                except ValueError as e:
+                    writer.write((json.dumps({'id': None, 'ok': False, 'error': str(e)}) + '\n').encode())
+                    continue
+                task = asyncio.ensure_future(reply(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unixPath=None):
+        """
+        启动服务，unixPath不为None时监听Unix socket，否则监听host:port
+        """
+        if unixPath:
+            server = await asyncio.start_unix_server(self.serve_client, unixPath)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本地求解服务，每行一个JSON请求')
+    parser.add_argument('--host', default='127.0.0.1', help='监听的地址')
+    parser.add_argument('--port', type=int, default=8765, help='监听的端口')
+    parser.add_argument('--unix', default=None, help='监听的Unix socket路径，设置时不监听端口')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数量')
+    parser.add_argument('--cache', type=int, default=1024, help='结果缓存的最大条目数')
+    args = parser.parse_args()
+    service = SolveService(args.workers, args.cache)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
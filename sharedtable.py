@@ -0,0 +1,136 @@
+from multiprocessing import shared_memory
+
+WORDS = 2 # 每个槽位占两个64位字：校验字(键异或数据)和数据
+WAYS = 2 # 每个桶的槽位数：第一个按深度优先替换，第二个总是替换
+WORD_SIZE = 8
+NO_MOVE = 0xFFFF # 没有最佳出牌，或者最佳出牌为不出
+VALID = 1 << 63 # 数据的最高位，区分空槽位和键为0的条目
+_attached = {} # 当前进程中已经打开的共享置换表，以共享内存的名称为键
+
+
+def pack_entry(depth, value, flag, move):
+    """
+    将条目压缩成一个64位的数据字
+    :param depth:   搜索深度，0~65535
+    :param value:   分数，-32768~32767
+    :param flag:    分数类型，0~15
+    :param move:    最佳出牌的编号，0~65535，NO_MOVE表示没有
+    """
+    if not (0 <= depth <= 0xFFFF and -0x8000 <= value <= 0x7FFF and 0 <= flag <= 0xF and 0 <= move <= NO_MOVE):
+        raise ValueError("Entry field out of range")
+    return VALID | depth | ((value + 0x8000) << 16) | (flag << 32) | (move << 36)
+
+
+def unpack_entry(data):
+    """
+    :return: (深度, 分数, 分数类型, 最佳出牌的编号)
+    """
+    return data & 0xFFFF, ((data >> 16) & 0xFFFF) - 0x8000, (data >> 32) & 0xF, (data >> 36) & 0xFFFF
+
+
+def attach(name, buckets):
+    """
+    在当前进程中打开已经创建的共享置换表，同一个表只打开一次
+    """
+    if name not in _attached:
+        SharedTable(buckets, name)
+    return _attached[name]
+
+
+class SharedTable:
+    """
+    多个进程共用的固定大小置换表，存放在multiprocessing.shared_memory中
+    每个条目为(64位局面键, 深度, 分数, 分数类型, 最佳出牌)，局面键参见zobrist.position_key
+    读写不加锁：每个槽位同时保存数据和键异或数据，读到被其他进程写了一半的槽位时校验不通过，当作没有命中
+    被pickle时只传递共享内存的名称，在工作进程中解除pickle时直接打开同一块内存
+    """
+    def __init__(self, buckets=1 << 18, name=None):
+        """
+        :param buckets: 桶的数量，必须是2的幂，占用的内存为buckets * 32字节
+        :param name:    已有共享内存的名称，None表示新建，新建的一方负责unlink
+        """
+        if buckets <= 0 or buckets & (buckets - 1):
+            raise ValueError("Bucket count must be a power of two")
+        size = buckets * WAYS * WORDS * WORD_SIZE
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size) # 新建的共享内存内容为0，即所有槽位为空
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.size = size
+        self.buckets = buckets
+        self.mask = buckets - 1
+        self.owner = name is None
+        self.words = self.shm.buf[:size].cast('Q')
+        self.probes = 0 # 当前进程中的查询次数
+        self.hits = 0 # 当前进程中命中的次数
+        _attached[self.name] = self
+
+    def probe(self, key):
+        """
+        查询局面键对应的条目
+        :return: (深度, 分数, 分数类型, 最佳出牌的编号)，没有命中时为None
+        """
+        self.probes += 1
+        words = self.words
+        base = (key & self.mask) * WAYS * WORDS
+        for pos in range(base, base + WAYS * WORDS, WORDS):
+            data = words[pos + 1]
+            if data and words[pos] ^ data == key:
+                self.hits += 1
+                return unpack_entry(data)
+        return None
+
+    def store(self, key, depth, value, flag, move=NO_MOVE):
+        """
+        写入条目：深度不小于深度优先槽位中的条目时替换该槽位，原来的条目移到总是替换的槽位，否则写入总是替换的槽位
+        深度超过65535时按65535保存，出牌编号超出范围时不保存出牌
+        """
+        words = self.words
+        data = pack_entry(min(depth, 0xFFFF), value, flag, move if move < NO_MOVE else NO_MOVE)
+        pos = (key & self.mask) * WAYS * WORDS
+        old = words[pos + 1]
+        if old and depth < (old & 0xFFFF):
+            pos += WORDS
+        elif old and words[pos] ^ old != key: # 被替换的是其他局面的条目时保留到总是替换的槽位
+            words[pos + WORDS] = words[pos]
+            words[pos + WORDS + 1] = old
+        words[pos] = key ^ data
+        words[pos + 1] = data
+
+    def usage(self):
+        """
+        非空槽位所占的比例
+        """
+        return sum(1 for data in self.words[1::WORDS] if data) / (self.buckets * WAYS)
+
+    def clear(self):
+        """
+        清空所有槽位，所有进程都会看到
+        """
+        self.shm.buf[:self.size] = bytes(self.size)
+
+    def close(self):
+        """
+        关闭当前进程中的映射，新建的一方还需要调用unlink释放共享内存
+        """
+        if self.words is None:
+            return
+        self.words.release()
+        self.words = None
+        self.shm.close()
+        _attached.pop(self.name, None)
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+    def __reduce__(self):
+        return attach, (self.name, self.buckets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        self.unlink()
@@ -0,0 +1,252 @@
+import argparse
+import os
+import random
+import time
+from collections import namedtuple
+from functools import partial
+from math import sqrt
+from multiprocessing import Pool
+
+from poker import PokerPlayer, Deck
+from process import Process
+from endgame import AlphaBetaEngine
+from tablebase import Tablebase
+from pimc import PimcEngine
+from replaylog import ReplayWriter
+from sharedtable import SharedTable
+
+ENGINES = {'greedy': None, 'alphabeta': AlphaBetaEngine, 'pimc': PimcEngine} # 命令行中可选的决策引擎
+_tablebases = {} # 每个进程中已经打开的终局库，以文件路径为键
+
+
+def open_tablebase(path):
+    """
+    在当前进程中以内存映射的方式打开终局库，同一个文件只打开一次
+    """
+    if path not in _tablebases:
+        _tablebases[path] = Tablebase.open(path)
+    return _tablebases[path]
+
+GameRecord = namedtuple('GameRecord', ['seed', 'winner', 'plies', 'player1Time', 'player2Time',
+                                       'player1Moves', 'player2Moves', 'hands', 'plays'],
+                        defaults=(None, None))
+GameRecord.__doc__ = """
+一局对战的紧凑记录
+winner为1或2，超过步数上限没有结果时为0
+plies为两名玩家一共的出牌次数(包括不出)
+playerXTime为该玩家所有决策的总耗时(秒)，playerXMoves为该玩家的决策次数
+记录出牌时hands为双方初始手牌的扑克牌顺序，plays为依次出牌的扑克牌顺序的bytes，不出时为空，否则都为None
+"""
+
+
+def deal_game(seed, player1Cnt, player2Cnt, decks=1):
+    """
+    用种子从同一副牌中给两名玩家发牌，保证两人的手牌不重复
+    :param seed:        随机种子
+    :param player1Cnt:  玩家1的手牌数量，可以是整数或者(最少, 最多)的元组
+    :param player2Cnt:  玩家2的手牌数量，同上
+    :param decks:       牌的副数
+    :return:            (玩家1的扑克牌顺序序列, 玩家2的扑克牌顺序序列)
+    """
+    rng = random.Random(seed)
+    if isinstance(player1Cnt, tuple):
+        player1Cnt = rng.randint(*player1Cnt)
+    if isinstance(player2Cnt, tuple):
+        player2Cnt = rng.randint(*player2Cnt)
+    deck = Deck(decks)
+    if player1Cnt + player2Cnt > deck.size:
+        raise ValueError("Too many pokers")
+    dealOrder = deck.orders()
+    rng.shuffle(dealOrder)
+    return dealOrder[:player1Cnt], dealOrder[player1Cnt: player1Cnt + player2Cnt]
+
+
+def play_game(seed, player1Cnt, player2Cnt, maxPly=1000, engines=(None, None), tablebase=None, recordPlays=False,
+              decks=1):
+    """
+    不经过界面和出牌顺序转换，直接对战一局
+    :param seed:        发牌用的随机种子
+    :param player1Cnt:  玩家1的手牌数量
+    :param player2Cnt:  玩家2的手牌数量
+    :param maxPly:      出牌次数的上限，防止异常情况下无法结束
+    :param engines:     两名玩家决策引擎的工厂函数，None表示贪心出牌
+    :param tablebase:   终局库文件的路径，双方都使用，None表示不使用
+    :param recordPlays: 是否记录双方的手牌和每次出牌，用于写入对局记录文件
+    :param decks:       牌的副数
+    :return:            GameRecord
+    """
+    player1Order, player2Order = deal_game(seed, player1Cnt, player2Cnt, decks)
+    deck = Deck(decks)
+    players = [PokerPlayer(deck), PokerPlayer(deck)]
+    players[0].deal_order(player1Order)
+    players[1].deal_order(player2Order)
+    for idx in range(2):
+        players[idx].opponent = players[1 - idx]
+        if engines[idx]:
+            players[idx].engine = engines[idx]()
+        if tablebase:
+            players[idx].tablebase = open_tablebase(tablebase)
+    elapsed = [0.0, 0.0]
+    moves = [0, 0]
+    action = None
+    winner = 0
+    cur = 0
+    plies = 0
+    plays = [] if recordPlays else None
+    while plies < maxPly:
+        start = time.perf_counter()
+        action = players[cur].gaming(action)
+        elapsed[cur] += time.perf_counter() - start
+        if recordPlays:
+            plays.append(bytes(Process.to_order(action[1])) if action else b'')
+        moves[cur] += 1
+        plies += 1
+        if len(players[cur].curNode) == 0:
+            winner = cur + 1
+            break
+        cur = 1 - cur
+    hands = (bytes(player1Order), bytes(player2Order)) if recordPlays else None
+    return GameRecord(seed, winner, plies, elapsed[0], elapsed[1], moves[0], moves[1], hands, plays)
+
+
+def _play_chunk(args):
+    """
+    进程池中执行的任务，对战一批连续种子的对局
+    """
+    seedStart, seedEnd, player1Cnt, player2Cnt, maxPly, engines, tablebase, recordPlays, decks = args
+    return [play_game(seed, player1Cnt, player2Cnt, maxPly, engines, tablebase, recordPlays, decks)
+            for seed in range(seedStart, seedEnd)]
+
+
+class SimulationStats:
+    """
+    流式统计对战结果，不保存每一局的记录
+    """
+    def __init__(self):
+        self.games = 0
+        self.wins = [0, 0, 0] # 下标0为没有结果的局数，1和2为两名玩家的胜局数
+        self.plyMean = 0.0
+        self.__plyM2 = 0.0 # Welford算法中的平方差累计
+        self.plyMax = 0
+        self.moveTime = 0.0 # 所有决策的总耗时
+        self.moveCnt = 0 # 所有决策的次数
+
+    def add(self, record):
+        """
+        加入一局的记录
+        :param record: GameRecord
+        """
+        self.games += 1
+        self.wins[record.winner] += 1
+        delta = record.plies - self.plyMean
+        self.plyMean += delta / self.games
+        self.__plyM2 += delta * (record.plies - self.plyMean)
+        self.plyMax = max(self.plyMax, record.plies)
+        self.moveTime += record.player1Time + record.player2Time
+        self.moveCnt += record.player1Moves + record.player2Moves
+
+    def win_rate(self, player):
+        return self.wins[player] / self.games if self.games else 0.0
+
+    def ply_std(self):
+        return sqrt(self.__plyM2 / (self.games - 1)) if self.games > 1 else 0.0
+
+    def time_per_move(self):
+        return self.moveTime / self.moveCnt if self.moveCnt else 0.0
+
+    def __repr__(self):
+        return ('games: %d, player1 win: %.4f, player2 win: %.4f, unfinished: %d, '
+                'plies: %.2f±%.2f (max %d), time per move: %.1fus'
+                % (self.games, self.win_rate(1), self.win_rate(2), self.wins[0],
+                   self.plyMean, self.ply_std(), self.plyMax, self.time_per_move() * 1e6))
+
+
+def simulate(gameCnt, player1Cnt, player2Cnt, seed=0, workers=None, chunkSize=256, maxPly=1000,
+             callback=None, engines=(None, None), tablebase=None, recordPlays=False, decks=1):
+    """
+    在进程池中对战gameCnt局，第i局使用seed + i作为种子，结果可以复现
+    :param gameCnt:     对局数量
+    :param player1Cnt:  玩家1的手牌数量，可以是整数或者(最少, 最多)的元组
+    :param player2Cnt:  玩家2的手牌数量，同上
+    :param seed:        第一局的种子
+    :param workers:     进程数量，None为CPU核数，0或1时在当前进程中执行
+    :param chunkSize:   每个任务包含的对局数量
+    :param maxPly:      每局出牌次数的上限
+    :param callback:    每局结束后以GameRecord为参数调用，可用于保存记录
+    :param engines:     两名玩家决策引擎的工厂函数，需要可以被pickle，如functools.partial(AlphaBetaEngine)
+    :param tablebase:   终局库文件的路径
+    :param recordPlays: 是否记录手牌和出牌，交给callback写入对局记录文件
+    :param decks:       牌的副数
+    :return:            SimulationStats
+    """
+    stats = SimulationStats()
+    tasks = [(start, min(start + chunkSize, seed + gameCnt), player1Cnt, player2Cnt, maxPly, tuple(engines), tablebase,
+              recordPlays, decks) for start in range(seed, seed + gameCnt, chunkSize)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(_play_chunk, tasks) if pool else map(_play_chunk, tasks)
+        for records in results:
+            for record in records:
+                stats.add(record)
+                if callback:
+                    callback(record)
+    finally:
+        if pool:
+            pool.terminate()
+    return stats
+
+
+def parse_cnt(text):
+    """
+    解析命令行中的手牌数量，'17'表示固定17张，'10-20'表示每局在10到20张之间随机
+    """
+    if '-' in text:
+        low, high = text.split('-')
+        return int(low), int(high)
+    return int(text)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='1v1对战的批量模拟')
+    parser.add_argument('-n', '--games', type=int, default=10000, help='对局数量')
+    parser.add_argument('--p1', type=parse_cnt, default=17, help='玩家1的手牌数量，如17或10-20')
+    parser.add_argument('--p2', type=parse_cnt, default=17, help='玩家2的手牌数量，如17或10-20')
+    parser.add_argument('--seed', type=int, default=0, help='第一局的种子')
+    parser.add_argument('--workers', type=int, default=None, help='进程数量')
+    parser.add_argument('--chunk', type=int, default=256, help='每个任务包含的对局数量')
+    parser.add_argument('--engine1', choices=ENGINES, default='greedy', help='玩家1的决策引擎')
+    parser.add_argument('--engine2', choices=ENGINES, default='greedy', help='玩家2的决策引擎')
+    parser.add_argument('--time', type=float, default=0.1, help='决策引擎每一步的时间上限(秒)')
+    parser.add_argument('--tablebase', default=None, help='终局库文件，由tablebase.py生成')
+    parser.add_argument('--replay', default=None, help='追加写入的对局记录文件，可以用replaylog.py读取')
+    parser.add_argument('--decks', type=int, default=1, help='牌的副数')
+    parser.add_argument('--shared-table', type=int, default=0,
+                        help='alphabeta引擎在所有进程间共用的置换表的桶数量(2的幂)，0表示不使用')
+    args = parser.parse_args()
+    table = SharedTable(args.shared_table) if args.shared_table else None
+    engineLst = []
+    for name in (args.engine1, args.engine2):
+        if ENGINES[name] is AlphaBetaEngine and table:
+            engineLst.append(partial(AlphaBetaEngine, timeLimit=args.time, sharedTable=table))
+        else:
+            engineLst.append(ENGINES[name] and partial(ENGINES[name], timeLimit=args.time))
+    writer = ReplayWriter(args.replay) if args.replay else None
+    begin = time.perf_counter()
+    try:
+        result = simulate(args.games, args.p1, args.p2, args.seed, args.workers, args.chunk,
+                          callback=writer and writer.append_game, engines=engineLst, tablebase=args.tablebase,
+                          recordPlays=bool(writer), decks=args.decks)
+    finally:
+        if writer:
+            writer.close()
+        if table:
+            usage = table.usage()
+            table.close()
+            table.unlink()
+    cost = time.perf_counter() - begin
+    print(result)
+    if table:
+        print('shared table usage: %.4f' % usage)
+    print('%.2fs, %.0f games/min' % (cost, result.games / cost * 60))
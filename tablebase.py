@@ -0,0 +1,270 @@
+import argparse
+import mmap
+from array import array
+import struct
+import time
+
+import rankcount
+from rankcount import Move, RANK_CNT, CAPS
+
+MAGIC = b'PKTB'
+HEADER = struct.Struct('<4sHHII') # 魔数, 版本, K, 手牌编号数量, 桌面牌型数量
+VERSION = 1
+UNKNOWN, WIN, LOSS = 0, 1, 2 # 以当前出牌的一方为视角的结果
+
+
+class HandIndex:
+    """
+    点数计数向量的最小完美哈希，对每个点数不超过上限且总张数不超过K的计数向量编号
+    """
+    def __init__(self, maxCnt):
+        self.maxCnt = maxCnt
+        # ways[i][s]为从第i个点数开始，剩余张数不超过s的计数向量的数量
+        self.ways = [[0] * (maxCnt + 1) for _ in range(RANK_CNT + 1)]
+        self.ways[RANK_CNT] = [1] * (maxCnt + 1)
+        for rank in range(RANK_CNT - 1, -1, -1):
+            for remain in range(maxCnt + 1):
+                self.ways[rank][remain] = sum(self.ways[rank + 1][remain - cnt]
+                                              for cnt in range(min(CAPS[rank], remain) + 1))
+        self.size = self.ways[0][maxCnt]
+
+    def rank(self, counts):
+        """
+        得到计数向量的编号
+        """
+        index = 0
+        remain = self.maxCnt
+        for rank in range(RANK_CNT):
+            for cnt in range(counts[rank]):
+                index += self.ways[rank + 1][remain - cnt]
+            remain -= counts[rank]
+        return index
+
+    def unrank(self, index):
+        """
+        由编号得到计数向量
+        """
+        counts = []
+        remain = self.maxCnt
+        for rank in range(RANK_CNT):
+            cnt = 0
+            while index >= self.ways[rank + 1][remain - cnt]:
+                index -= self.ways[rank + 1][remain - cnt]
+                cnt += 1
+            counts.append(cnt)
+            remain -= cnt
+        return tuple(counts)
+
+
+def table_classes(maxCnt):
+    """
+    得到桌面牌型的列表，下标0为自由出牌(None)
+    对于应答来说，出牌只由(类型, 张数, 点数)决定，所以同一个键只保留一个代表
+    不是炸弹且张数超过K的牌只能用炸弹和火箭压过，统一为'big'
+    """
+    classes = [None]
+    seen = set()
+    hands = [(3,) * 13 + (2,), (4,) * 13 + (2,), (4, 3) * 6 + (4, 2), (3, 4) * 6 + (3, 2)]
+    for hand in hands:
+        for move in rankcount.legal_moves(hand):
+            key = (move.kind, move.length, move.lead)
+            if key in seen:
+                continue
+            if move.length <= maxCnt or move.kind in ('four', 'rocket'):
+                seen.add(key)
+                classes.append(move)
+    classes.append(Move('big', (0,) * RANK_CNT, -1, maxCnt + 1))
+    return classes
+
+
+class Tablebase:
+    """
+    1v1小局面的终局库，用逆推的方式求解双方手牌都不超过K张时的所有局面
+    局面编号为(出牌方手牌编号, 对手手牌编号, 桌面牌型编号)，每个局面的结果占2位
+    """
+    def __init__(self, maxCnt, data=None):
+        """
+        :param maxCnt:  每一方手牌的最大张数K
+        :param data:    结果数据，可以是bytearray或者mmap
+        """
+        self.maxCnt = maxCnt
+        self.hands = HandIndex(maxCnt)
+        self.classes = table_classes(maxCnt)
+        self.classIndex = {(move.kind, move.length, move.lead): idx
+                           for idx, move in enumerate(self.classes) if move is not None}
+        self.size = self.hands.size * self.hands.size * len(self.classes)
+        self.data = data if data is not None else bytearray((self.size + 3) // 4)
+        self.__file = None
+
+    def classify(self, last):
+        """
+        得到桌面上的牌对应的牌型编号
+        """
+        if last is None:
+            return 0
+        idx = self.classIndex.get((last.kind, last.length, last.lead))
+        if idx is None:
+            return len(self.classes) - 1
+        return idx
+
+    def index(self, myCounts, oppCounts, classIdx):
+        return (self.hands.rank(myCounts) * self.hands.size + self.hands.rank(oppCounts)) * len(self.classes) + classIdx
+
+    def get(self, index):
+        return (self.data[index >> 2] >> ((index & 3) << 1)) & 3
+
+    def __set(self, index, value):
+        self.data[index >> 2] |= value << ((index & 3) << 1)
+
+    def covers(self, myCounts, oppCounts, last=None):
+        """
+        判断局面是否在终局库的范围内，终局库只包含一副牌的局面
+        多副牌时桌上可能是超过四张的炸弹，库中的四张压不过它，这样的局面也不在范围内
+        """
+        if last is not None and last.kind == 'bomb':
+            return False
+        return (sum(myCounts) <= self.maxCnt and sum(oppCounts) <= self.maxCnt
+                and all(a + b <= cap for a, b, cap in zip(myCounts, oppCounts, CAPS)))
+
+    def probe(self, myCounts, oppCounts, last=None):
+        """
+        查询局面的结果
+        :return: WIN、LOSS，或者不在范围内时为UNKNOWN
+        """
+        if not self.covers(myCounts, oppCounts, last):
+            return UNKNOWN
+        return self.get(self.index(myCounts, oppCounts, self.classify(last)))
+
+    def best_move(self, myCounts, oppCounts, last=None):
+        """
+        查询局面下的最佳出牌，必胜时返回一个必胜的出牌，必败时返回张数最多的出牌
+        :return: (是否在范围内, Move或None)，None表示不出
+        """
+        if not self.covers(myCounts, oppCounts, last):
+            return False, None
+        moves = sorted(rankcount.responses(myCounts, last), key=lambda move: -move.length)
+        for move in moves:
+            myNext = rankcount.apply(myCounts, move)
+            if not any(myNext) or self.get(self.index(oppCounts, myNext, self.classify(move))) == LOSS:
+                return True, move
+        if last is not None: # 没有必胜的出牌时不出
+            return True, None
+        return True, moves[0]
+
+    def decide(self, player, opponentAction):
+        """
+        PokerPlayer.gaming使用的接口，局面不在范围内时返回(False, None)
+        :return: (是否在范围内, (出牌类型, 实际出的牌)或None)
+        """
+        last = rankcount.from_action(*opponentAction) if opponentAction else None
+        found, move = self.best_move(player.curNode.get_rank_cnt(), player.opponent.curNode.get_rank_cnt(), last)
+        if not found or move is None:
+            return found, None
+        return True, (move.kind, rankcount.to_action(player.curNode, move))
+
+    def generate(self, verbose=False):
+        """
+        按照双方总张数从少到多逆推求解所有局面
+        出牌一定会减少总张数，不出会把局面变为同样张数下的自由出牌，所以同一层中先求解自由出牌的局面
+        出牌之后的局面都在更少张数的层中，与桌面牌型无关，所以每对手牌只需要找一次必胜的出牌，
+        每种出牌能压过的桌面牌型预先算好，一对手牌在所有桌面牌型下的结果一次写入
+        纯Python实现，K=3约需5秒；K=4约需1.5分钟、0.5GB内存，文件160MB；K=5的局面数约为K=4的20倍，不实际
+        """
+        handLst = [self.hands.unrank(idx) for idx in range(self.hands.size)]
+        classCnt = len(self.classes)
+        handCnt = self.hands.size
+        emptyIdx = self.hands.rank((0,) * RANK_CNT)
+        # 一对手牌在所有桌面牌型下的结果为2 * classCnt位的整数，第c个牌型在第2c位
+        lossRow = sum(LOSS << (classIdx << 1) for classIdx in range(classCnt))
+        passRow = sum(1 << (classIdx << 1) for classIdx in range(1, classCnt)) # 不出必胜时除自由出牌外都为WIN
+        beatRows = {} # 出牌能压过的桌面牌型，每个牌型对应的位为1，LOSS减去之后为WIN
+        childLst = [] # 每个手牌所有出牌之后的(手牌编号, 牌型编号, 能压过的牌型)
+        for counts in handLst:
+            children = []
+            for move in rankcount.legal_moves(counts):
+                moveClass = self.classify(move)
+                beatRow = beatRows.get(moveClass)
+                if beatRow is None:
+                    beatRow = beatRows[moveClass] = sum(
+                        1 << (classIdx << 1) for classIdx in range(1, classCnt)
+                        if rankcount.beats(move, self.classes[classIdx]))
+                children.append((self.hands.rank(rankcount.apply(counts, move)), moveClass, beatRow | 1))
+            childLst.append(children)
+        # 每层的手牌对编码为myIdx * handCnt + oppIdx，存在array中，比元组列表节省内存
+        byTotal = [array('L') for _ in range(2 * self.maxCnt + 1)]
+        for myIdx, myCounts in enumerate(handLst):
+            mySum = sum(myCounts)
+            for oppIdx, oppCounts in enumerate(handLst):
+                if all(a + b <= cap for a, b, cap in zip(myCounts, oppCounts, CAPS)):
+                    byTotal[mySum + sum(oppCounts)].append(myIdx * handCnt + oppIdx)
+        for total in range(len(byTotal)):
+            begin = time.perf_counter()
+            winLst = [] # 本层每对手牌所有必胜出牌能压过的牌型，自由出牌对应第0位
+            for pair in byTotal[total]:
+                myIdx, oppIdx = divmod(pair, handCnt)
+                winRow = None
+                if myIdx == emptyIdx:
+                    pass
+                elif oppIdx == emptyIdx: # 对手已经出完
+                    self.__set_row(pair, lossRow)
+                else:
+                    winRow = 0
+                    for childIdx, childClass, beatRow in childLst[myIdx]:
+                        if childIdx == emptyIdx or self.get((oppIdx * handCnt + childIdx) * classCnt + childClass) == LOSS:
+                            winRow |= beatRow
+                    self.__set(pair * classCnt, WIN if winRow else LOSS)
+                winLst.append(winRow)
+            for pair, winRow in zip(byTotal[total], winLst):
+                if winRow is None:
+                    continue
+                myIdx, oppIdx = divmod(pair, handCnt)
+                if self.get((oppIdx * handCnt + myIdx) * classCnt) == LOSS: # 不出之后对手自由出牌必败
+                    winRow |= passRow
+                self.__set_row(pair, (lossRow - (winRow | 1)) & ~3) # 自由出牌的结果已经写入
+            if verbose:
+                print('total %d: %d hand pairs, %.2fs' % (total, len(byTotal[total]), time.perf_counter() - begin))
+
+    def __set_row(self, pair, row):
+        """
+        写入一对手牌在所有桌面牌型下的结果
+        :param pair: myIdx * handCnt + oppIdx
+        :param row:  每个牌型占2位的整数
+        """
+        bitPos = pair * len(self.classes) << 1
+        start = bitPos >> 3
+        row <<= bitPos & 7
+        end = start + ((row.bit_length() + 7) >> 3)
+        self.data[start: end] = (int.from_bytes(self.data[start: end], 'little') | row).to_bytes(end - start, 'little')
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.maxCnt, self.hands.size, len(self.classes)))
+            f.write(self.data)
+
+    @staticmethod
+    def open(path):
+        """
+        以内存映射的方式打开终局库文件
+        """
+        f = open(path, 'rb')
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, maxCnt, handCnt, classCnt = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a tablebase file")
+        tablebase = Tablebase(maxCnt, memoryview(data)[HEADER.size:])
+        if tablebase.hands.size != handCnt or len(tablebase.classes) != classCnt:
+            raise ValueError("Tablebase layout mismatch")
+        tablebase.__file = (f, data)
+        return tablebase
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='生成1v1小局面的终局库')
+    parser.add_argument('-k', type=int, default=3,
+                        help='每一方手牌的最大张数，K=4约需1.5分钟，更大时不实际')
+    parser.add_argument('-o', '--output', default='tablebase.bin', help='输出文件')
+    args = parser.parse_args()
+    table = Tablebase(args.k)
+    print('%d hands, %d table classes, %d positions' % (table.hands.size, len(table.classes), table.size))
+    table.generate(verbose=True)
+    table.save(args.output)
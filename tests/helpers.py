@@ -0,0 +1,22 @@
+import random
+
+from poker import Deck
+
+RANK_CNT = 14
+
+
+def rank_counts(orders):
+    """
+    由扑克牌顺序序列得到点数计数向量，与PokerNode.get_rank_cnt相同
+    """
+    counts = [0] * RANK_CNT
+    for order in orders:
+        counts[min((Deck.split(order)[1] - 1) // 4, RANK_CNT - 1)] += 1
+    return tuple(counts)
+
+
+def random_hand(seed, cards, decks=1):
+    """
+    由种子确定的随机手牌，为扑克牌顺序列表
+    """
+    return random.Random(seed).sample(Deck(decks).orders(), cards)
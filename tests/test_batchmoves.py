@@ -0,0 +1,51 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import rankcount
+from batchmoves import COMBO_KIND, batch_moves, batch_path_cost, to_count_matrix
+from helpers import random_hand
+from poker import PokerPlayer, Deck
+
+SINGLE_KIND = ('single', 'pair', 'three', 'four', 'bomb')
+
+
+def deal_nodes(decks, cards=20, hands=100):
+    nodes = []
+    for seed in range(hands):
+        player = PokerPlayer(Deck(decks))
+        player.deal_order(random_hand(seed, cards, decks))
+        nodes.append(player.initNode)
+    return nodes
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_matches_legal_moves(decks):
+    """
+    批量计算的每种出牌数量与rankcount.legal_moves逐手计算的结果相同
+    """
+    nodes = deal_nodes(decks)
+    result = batch_moves(to_count_matrix(nodes))
+    for row, node in enumerate(nodes):
+        moves = rankcount.legal_moves(node.get_rank_cnt())
+        kinds = Counter(move.kind for move in moves)
+        for kind in COMBO_KIND + tuple(item[0] for item in rankcount.STRAIGHT_TYPE):
+            assert result[kind][row] == kinds[kind]
+        for kind in SINGLE_KIND:
+            assert result[kind][row].sum() == kinds[kind]
+        assert result['rocket'][row] == bool(kinds['rocket'])
+        assert result['moveCnt'][row] == len(moves)
+
+
+@pytest.mark.parametrize('jokers', [2, 3])
+def test_rocket_with_extra_joker(jokers):
+    counts = (1,) + (0,) * 12 + (jokers,)
+    assert batch_moves(to_count_matrix([counts]))['rocket'][0]
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_path_cost_matches_node(decks):
+    nodes = deal_nodes(decks)
+    costs = batch_path_cost(to_count_matrix(nodes), np.zeros(len(nodes), dtype=np.int64))
+    assert costs.tolist() == [node.pathCost for node in nodes]
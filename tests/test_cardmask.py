@@ -0,0 +1,57 @@
+import pytest
+
+import cardmask
+from helpers import rank_counts, random_hand
+from poker import Deck, PokerPlayer
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_orders_round_trip(decks):
+    for seed in range(20):
+        orders = random_hand(seed, 20, decks)
+        mask = cardmask.from_orders(orders)
+        assert cardmask.to_orders(mask) == sorted(orders)
+        assert cardmask.count(mask) == len(orders)
+        assert cardmask.rank_counts(mask) == rank_counts(orders)
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_pokers_round_trip(decks):
+    """
+    掩码转化的Poker列表与按扑克牌顺序发牌得到的手牌相同，第二副牌的牌不会变成第一副
+    """
+    orders = random_hand(7, 30, decks)
+    player = PokerPlayer(Deck(decks))
+    player.deal_order(orders)
+    mask = cardmask.from_pokers(player.initNode.state)
+    assert mask == cardmask.from_orders(orders)
+    assert cardmask.to_pokers(mask) == player.initNode.state
+    assert cardmask.rank_counts(mask) == player.initNode.get_rank_cnt()
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_pack_round_trip(decks):
+    size = cardmask.mask_bytes(Deck(decks))
+    masks = [cardmask.from_orders(random_hand(seed, 17, decks)) for seed in range(10)]
+    data = cardmask.pack(masks, size)
+    assert len(data) == size * len(masks)
+    assert cardmask.unpack(data, size) == masks
+
+
+def test_remove():
+    hand = cardmask.from_orders([1, 2, 3, 60])
+    play = cardmask.from_orders([2, 60])
+    assert cardmask.is_subset(play, hand)
+    assert cardmask.remove(hand, play) == cardmask.from_orders([1, 3])
+    with pytest.raises(ValueError):
+        cardmask.remove(hand, cardmask.from_orders([4]))
+
+
+def test_rank_of():
+    """
+    第二副牌的牌与第一副牌中对应的牌点数相同
+    """
+    assert [cardmask.rank_of(order) for order in (1, 4, 5, 52, 53, 54)] == [0, 0, 1, 12, 13, 13]
+    assert [cardmask.rank_of(order + Deck.SIZE) for order in (1, 4, 5, 52, 53, 54)] == [0, 0, 1, 12, 13, 13]
+    mask = cardmask.from_orders([1, 55, 56, 107, 108])
+    assert cardmask.rank_counts(mask) == (3,) + (0,) * 12 + (2,)
@@ -0,0 +1,48 @@
+import os
+
+import numpy as np
+import pytest
+
+import datagen
+
+
+def load_all(directory):
+    shards = list(datagen.load(str(directory)))
+    return {field: np.concatenate([shard[field] for shard in shards]) for field in datagen.FIELDS}, len(shards)
+
+
+def test_rows_match_label_hand(tmp_path):
+    writer = datagen.generate(str(tmp_path), 7, 8, seed=5, shardSize=3, withScore=False, workers=0, chunkSize=2)
+    assert writer.done() == 7
+    data, shardCnt = load_all(tmp_path)
+    assert shardCnt == 3
+    for row, seed in enumerate(range(5, 12)):
+        counts, steps, score, firstMove = datagen.label_hand(seed, 8, False)
+        assert data['counts'][row].tolist() == counts
+        assert data['steps'][row] == steps and np.isnan(data['score'][row])
+        assert data['firstMove'][row].tolist() == firstMove
+        assert sum(firstMove) and all(used <= cnt for used, cnt in zip(firstMove, counts))
+
+
+def test_resume_after_lost_shard(tmp_path):
+    """
+    分片丢失后重新运行，从最后一个完整的分片之后继续，结果与一次生成相同，也与进程池中生成相同
+    """
+    datagen.generate(str(tmp_path / 'once'), 7, 8, shardSize=3, workers=0)
+    datagen.generate(str(tmp_path / 'resumed'), 7, 8, shardSize=3, workers=0)
+    os.remove(str(tmp_path / 'resumed' / 'shard-00001.npz'))
+    writer = datagen.generate(str(tmp_path / 'resumed'), 7, 8, shardSize=3, workers=0)
+    assert writer.done() == 7
+    datagen.generate(str(tmp_path / 'pooled'), 7, 8, shardSize=3, workers=2, chunkSize=2)
+    once, _ = load_all(tmp_path / 'once')
+    for name in ('resumed', 'pooled'):
+        other, _ = load_all(tmp_path / name)
+        for field in datagen.FIELDS:
+            np.testing.assert_array_equal(other[field], once[field])
+
+
+def test_different_parameters_rejected(tmp_path):
+    datagen.generate(str(tmp_path), 2, (6, 8), shardSize=2, withScore=False, workers=0)
+    datagen.ShardWriter(str(tmp_path), 2, (6, 8), shardSize=2, withScore=False) # JSON中的列表还原为元组
+    with pytest.raises(ValueError):
+        datagen.ShardWriter(str(tmp_path), 2, 8, shardSize=2, withScore=False)
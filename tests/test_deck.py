@@ -0,0 +1,35 @@
+import pytest
+
+from poker import Deck, Poker, PokerPlayer
+
+
+def test_order_round_trip_two_decks():
+    for order in Deck(2).orders():
+        assert Poker.get_order(Poker(order)) == order
+
+
+def test_deck_limits():
+    with pytest.raises(ValueError):
+        Deck(Deck.MAX_DECKS + 1)
+    with pytest.raises(ValueError):
+        Poker(Deck.SIZE * Deck.MAX_DECKS + 1)
+
+
+def test_bomb_above_four_cards():
+    """
+    两副牌时超过四张的点数整体作为炸弹，同时仍然可以出其中的三张和单张
+    """
+    player = PokerPlayer(Deck(2))
+    player.deal_order([1, 2, 3, 4, 55, 56, 9])
+    steps = player.initNode.possibleStep
+    assert [len(bomb) for bomb in steps['bomb']] == [6]
+    assert len(steps['three']) == 1 and len(steps['single']) == 2
+    player.solve_without_score()
+    assert player.step == 2
+
+
+def test_single_deck_has_no_bomb_kind():
+    player = PokerPlayer()
+    player.deal_order([1, 2, 3, 4, 9])
+    assert 'bomb' not in player.initNode.possibleStep
+    assert isinstance(player.initNode.possibleStep['three with single'], list)
@@ -0,0 +1,68 @@
+import pytest
+
+import rankcount
+from dpsolver import DPSolver, four_with_four
+from helpers import rank_counts, random_hand
+from poker import PokerPlayer, Deck
+
+
+def brute_force_steps(counts, limit):
+    """
+    不使用记忆表和锚定规则，逐层加深地尝试所有出牌，得到不超过limit的最少步数
+    """
+    if not any(counts):
+        return 0
+    if limit == 0:
+        return None
+    best = None
+    for move in rankcount.legal_moves(counts) + four_with_four(counts):
+        steps = brute_force_steps(rankcount.apply(counts, move), limit - 1 if best is None else best - 2)
+        if steps is not None and (best is None or steps + 1 < best):
+            best = steps + 1
+    return best
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_matches_exhaustive_search(decks):
+    """
+    锚定规则下的DP与穷举所有出牌的结果相同
+    """
+    solver = DPSolver()
+    for seed in range(30):
+        counts = rank_counts(random_hand(seed, 8, decks))
+        assert solver.steps(counts) == brute_force_steps(counts, sum(counts))
+
+
+def test_fewer_steps_than_a_star():
+    """
+    A*只展开顺子和四带四，其余由贪心完成，不一定最优；这手牌DP为4步，A*为5步
+    """
+    orders = random_hand(150, 14)
+    counts = rank_counts(orders)
+    assert DPSolver().steps(counts) == brute_force_steps(counts, 5) == 4
+    player = PokerPlayer()
+    player.deal_order(orders)
+    player.solve_without_score()
+    assert player.step == 5
+
+
+@pytest.mark.parametrize('decks, orders, steps, largest', [
+    (1, random_hand(150, 14), 4, None),
+    (1, list(range(1, 9)), 1, 8), # 两个炸弹只能四带四一步出完
+    (2, [1, 2, 3, 4, 55, 56], 1, 6), # 六张3只能作为两副牌的炸弹整体打出
+])
+def test_solve_player_path_plays_every_card(decks, orders, steps, largest):
+    """
+    DP还原的出牌序列可以在具体的扑克牌上依次执行，并且出完所有牌
+    """
+    player = PokerPlayer(Deck(decks))
+    player.deal_order(orders)
+    player.stepEngine = DPSolver()
+    player.solve_without_score()
+    node = player.initNode
+    for action in player.path:
+        node = node.get_child(action)
+    assert player.step == len(player.path) == steps
+    assert len(node.state) == 0
+    if largest:
+        assert max(len(action) for action in player.path if isinstance(action, list)) == largest
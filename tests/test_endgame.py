@@ -0,0 +1,88 @@
+import operator
+from functools import lru_cache
+
+import rankcount
+from endgame import AlphaBetaEngine, is_subset, pack
+from helpers import rank_counts, random_hand
+
+
+def test_full_table_evicts_without_error():
+    """
+    置换表已满且新条目属于张数最多的一层时，先淘汰再建立新的一层
+    """
+    for seed in range(3):
+        orders = random_hand(seed, 20)
+        engine = AlphaBetaEngine(timeLimit=0.2, tableSize=64)
+        engine.search(rank_counts(orders[:10]), rank_counts(orders[10:]))
+        assert engine.size == sum(len(level) for level in engine.table.values()) <= 64
+        assert all(engine.table.values()) # 没有空的层
+
+
+@lru_cache(maxsize=None)
+def brute_force_wins(myCounts, oppCounts, last=None):
+    """
+    不使用置换表，穷举双方所有出牌判断出牌方是否必胜
+    """
+    for move in rankcount.responses(myCounts, last):
+        child = rankcount.apply(myCounts, move)
+        if not any(child) or not brute_force_wins(oppCounts, child, move):
+            return True
+    return last is not None and not brute_force_wins(oppCounts, myCounts)
+
+
+def small_positions(cards=4):
+    for seed in range(30):
+        orders = random_hand(seed, 2 * cards)
+        yield rank_counts(orders[:cards]), rank_counts(orders[cards:])
+
+
+def test_solved_result_matches_brute_force():
+    """
+    小局面可以精确求解，必胜时选出的出牌之后对手必败
+    """
+    engine = AlphaBetaEngine(timeLimit=5.0)
+    for myCounts, oppCounts in small_positions():
+        move = engine.search(myCounts, oppCounts)
+        if len(rankcount.legal_moves(myCounts)) == 1:
+            continue
+        assert engine.solved
+        myNext = rankcount.apply(myCounts, move)
+        assert (not any(myNext) or not brute_force_wins(oppCounts, myNext, move)) \
+            == brute_force_wins(myCounts, oppCounts)
+
+
+def test_table_reused_between_searches():
+    """
+    保留置换表再次搜索同一局面时直接命中，结果不变
+    """
+    engine = AlphaBetaEngine(timeLimit=5.0)
+    for myCounts, oppCounts in small_positions():
+        move = engine.search(myCounts, oppCounts)
+        nodes = engine.nodes
+        assert engine.search(myCounts, oppCounts) == move
+        assert engine.nodes <= nodes
+
+
+def test_promote_keeps_only_reachable_entries():
+    """
+    回合开始时只保留双方手牌分别是当前手牌子集的条目
+    """
+    myCounts, oppCounts = next(small_positions(6))
+    engine = AlphaBetaEngine(timeLimit=5.0)
+    move = engine.search(myCounts, oppCounts)
+    before = engine.size
+    myNext = rankcount.apply(myCounts, move)
+    engine.promote(oppCounts, myNext)
+    assert 0 < engine.reused == engine.size < before
+    total = sum(myNext) + sum(oppCounts)
+    for levelTotal, level in engine.table.items():
+        assert levelTotal <= total
+        for entry in level.values():
+            mover, other = entry[4], entry[5]
+            assert ((all(map(operator.le, mover, oppCounts)) and all(map(operator.le, other, myNext)))
+                    or (all(map(operator.le, mover, myNext)) and all(map(operator.le, other, oppCounts))))
+
+
+def test_is_subset():
+    assert is_subset(pack((1, 0, 2) + (0,) * 11), pack((1, 1, 3) + (0,) * 11))
+    assert not is_subset(pack((0, 2) + (0,) * 12), pack((4, 1) + (0,) * 12))
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from gameserver import GameServer, take_orders
+from pimc import rollout_move
+
+
+@pytest.fixture
+def server():
+    server = GameServer(workers=1, latency=5.0, timeLimit=0.01)
+    yield server
+    server.executor.shutdown()
+
+
+def play_out(server, engine, first='client'):
+    """
+    客户端贪心出牌，与服务器对战到结束，检查每一步双方的手牌都没有重复或凭空出现的牌
+    """
+    async def game():
+        response = await server.handle({'op': 'new', 'seed': 3, 'cards': 8, 'opponentCards': 8,
+                                        'engine': engine, 'first': first})
+        assert response['ok']
+        gameId = response['result']['game']
+        state = server.games[gameId]
+        seen = set(state.hands[0]) | set(state.hands[1])
+        winner = None
+        while winner is None:
+            move = rollout_move(state.counts[0], state.last)
+            cards = take_orders(state.hands[0], move.cards)[0] if move else []
+            response = await server.handle({'op': 'play', 'game': gameId, 'cards': cards})
+            assert response['ok'], response
+            winner = response['result']['winner']
+            serverPlay = response['result'].get('serverPlay')
+            for order in cards + (serverPlay['cards'] if serverPlay else []):
+                seen.remove(order)
+            assert seen == set(state.hands[0]) | set(state.hands[1])
+        assert not state.hands[winner]
+        response = await server.handle({'op': 'play', 'game': gameId, 'cards': []})
+        assert not response['ok'] # 对局已经结束
+        response = await server.handle({'op': 'close', 'game': gameId})
+        assert response['ok'] and gameId not in server.games
+    asyncio.run(game())
+
+
+@pytest.mark.parametrize('engine', ['greedy', 'alphabeta', 'pimc'])
+def test_play_to_the_end(server, engine):
+    play_out(server, engine)
+    play_out(server, engine, 'server')
+    assert server.fallbacks == 0
+
+
+def test_rejects_illegal_plays(server):
+    async def game():
+        response = await server.handle({'op': 'new', 'seed': 1, 'cards': 5, 'opponentCards': 5})
+        gameId = response['result']['game']
+        hand = response['result']['hand']
+        requests = [{'op': 'play', 'game': gameId, 'cards': []}, # 自由出牌时不能不出
+                    {'op': 'play', 'game': gameId, 'cards': [order for order in range(1, 55)
+                                                             if order not in hand][:1]}, # 不在手牌中
+                    {'op': 'play', 'game': gameId, 'cards': [hand[0], hand[0]]},
+                    {'op': 'state', 'game': gameId + 1},
+                    {'op': 'new', 'cards': 50, 'opponentCards': 5},
+                    {'op': 'unknown'}]
+        for request in requests:
+            assert not (await server.handle(request))['ok']
+        state = await server.handle({'op': 'state', 'game': gameId})
+        assert state['result']['hand'] == hand
+    asyncio.run(game())
+
+
+def test_evict_idle(server):
+    async def evict():
+        response = await server.handle({'op': 'new', 'seed': 1})
+        evictor = asyncio.ensure_future(server.evict_idle(0.01))
+        await asyncio.sleep(0.1)
+        evictor.cancel()
+        return response['result']['game']
+    server.idleTimeout = 0.0
+    assert asyncio.run(evict()) not in server.games and server.evicted == 1
+
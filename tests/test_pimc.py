@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import rankcount
+from helpers import rank_counts, random_hand
+from pimc import PimcEngine
+from poker import PokerPlayer, Deck
+
+
+class RecordingTablebase:
+    """
+    总是由终局库决定出牌的替身，出第一种可能的牌，记录被查询的次数
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def decide(self, player, opponentAction):
+        self.calls += 1
+        for kind in player.curNode.possibleStep:
+            if player.curNode.possibleStep[kind]:
+                return True, (kind, player.curNode.possibleStep[kind][0])
+        return True, None
+
+
+def test_tablebase_not_consulted():
+    """
+    终局库需要对手的手牌，PIMC引擎不查询终局库，每个回合都由引擎出牌并记录对手出的牌
+    """
+    orders = random_hand(11, 20)
+    me, opponent = PokerPlayer(), PokerPlayer()
+    me.deal_order(orders[:10])
+    opponent.deal_order(orders[10:])
+    me.opponent, opponent.opponent = opponent, me
+    engine = PimcEngine(sampleCnt=4, timeLimit=0.05, seed=0)
+    me.engine = engine
+    tablebase = RecordingTablebase()
+    me.tablebase = tablebase
+    action = None
+    for _ in range(3):
+        action = opponent.gaming(action)
+        if not len(opponent.curNode):
+            break
+        action = me.gaming(action)
+    played = tuple(a - b for a, b in zip(opponent.initNode.get_rank_cnt(), opponent.curNode.get_rank_cnt()))
+    assert any(played) and engine._PimcEngine__oppPlayed == played
+    assert tablebase.calls == 0 and engine.samples > 0
+
+
+def test_finds_forced_win():
+    """
+    对手只有一张不超过A的牌，先出2再出3必胜，先出3必败
+    """
+    myCounts = rank_counts([1, 49])
+    pool = (0,) + (4,) * 11 + (0, 0)
+    engine = PimcEngine(sampleCnt=20, timeLimit=10.0, seed=0)
+    move = engine.search(myCounts, pool, 1)
+    assert (move.kind, move.lead) == ('single', 12)
+    assert engine.winRate == 1.0 and engine.samples == 20
+
+
+def test_pool_matches_serial():
+    """
+    种子相同且没有超时时，进程池中的搜索与在当前进程中的搜索结果和样本数量相同
+    """
+    orders = random_hand(7, 20)
+    myCounts = rank_counts(orders[:10])
+    pool = tuple(cap - cnt for cap, cnt in zip(Deck().caps, myCounts))
+    serial = PimcEngine(sampleCnt=30, timeLimit=60.0, workers=0, seed=7)
+    pooled = PimcEngine(sampleCnt=30, timeLimit=60.0, workers=3, seed=7)
+    try:
+        for last in (None, rankcount.legal_moves(rank_counts([1]))[0]): # 自由出牌和压过一张3
+            assert serial.search(myCounts, pool, 10, last) == pooled.search(myCounts, pool, 10, last)
+            assert serial.samples == pooled.samples == 30
+            assert serial.winRate == pooled.winRate
+    finally:
+        pooled.close()
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_time_limit(workers):
+    """
+    样本数量很大时在时间上限处停止，返回已经完成的样本的结果
+    """
+    orders = random_hand(5, 30)
+    myCounts = rank_counts(orders[:15])
+    pool = tuple(cap - cnt for cap, cnt in zip(Deck().caps, myCounts))
+    engine = PimcEngine(sampleCnt=10 ** 7, timeLimit=0.3, workers=workers, seed=0)
+    try:
+        begin = time.time()
+        move = engine.search(myCounts, pool, 15)
+        elapsed = time.time() - begin
+    finally:
+        engine.close()
+    assert move is not None and 0 < engine.samples < engine.sampleCnt
+    assert elapsed < 0.3 + 1.0
@@ -0,0 +1,42 @@
+import cardmask
+from helpers import random_hand
+from process import Process
+
+
+def test_specified_deal_keeps_second_deck():
+    """
+    两副牌时指定发牌保留第几副牌，出牌中每张牌恰好出现一次
+    """
+    process = Process()
+    process.specified_deal([9, 10, 11, 12, 63, 1])
+    step, path = process.solve_without_score()
+    assert sorted(order for action in path for order in action) == [1, 9, 10, 11, 12, 63]
+    assert step == len(path) == 2
+
+
+def test_streamed_steps_match_solve():
+    """
+    生成器逐步产生的出牌与一次求解的结果相同，掩码与扑克牌顺序一一对应
+    """
+    process = Process()
+    orders = random_hand(4, 15)
+    process.specified_deal(orders)
+    step, path = process.solve_without_score()
+    process.specified_deal(orders)
+    masks = list(process.iter_solve_without_score(mask=True))
+    assert [cardmask.from_orders(action) for action in path] == masks
+    assert sorted(order for mask in masks for order in cardmask.to_orders(mask)) == sorted(orders)
+    assert step == len(masks) == process.problem.step
+
+
+def test_gaming_alternates_players():
+    process = Process()
+    process.deal_player1(10)
+    process.deal_player2(10)
+    hands = {1: process.player1.get_init_order(), 2: process.player2.get_init_order()}
+    played = {1: [], 2: []}
+    for idx, (player, action) in enumerate(process.iter_gaming()):
+        assert player == idx % 2 + 1
+        played[player] += action
+    assert process.winner in (1, 2)
+    assert sorted(played[process.winner]) == sorted(hands[process.winner])
@@ -0,0 +1,43 @@
+import os
+
+from process import Process
+from profiler import SolveProfiler
+
+
+def test_same_tag_does_not_overwrite(tmp_path):
+    """
+    相同的手牌求解两次得到两份报告
+    """
+    profiler = SolveProfiler(cpu=True, memory=False, outputDir=str(tmp_path))
+    for _ in range(2):
+        with profiler.profile('solve-00000000000001'):
+            sum(range(100))
+    assert sorted(os.listdir(tmp_path)) == ['solve-00000000000001-1.pstats', 'solve-00000000000001-1.txt',
+                                            'solve-00000000000001-2.pstats', 'solve-00000000000001-2.txt']
+
+
+def test_sample_rate(tmp_path):
+    """
+    只分析每第sampleRate次求解
+    """
+    profiler = SolveProfiler(cpu=True, memory=False, sampleRate=2, outputDir=str(tmp_path))
+    for _ in range(3):
+        with profiler.profile('solve'):
+            pass
+    assert sorted(os.listdir(tmp_path)) == ['solve-1.pstats', 'solve-1.txt', 'solve-3.pstats', 'solve-3.txt']
+
+
+def test_gaming_profiles_each_move(tmp_path):
+    """
+    对战时每次出牌一份报告，产生出牌时报告已经写完，调用方处理出牌的时间不计入报告
+    """
+    process = Process()
+    process.profiler = SolveProfiler(cpu=True, memory=False, outputDir=str(tmp_path))
+    process.deal_player1(5)
+    process.deal_player2(5)
+    moves = 0
+    for _ in process.iter_gaming():
+        moves += 1
+        reports = [name for name in os.listdir(tmp_path) if name.endswith('.pstats')]
+        assert len(reports) == moves
+    assert all(name.startswith(('gaming1-', 'gaming2-')) for name in reports)
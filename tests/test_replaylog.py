@@ -0,0 +1,66 @@
+import math
+
+from replaylog import ReplayReader, ReplayWriter, GAME, SOLVE, FOOTER, OFFSET, _load_index, _scan_offsets
+from simulator import play_game
+
+
+def write_games(path, seeds):
+    records = [play_game(seed, 10, 10, recordPlays=True) for seed in seeds]
+    with ReplayWriter(path) as writer:
+        for record in records:
+            writer.append_game(record)
+    return records
+
+
+def assert_same_game(replay, record):
+    assert replay.kind == GAME
+    assert (replay.seed, replay.winner, replay.plies) == (record.seed, record.winner, len(record.plays))
+    assert [list(hand) for hand in replay.hands] == [list(hand) for hand in record.hands]
+    assert [list(play) for play in replay.plays] == [list(play) for play in record.plays]
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / 'games.rpl')
+    records = write_games(path, range(5))
+    with ReplayWriter(path) as writer: # 再次打开时去掉索引继续追加
+        writer.append_solve([1, 2, 3], [[1], [2, 3]], 4.0, 0.5)
+    with ReplayReader(path) as reader:
+        assert len(reader) == 6
+        for replay, record in zip(reader, records):
+            assert_same_game(replay, record)
+        assert_same_game(reader[-2], records[-1])
+        solve = reader[5]
+        assert solve.kind == SOLVE and solve.score == 4.0 and solve.player2Cnt == 0
+        assert [list(play) for play in solve.plays] == [[1], [2, 3]]
+        assert [header.seed for header in reader.headers()][:5] == list(range(5))
+
+
+def test_unclosed_file_drops_partial_record(tmp_path):
+    """
+    没有正常关闭的文件没有索引，读取时重新扫描并丢弃最后不完整的记录
+    """
+    path = tmp_path / 'games.rpl'
+    records = write_games(str(path), range(3))
+    data = path.read_bytes()
+    path.write_bytes(data[:-FOOTER.size - 3 * 8 - 1]) # 去掉索引和最后一条记录的一个字节
+    with ReplayReader(str(path)) as reader:
+        assert len(reader) == 2
+        assert_same_game(reader[1], records[1])
+        assert math.isnan(reader.header(0).score)
+    with ReplayWriter(str(path)) as writer:
+        writer.append_game(records[2])
+    with ReplayReader(str(path)) as reader:
+        assert len(reader) == 3
+        assert_same_game(reader[2], records[2])
+
+
+def test_index_matches_scan(tmp_path):
+    """
+    从索引读取的记录位置与逐条扫描的结果相同
+    """
+    path = tmp_path / 'games.rpl'
+    write_games(str(path), range(4))
+    data = path.read_bytes()
+    offsets, end = _load_index(str(path))
+    assert (offsets, end) == _scan_offsets(data[:-FOOTER.size - 4 * OFFSET.size])
+    assert end == len(data) - FOOTER.size - 4 * OFFSET.size
@@ -0,0 +1,48 @@
+import pytest
+
+import rankcount
+from helpers import random_hand
+from poker import PokerPlayer, Deck
+
+
+def deal(orders, decks=1):
+    player = PokerPlayer(Deck(decks))
+    player.deal_order(orders)
+    return player.initNode
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_find_response_matches_linear_scan(decks):
+    """
+    二分查找的结果与在所有出牌中线性查找相同：同类型时是能压过的最小出牌，否则是炸弹或火箭，没有时为None
+    """
+    for seed in range(30):
+        orders = random_hand(seed, 34, decks)
+        node = deal(orders[:17], decks)
+        counts = node.get_rank_cnt()
+        opponent = deal(orders[17:], decks)
+        for kind, actionLst in opponent.possibleStep.items():
+            for action in actionLst:
+                last = rankcount.from_action(kind, action)
+                response = node.find_response(kind, action)
+                beating = rankcount.responses(counts, last)
+                if response is None:
+                    assert not beating
+                    continue
+                move = rankcount.from_action(*response)
+                assert rankcount.beats(move, last)
+                assert all(move.cards[rank] <= counts[rank] for rank in range(rankcount.RANK_CNT))
+                sameKind = [other.lead for other in beating if (other.kind, other.length) == (last.kind, last.length)]
+                if sameKind:
+                    assert (move.kind, move.lead) == (last.kind, min(sameKind))
+
+
+def test_rocket_answers_bigger_four():
+    """
+    自己的炸弹压不过对手的炸弹时使用火箭，火箭不能被压过
+    """
+    node = deal([1, 2, 3, 4, 53, 54])
+    opponent = deal([5, 6, 7, 8, 9])
+    rocket = node.find_response('four', opponent.possibleStep['four'][0])
+    assert rocket[0] == 'rocket'
+    assert opponent.find_response(*rocket) is None
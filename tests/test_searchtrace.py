@@ -0,0 +1,63 @@
+import io
+import json
+import time
+
+from helpers import random_hand
+from poker import PokerPlayer
+from searchtrace import SearchTracer, print_heat_map, summarize
+
+
+def traced_solve(tracer, seed=0, cards=12):
+    player = PokerPlayer()
+    player.deal_order(random_hand(seed, cards))
+    player.tracer = tracer
+    player.solve_without_score()
+    return player
+
+
+def read_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_a_star_search(tmp_path):
+    path = str(tmp_path / 'trace.ndjson')
+    with SearchTracer(path) as tracer:
+        player = traced_solve(tracer)
+    events = read_events(path)
+    goals = [item for item in events if item['ev'] == 'goal']
+    assert goals and goals[0]['n'] == 0 and goals[0]['g'] == player.step
+    assert all('f' in item for item in events)
+    depths, columns, counter = summarize(path)
+    assert 'expand' in columns and sum(counter.values()) == len(events)
+    out = io.StringIO()
+    print_heat_map(path, out=out)
+    assert 'expand' in out.getvalue()
+
+
+def test_ring_keeps_last_events(tmp_path):
+    """
+    环形缓冲只在关闭时写出最后ringSize个事件
+    """
+    fullPath = str(tmp_path / 'full.ndjson')
+    ringPath = str(tmp_path / 'ring.ndjson')
+    with SearchTracer(fullPath) as tracer:
+        traced_solve(tracer)
+    tracer = SearchTracer(ringPath, ringSize=5)
+    traced_solve(tracer)
+    tracer.close()
+    strip = lambda items: [{k: v for k, v in item.items() if k != 't'} for item in items]
+    assert strip(read_events(ringPath)) == strip(read_events(fullPath)[-5:])
+
+
+def test_rate_limit_drops_events(tmp_path):
+    """
+    令牌桶开始时有maxRate个令牌，之后每秒补充maxRate个
+    """
+    path = str(tmp_path / 'trace.ndjson')
+    begin = time.perf_counter()
+    with SearchTracer(path, maxRate=3) as tracer:
+        traced_solve(tracer)
+    elapsed = time.perf_counter() - begin
+    assert tracer.dropped > 0
+    assert len(read_events(path)) <= 3 + 3 * elapsed
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from service import SolveService
+
+
+@pytest.fixture
+def service():
+    service = SolveService(workers=1)
+    yield service
+    service.executor.shutdown()
+
+
+def run(service, *requests):
+    async def handle_all():
+        return await asyncio.gather(*(service.handle(request) for request in requests))
+    return asyncio.run(handle_all())
+
+
+def test_same_hand_solved_once(service):
+    """
+    相同规范化手牌的请求只求解一次，结果映射回各自的实际手牌
+    """
+    first, second = run(service, {'op': 'solve_without_score', 'cards': [1, 2, 5]},
+                        {'op': 'solve_without_score', 'cards': [3, 4, 6]})
+    assert first['ok'] and second['ok'] and service.solves == 1
+    assert second['timing']['coalesced']
+    assert sorted(order for action in second['result']['path'] for order in action) == [3, 4, 6]
+    third, = run(service, {'op': 'solve_without_score', 'cards': [1, 2, 5]})
+    assert third['timing']['cached'] and service.solves == 1
+
+
+def test_two_deck_cards_not_duplicated(service):
+    response, = run(service, {'op': 'solve_without_score', 'cards': [9, 10, 11, 12, 63, 1]})
+    assert sorted(order for action in response['result']['path'] for order in action) == [1, 9, 10, 11, 12, 63]
+
+
+@pytest.mark.parametrize('engine', ['alphabeta', 'pimc'])
+def test_nondeterministic_engines_not_shared(service, engine):
+    """
+    有时间上限或者随机的决策引擎的对战每次单独求解，不缓存也不合并
+    """
+    request = {'op': 'gaming', 'player1': [1, 5, 9], 'player2': [2, 6, 10], 'engine1': engine, 'time': 0.01}
+    responses = run(service, request, dict(request))
+    assert all(response['ok'] for response in responses)
+    assert not any(response['timing']['coalesced'] or response['timing']['cached'] for response in responses)
+    assert service.solves == 2 and not service.cache
+
+
+def test_bad_request(service):
+    response, = run(service, {'op': 'solve_without_score', 'cards': [1, 1]})
+    assert not response['ok']
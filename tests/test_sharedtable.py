@@ -0,0 +1,73 @@
+import pickle
+from multiprocessing import Pool
+
+import pytest
+
+from endgame import AlphaBetaEngine
+from helpers import rank_counts, random_hand
+from sharedtable import SharedTable, NO_MOVE, attach, pack_entry, unpack_entry
+
+
+@pytest.mark.parametrize('entry', [(0, 0, 0, 0), (1024, -10000, 2, NO_MOVE), (65535, 32767, 15, 123)])
+def test_entry_round_trip(entry):
+    assert unpack_entry(pack_entry(*entry)) == entry
+
+
+def test_probe_and_store():
+    with SharedTable(4) as table:
+        assert table.probe(0) is None
+        table.store(0, 3, 5, 1, 7) # 键为0的条目与空槽位不同
+        assert table.probe(0) == (3, 5, 1, 7)
+        table.store(4, 1, -5, 2) # 同一个桶中深度较小的条目写入总是替换的槽位
+        assert table.probe(0) == (3, 5, 1, 7)
+        assert table.probe(4) == (1, -5, 2, NO_MOVE)
+        table.store(8, 9, 0, 0) # 深度更大时替换深度优先的槽位，原来的条目移到总是替换的槽位
+        assert table.probe(8) == (9, 0, 0, NO_MOVE)
+        assert table.probe(0) == (3, 5, 1, 7)
+        assert table.probe(4) is None
+        table.store(8, 10, 1, 1, 2) # 同一个局面的条目直接更新
+        assert table.probe(8) == (10, 1, 1, 2)
+        assert table.probe(0) == (3, 5, 1, 7)
+        table.clear()
+        assert table.usage() == 0
+
+
+def test_out_of_range_fields():
+    with pytest.raises(ValueError):
+        pack_entry(0, 40000, 0, 0)
+    with pytest.raises(ValueError):
+        pack_entry(0, 0, 0, NO_MOVE + 1)
+    with SharedTable(4) as table:
+        table.store(1, 1 << 20, 0, 0, 1 << 20) # 深度按上限保存，出牌编号超出范围时不保存出牌
+        assert table.probe(1) == (0xFFFF, 0, 0, NO_MOVE)
+
+
+def store_entry(table):
+    table.store(12345, 2, 1, 0, 3)
+
+
+def test_pickle_attaches_same_memory():
+    """
+    解除pickle时打开同一块共享内存，工作进程写入的条目当前进程可以读到
+    """
+    with SharedTable(8) as table:
+        assert pickle.loads(pickle.dumps(table)) is table # 同一进程中只打开一次
+        assert attach(table.name, 8) is table
+        with Pool(1) as pool:
+            pool.apply(store_entry, (table,))
+        assert table.probe(12345) == (2, 1, 0, 3)
+
+
+def test_engines_share_results():
+    """
+    第二个引擎从共享表中得到第一个引擎的结果，搜索的节点数减少
+    """
+    orders = random_hand(3, 10)
+    myCounts, oppCounts = rank_counts(orders[:5]), rank_counts(orders[5:])
+    with SharedTable(1 << 12) as table:
+        first = AlphaBetaEngine(timeLimit=5.0, sharedTable=table)
+        move = first.search(myCounts, oppCounts)
+        second = AlphaBetaEngine(timeLimit=5.0, sharedTable=table)
+        assert second.search(myCounts, oppCounts) == move
+        assert first.solved and second.solved
+        assert second.nodes < first.nodes
@@ -0,0 +1,47 @@
+import statistics
+
+import pytest
+
+from simulator import SimulationStats, deal_game, play_game, simulate, parse_cnt
+
+
+@pytest.mark.parametrize('decks', [1, 2])
+def test_deal_game_is_reproducible(decks):
+    hand1, hand2 = deal_game(5, (10, 20), 17, decks)
+    assert (hand1, hand2) == deal_game(5, (10, 20), 17, decks)
+    assert 10 <= len(hand1) <= 20 and len(hand2) == 17
+    assert not set(hand1) & set(hand2)
+    with pytest.raises(ValueError):
+        deal_game(0, 54 * decks, 1, decks)
+
+
+def test_recorded_plays_empty_winner_hand():
+    """
+    记录的出牌由玩家1开始交替进行，获胜者出的牌恰好是他的全部手牌
+    """
+    for seed in range(10):
+        record = play_game(seed, 12, 12, recordPlays=True)
+        assert record.winner in (1, 2) and record.plies == len(record.plays)
+        played = sorted(order for play in record.plays[record.winner - 1::2] for order in play)
+        assert played == sorted(record.hands[record.winner - 1])
+
+
+def test_pool_matches_serial():
+    """
+    进程池中的结果与在当前进程中执行相同(耗时除外)，平均值和标准差与逐局计算一致
+    """
+    records = []
+    serial = simulate(12, 10, 10, seed=3, workers=0, chunkSize=5, callback=records.append)
+    pooled = simulate(12, 10, 10, seed=3, workers=2, chunkSize=5)
+    for name in ('games', 'wins', 'plyMean', 'plyMax', 'moveCnt'):
+        assert getattr(pooled, name) == pytest.approx(getattr(serial, name))
+    assert sorted(record.seed for record in records) == list(range(3, 15))
+    plies = [record.plies for record in records]
+    assert serial.plyMean == pytest.approx(statistics.mean(plies))
+    assert serial.ply_std() == pytest.approx(statistics.stdev(plies))
+    assert SimulationStats().win_rate(1) == 0.0
+
+
+def test_parse_cnt():
+    assert parse_cnt('17') == 17
+    assert parse_cnt('10-20') == (10, 20)
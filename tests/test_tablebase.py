@@ -0,0 +1,78 @@
+import rankcount
+from endgame import AlphaBetaEngine
+from helpers import rank_counts, random_hand
+from poker import Poker, PokerPlayer, Deck
+from tablebase import Tablebase, HandIndex, WIN, LOSS, UNKNOWN
+
+MAX_CNT = 2
+
+
+def make_tablebase():
+    tablebase = Tablebase(MAX_CNT)
+    tablebase.generate()
+    return tablebase
+
+
+def test_hand_index_round_trip():
+    hands = HandIndex(3)
+    for index in range(hands.size):
+        assert hands.rank(hands.unrank(index)) == index
+
+
+def test_agrees_with_alpha_beta():
+    """
+    必胜的局面中alpha-beta选出的出牌在终局库中也是必胜的，两者都能得到精确的胜负
+    """
+    tablebase = make_tablebase()
+    engine = AlphaBetaEngine(timeLimit=1.0)
+    wins = 0
+    for seed in range(60):
+        orders = random_hand(seed, 2 * MAX_CNT)
+        myCounts = rank_counts(orders[:seed % MAX_CNT + 1])
+        oppCounts = rank_counts(orders[MAX_CNT:])
+        value = tablebase.probe(myCounts, oppCounts)
+        assert value in (WIN, LOSS)
+        move = engine.search(myCounts, oppCounts)
+        if value == WIN:
+            wins += 1
+            myNext = rankcount.apply(myCounts, move)
+            assert not any(myNext) or tablebase.probe(oppCounts, myNext, move) == LOSS
+        else:
+            assert engine.solved or len(rankcount.legal_moves(myCounts)) == 1
+    assert wins
+
+
+def test_save_and_open(tmp_path):
+    tablebase = make_tablebase()
+    path = tmp_path / 'tablebase.bin'
+    tablebase.save(str(path))
+    opened = Tablebase.open(str(path))
+    assert bytes(opened.data) == bytes(tablebase.data)
+    assert opened.probe(rank_counts([1]), rank_counts([5, 9, 13])) == UNKNOWN # 超出K张
+
+
+class AllLoss:
+    """
+    所有局面都是必败的假数据，用于检查查表之前的范围判断
+    """
+    def __getitem__(self, index):
+        return 0xAA
+
+
+def test_bomb_on_table_not_covered():
+    """
+    两副牌时桌上超过四张的炸弹不在终局库的范围内，否则会用四张去压炸弹
+    """
+    tablebase = Tablebase(4, data=AllLoss())
+    bomb = rankcount.from_action('bomb', [Poker(order) for order in (5, 6, 7, 8, 59)])
+    myCounts = rank_counts([1, 2, 3, 4])
+    oppCounts = rank_counts([10])
+    assert tablebase.probe(myCounts, oppCounts, bomb) == UNKNOWN
+    assert tablebase.best_move(myCounts, oppCounts, bomb) == (False, None)
+    player = PokerPlayer(Deck(2))
+    player.deal_order([1, 2, 3, 4])
+    opponent = PokerPlayer(Deck(2))
+    opponent.deal_order([10])
+    player.opponent = opponent
+    player.tablebase = tablebase
+    assert player.gaming(('bomb', [Poker(order) for order in (5, 6, 7, 8, 59)])) is None
@@ -0,0 +1,88 @@
+import os
+import time
+from multiprocessing import Pool
+
+import pytest
+
+import workqueue
+from simulator import SimulationStats
+from workqueue import WorkQueue, PENDING, LEASED, DONE
+
+
+def submit_games(root, count=6, shardSize=2):
+    return workqueue.submit(str(root), 'game', count, shardSize, p1=8, p2=8, engines=['greedy', 'greedy'],
+                            time=0.1, tablebase=None, decks=1)
+
+
+def test_claim_is_exclusive(tmp_path):
+    assert submit_games(tmp_path) == 3
+    queue = WorkQueue(str(tmp_path))
+    leases = [queue.claim('worker%d' % idx) for idx in range(4)]
+    assert leases[3] is None
+    assert sorted(job['seedStart'] for _, job in leases[:3]) == [0, 2, 4]
+    assert queue.status() == {PENDING: 0, LEASED: 3, DONE: 0}
+    queue.complete(leases[0][0], [])
+    assert queue.status() == {PENDING: 0, LEASED: 2, DONE: 1}
+
+
+def test_resubmit_skips_existing_jobs(tmp_path):
+    submit_games(tmp_path)
+    queue = WorkQueue(str(tmp_path))
+    leasePath, _ = queue.claim('worker')
+    submit_games(tmp_path)
+    assert queue.status() == {PENDING: 2, LEASED: 1, DONE: 0}
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    """
+    超过租约时间没有心跳的任务移回pending，原来的进程之后写入的结果仍然有效
+    """
+    submit_games(tmp_path, 2)
+    queue = WorkQueue(str(tmp_path))
+    leasePath, job = queue.claim('slow')
+    assert queue.expire(60) == 0
+    past = time.time() - 120
+    os.utime(leasePath, (past, past))
+    assert queue.expire(60) == 1
+    assert not WorkQueue.heartbeat(leasePath)
+    queue.complete(leasePath, workqueue.run_job(job))
+    newLease, _ = queue.claim('fast')
+    assert queue.has_result(newLease)
+    queue.complete(newLease)
+    assert queue.status() == {PENDING: 0, LEASED: 0, DONE: 1}
+
+
+def test_work_and_merge(tmp_path):
+    """
+    工作进程执行所有任务，合并的结果与直接对战相同(耗时除外)
+    """
+    submit_games(tmp_path)
+    with pytest.raises(RuntimeError):
+        workqueue.merge(str(tmp_path))
+    assert workqueue.work(str(tmp_path), interval=0.1, worker='worker') == 3
+    stats = workqueue.merge(str(tmp_path))
+    expected = SimulationStats()
+    for seed in range(6):
+        expected.add(workqueue.play_game(seed, 8, 8))
+    for name in ('games', 'wins', 'plyMean', 'plyMax', 'moveCnt'):
+        assert getattr(stats, name) == getattr(expected, name)
+
+
+def test_racing_workers(tmp_path):
+    """
+    多个进程同时领取任务，租约时间很短，任务不断过期被其他进程重新领取，最终每个任务恰好完成一次
+    """
+    submit_games(tmp_path, 12, 1)
+    args = [(str(tmp_path), 0.01, 0.01, None, 'worker%d' % idx) for idx in range(4)]
+    with Pool(4) as pool:
+        runs = pool.starmap(workqueue.work, args)
+    assert sum(runs) >= 12
+    queue = WorkQueue(str(tmp_path))
+    assert queue.status() == {PENDING: 0, LEASED: 0, DONE: 12}
+    assert sorted(os.listdir(queue.path(DONE))) == ['job-%06d.json' % idx for idx in range(12)]
+    stats = workqueue.merge(str(tmp_path))
+    expected = SimulationStats()
+    for seed in range(12):
+        expected.add(workqueue.play_game(seed, 8, 8))
+    for name in ('games', 'wins', 'plyMean', 'plyMax', 'moveCnt'):
+        assert getattr(stats, name) == getattr(expected, name)
@@ -0,0 +1,34 @@
+import zobrist
+from helpers import rank_counts, random_hand
+from poker import PokerPlayer
+
+
+def test_incremental_key_matches_full_key():
+    """
+    由父节点增量得到的键与直接由点数计数向量计算的键相同
+    """
+    player = PokerPlayer()
+    player.deal_order(random_hand(3, 17))
+    node = player.initNode
+    while len(node):
+        action = node.possibleStep['single'][0]
+        child = node.get_child(action)
+        assert child.key == node.get_child_key(action) == zobrist.count_key(child.get_rank_cnt())
+        node = child
+    assert node.key == 0
+
+
+def test_equal_hands_hash_equal():
+    orders = random_hand(5, 12)
+    first = PokerPlayer()
+    first.deal_order(orders)
+    second = PokerPlayer()
+    second.deal_order(sorted(orders, reverse=True))
+    assert first.initNode == second.initNode and hash(first.initNode) == hash(second.initNode)
+
+
+def test_play_counts_matches_count_key():
+    counts = rank_counts(random_hand(7, 20, 2))
+    cards = tuple(min(cnt, 1) for cnt in counts)
+    after = tuple(cnt - used for cnt, used in zip(counts, cards))
+    assert zobrist.play_counts(zobrist.count_key(counts), counts, cards) == zobrist.count_key(after)
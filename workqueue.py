@@ -0,0 +1,315 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from functools import partial
+
+from simulator import ENGINES, GameRecord, SimulationStats, parse_cnt, play_game
+
+PENDING, LEASED, DONE, RESULTS = 'pending', 'leased', 'done', 'results' # 共享文件夹下的子文件夹
+SPEC = 'spec.json' # 提交时的参数，合并结果时使用
+LEASE_SEP = '@' # 租约文件名中任务名和工作进程名的分隔符
+
+
+def worker_name():
+    """
+    得到当前工作进程的名称，不同节点上的进程名称不同
+    """
+    return '%s-%d' % (socket.gethostname(), os.getpid())
+
+
+def _write_json(path, data):
+    """
+    先写入临时文件再改名，其他节点不会读到不完整的文件
+    """
+    tmpPath = '%s.%s.tmp' % (path, worker_name())
+    with open(tmpPath, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmpPath, path)
+
+
+class WorkQueue:
+    """
+    基于共享文件夹的任务队列，不需要额外的消息服务，可以在多个节点上同时运行工作进程
+    每个任务是pending中的一个文件，工作进程通过改名将其移入leased来领取，改名是原子操作，只有一个进程能成功
+    领取后定期更新租约文件的修改时间作为心跳，超过租约时间没有心跳的任务由任意进程移回pending重新领取
+    结果文件以任务名命名，过期后重复执行的任务会覆盖之前的结果，每个任务最终只有一个结果
+    贪心出牌的对战和求解任务的结果只由任务参数决定，使用有时间上限的引擎(alphabeta、pimc)时
+    搜索的深度和样本数量取决于机器的速度和负载，重复执行的结果可能与之前不同
+    """
+    def __init__(self, root):
+        """
+        :param root: 共享文件夹，所有节点上的路径相同或者都能访问
+        """
+        self.root = root
+        for sub in (PENDING, LEASED, DONE, RESULTS):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def path(self, sub, name=''):
+        return os.path.join(self.root, sub, name)
+
+    def submit(self, spec, jobs):
+        """
+        提交任务
+        :param spec: 本次提交的参数，写入spec.json
+        :param jobs: 任务参数的列表，第i个任务命名为job-%06d.json
+        """
+        _write_json(os.path.join(self.root, SPEC), spec)
+        existing = {name.split(LEASE_SEP)[0] for sub in (PENDING, LEASED, RESULTS)
+                    for name in os.listdir(self.path(sub))} # 重复提交时跳过已有的任务
+        for idx, job in enumerate(jobs):
+            name = 'job-%06d.json' % idx
+            if name not in existing:
+                _write_json(self.path(PENDING, name), dict(job, id=idx))
+
+    def spec(self):
+        with open(os.path.join(self.root, SPEC)) as f:
+            return json.load(f)
+
+    def claim(self, worker):
+        """
+        领取一个任务
+        :param worker: 工作进程的名称
+        :return:       (租约文件的路径, 任务参数)，没有可领取的任务时为None
+        """
+        for name in sorted(os.listdir(self.path(PENDING))):
+            if not name.endswith('.json'):
+                continue
+            leasePath = self.path(LEASED, name + LEASE_SEP + worker)
+            try:
+                os.rename(self.path(PENDING, name), leasePath)
+            except FileNotFoundError: # 已经被其他进程领取
+                continue
+            try: # 改名保留了原来的修改时间，更新之前可能已经被其他进程当作过期的任务移回
+                os.utime(leasePath)
+                with open(leasePath) as f:
+                    return leasePath, json.load(f)
+            except FileNotFoundError:
+                continue
+        return None
+
+    @staticmethod
+    def heartbeat(leasePath):
+        """
+        更新租约的时间
+        :return: 租约是否仍然有效，过期后被移走时为False
+        """
+        try:
+            os.utime(leasePath)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, leasePath, result=None):
+        """
+        写入结果并结束租约，租约已经过期时仍然写入结果，重新领取该任务的进程会直接结束
+        :param result: 任务的结果，None表示结果已经存在，只结束租约
+        """
+        name = os.path.basename(leasePath).split(LEASE_SEP)[0]
+        if result is not None:
+            _write_json(self.path(RESULTS, name), result)
+        try:
+            os.replace(leasePath, self.path(DONE, name))
+        except FileNotFoundError:
+            pass
+
+    def expire(self, leaseTime):
+        """
+        将超过leaseTime秒没有心跳的任务移回pending，各节点的时钟需要大致同步
+        :return: 移回的任务数
+        """
+        now = time.time()
+        cnt = 0
+        for leaseName in os.listdir(self.path(LEASED)):
+            leasePath = self.path(LEASED, leaseName)
+            try:
+                if now - os.stat(leasePath).st_mtime < leaseTime:
+                    continue
+                os.rename(leasePath, self.path(PENDING, leaseName.split(LEASE_SEP)[0]))
+                cnt += 1
+            except FileNotFoundError: # 刚刚完成或者已经被其他进程移回
+                continue
+        return cnt
+
+    def status(self):
+        """
+        :return: {'pending', 'leased', 'done'}对应的任务数
+        """
+        return {sub: sum(1 for name in os.listdir(self.path(sub)) if '.json' in name and not name.endswith('.tmp'))
+                for sub in (PENDING, LEASED, DONE)}
+
+    def has_result(self, leasePath):
+        return os.path.exists(self.path(RESULTS, os.path.basename(leasePath).split(LEASE_SEP)[0]))
+
+    def results(self):
+        """
+        按任务编号的顺序读取所有结果
+        :return: 生成器，每个任务产生一个结果
+        """
+        for name in sorted(os.listdir(self.path(RESULTS))):
+            if name.endswith('.json'):
+                with open(self.path(RESULTS, name)) as f:
+                    yield json.load(f)
+
+
+def run_job(job):
+    """
+    执行一个任务，使用有时间上限的引擎时结果还与执行时的速度有关
+    'game'任务对战一批种子的对局，结果为GameRecord的列表
+    'solve'任务求解一批种子的手牌，结果为datagen.label_hand的列表
+    """
+    seeds = range(job['seedStart'], job['seedEnd'])
+    if job['kind'] == 'game':
+        engines = [ENGINES[name] and partial(ENGINES[name], timeLimit=job['time']) for name in job['engines']]
+        return [list(play_game(seed, _cnt(job['p1']), _cnt(job['p2']), engines=engines, tablebase=job['tablebase'],
+                               decks=job['decks'])[:7]) for seed in seeds]
+    from datagen import label_hand # datagen依赖numpy，只在求解任务中导入
+    return [label_hand(seed, _cnt(job['cards']), job['withScore']) for seed in seeds]
+
+
+def _cnt(value):
+    """
+    JSON中的手牌数量范围是列表，转回元组
+    """
+    return tuple(value) if isinstance(value, list) else value
+
+
+def work(root, leaseTime=300, interval=30, maxJobs=None, worker=None):
+    """
+    工作进程的主循环：领取任务、执行并定期发送心跳，直到没有可领取的任务
+    :param root:      共享文件夹
+    :param leaseTime: 租约时间(秒)，超过该时间没有心跳的任务会被重新领取
+    :param interval:  心跳的间隔(秒)，应当远小于leaseTime
+    :param maxJobs:   最多执行的任务数，None表示不限
+    :param worker:    工作进程的名称，None时使用主机名和进程号
+    :return:          执行的任务数
+    """
+    queue = WorkQueue(root)
+    worker = worker or worker_name()
+    done = 0
+    while maxJobs is None or done < maxJobs:
+        queue.expire(leaseTime)
+        lease = queue.claim(worker)
+        if lease is None:
+            if not queue.status()[LEASED]:
+                break
+            time.sleep(interval) # 其他进程的任务可能过期，等待之后再检查
+            continue
+        leasePath, job = lease
+        if queue.has_result(leasePath): # 过期之后被重新领取，但之前的进程已经写入了结果
+            queue.complete(leasePath)
+            continue
+        stop = threading.Event()
+        beat = threading.Thread(target=_beat, args=(leasePath, interval, stop), daemon=True)
+        beat.start()
+        try:
+            result = run_job(job)
+        finally:
+            stop.set()
+            beat.join()
+        queue.complete(leasePath, result)
+        done += 1
+    return done
+
+
+def _beat(leasePath, interval, stop):
+    """
+    心跳线程，租约丢失后停止
+    """
+    while not stop.wait(interval):
+        if not WorkQueue.heartbeat(leasePath):
+            break
+
+
+def submit(root, kind, count, shardSize, seed=0, **params):
+    """
+    将count个种子按shardSize切分成任务提交
+    :param kind:   'game'或'solve'
+    :param params: 'game'为p1, p2, engines, time, tablebase, decks；'solve'为cards, withScore
+    """
+    queue = WorkQueue(root)
+    spec = dict(params, kind=kind, count=count, shardSize=shardSize, seed=seed)
+    jobs = [dict(params, kind=kind, seedStart=start, seedEnd=min(start + shardSize, seed + count))
+            for start in range(seed, seed + count, shardSize)]
+    queue.submit(spec, jobs)
+    return len(jobs)
+
+
+def merge(root, output=None):
+    """
+    合并所有结果，'game'得到SimulationStats，'solve'写入datagen格式的分片文件夹
+    :param output: 'solve'结果的输出文件夹，None时为root下的dataset
+    :return:       'game'为SimulationStats，'solve'为datagen.ShardWriter
+    """
+    queue = WorkQueue(root)
+    spec = queue.spec()
+    status = queue.status()
+    if status[PENDING] or status[LEASED]:
+        raise RuntimeError("Unfinished jobs: %s" % status)
+    if spec['kind'] == 'game':
+        stats = SimulationStats()
+        for rows in queue.results():
+            for row in rows:
+                stats.add(GameRecord(*row))
+        return stats
+    from datagen import ShardWriter
+    # 每个任务的结果写成一个分片，再次合并时跳过已经写入的分片
+    writer = ShardWriter(output or os.path.join(root, 'dataset'), spec['count'], _cnt(spec['cards']), spec['seed'],
+                         spec['shardSize'], spec['withScore'])
+    for idx, rows in enumerate(queue.results()):
+        if idx >= len(writer.shards):
+            writer.write(rows)
+    return writer
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='基于共享文件夹的分布式批量求解和对战')
+    sub = parser.add_subparsers(dest='command', required=True)
+    submitParser = sub.add_parser('submit', help='提交任务')
+    submitParser.add_argument('root', help='共享文件夹')
+    submitParser.add_argument('kind', choices=('game', 'solve'))
+    submitParser.add_argument('-n', '--count', type=int, default=10000, help='对局或手牌的数量')
+    submitParser.add_argument('--shard', type=int, default=100, help='每个任务包含的种子数量')
+    submitParser.add_argument('--seed', type=int, default=0, help='第一个种子')
+    submitParser.add_argument('--p1', type=parse_cnt, default=17, help='玩家1的手牌数量')
+    submitParser.add_argument('--p2', type=parse_cnt, default=17, help='玩家2的手牌数量')
+    submitParser.add_argument('--engine1', choices=ENGINES, default='greedy', help='玩家1的决策引擎')
+    submitParser.add_argument('--engine2', choices=ENGINES, default='greedy', help='玩家2的决策引擎')
+    submitParser.add_argument('--time', type=float, default=0.1, help='决策引擎每一步的时间上限(秒)')
+    submitParser.add_argument('--tablebase', default=None, help='终局库文件，所有节点上的路径相同')
+    submitParser.add_argument('--decks', type=int, default=1, help='牌的副数')
+    submitParser.add_argument('--cards', type=parse_cnt, default=17, help='求解任务每手牌的数量')
+    submitParser.add_argument('--no-score', action='store_true', help='求解任务不求解第二问')
+    workParser = sub.add_parser('work', help='领取并执行任务，直到没有可领取的任务')
+    workParser.add_argument('root', help='共享文件夹')
+    workParser.add_argument('--lease', type=float, default=300, help='租约时间(秒)')
+    workParser.add_argument('--interval', type=float, default=30, help='心跳间隔(秒)')
+    workParser.add_argument('--max-jobs', type=int, default=None, help='最多执行的任务数')
+    statusParser = sub.add_parser('status', help='查看任务状态')
+    statusParser.add_argument('root', help='共享文件夹')
+    mergeParser = sub.add_parser('merge', help='合并结果')
+    mergeParser.add_argument('root', help='共享文件夹')
+    mergeParser.add_argument('-o', '--output', default=None, help='求解结果的输出文件夹')
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        if args.kind == 'game':
+            params = {'p1': args.p1, 'p2': args.p2, 'engines': [args.engine1, args.engine2], 'time': args.time,
+                      'tablebase': args.tablebase, 'decks': args.decks}
+        else:
+            params = {'cards': args.cards, 'withScore': not args.no_score}
+        print('%d jobs submitted' % submit(args.root, args.kind, args.count, args.shard, args.seed, **params))
+    elif args.command == 'work':
+        begin = time.perf_counter()
+        jobCnt = work(args.root, args.lease, args.interval, args.max_jobs)
+        print('%d jobs, %.2fs' % (jobCnt, time.perf_counter() - begin))
+    elif args.command == 'status':
+        print(WorkQueue(args.root).status())
+    else:
+        result = merge(args.root, args.output)
+        if isinstance(result, SimulationStats):
+            print(result)
+        else:
+            print('%d rows in %s' % (result.done(), result.directory))
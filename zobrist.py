@@ -0,0 +1,100 @@
+import random
+
+SEED = 0x5EED # 固定的种子，不同进程得到相同的键，可以用于进程间共享的表
+BITS = 64
+MASK = (1 << BITS) - 1
+MAX_ORDER = 108 # 扑克牌顺序的上限，即Deck.SIZE * Deck.MAX_DECKS
+MAX_CNT = 8 # 同一点数的张数上限，即4 * Deck.MAX_DECKS
+RANK_CNT = 14 # 点数的数量，与rankcount.RANK_CNT相同
+
+_random = random.Random(SEED)
+# 每张牌的键，下标为扑克牌顺序，区分花色和第几副牌
+CARD_KEYS = [0] + [_random.getrandbits(BITS) for _ in range(MAX_ORDER)]
+# 每个点数有cnt张时的键，张数为0时为0，所以空手牌的键为0，且新出现的点数不需要特殊处理
+COUNT_KEYS = [[0] + [_random.getrandbits(BITS) for _ in range(MAX_CNT)] for _ in range(RANK_CNT)]
+LEAD_KEYS = [_random.getrandbits(BITS) for _ in range(RANK_CNT + 1)] # 下标为点数下标+1，-1为'big'
+LENGTH_KEYS = [_random.getrandbits(BITS) for _ in range(MAX_ORDER + 1)]
+_kindKeys = {} # 出牌类型的键，由类型名称确定，与字符串的哈希随机化无关
+
+
+def card_key(orders):
+    """
+    区分花色的键：所有牌的键的异或
+    :param orders: 扑克牌顺序序列
+    """
+    key = 0
+    for order in orders:
+        key ^= CARD_KEYS[order]
+    return key
+
+
+def play_cards(key, orders):
+    """
+    出牌之后区分花色的键，只需要异或出的牌，与手牌张数无关
+    """
+    for order in orders:
+        key ^= CARD_KEYS[order]
+    return key
+
+
+def count_key(counts):
+    """
+    与花色无关的键：每个点数的张数对应的键的异或
+    :param counts: 点数计数向量
+    """
+    key = 0
+    for rank, cnt in enumerate(counts):
+        key ^= COUNT_KEYS[rank][cnt]
+    return key
+
+
+def update(key, rank, old, new):
+    """
+    点数下标为rank的张数由old变为new时的键
+    """
+    return key ^ COUNT_KEYS[rank][old] ^ COUNT_KEYS[rank][new]
+
+
+def play_counts(key, counts, cards):
+    """
+    出牌之后与花色无关的键，只更新出牌涉及的点数
+    :param key:    出牌之前的键
+    :param counts: 出牌之前的点数计数向量
+    :param cards:  出的牌的点数计数向量，如rankcount.Move.cards
+    """
+    for rank, used in enumerate(cards):
+        if used:
+            cnt = counts[rank]
+            key ^= COUNT_KEYS[rank][cnt] ^ COUNT_KEYS[rank][cnt - used]
+    return key
+
+
+def rotate(key):
+    """
+    循环左移一位，用于区分局面中双方的手牌
+    异或之后再移位与移位之后再异或相同，所以每一方的键仍然可以单独增量更新
+    """
+    return ((key << 1) | (key >> (BITS - 1))) & MASK
+
+
+def move_key(move):
+    """
+    桌面上的牌的键，应答只由(类型, 点数, 张数)决定，带的牌不同的出牌键相同
+    :param move: rankcount.Move，自由出牌时为None
+    """
+    if move is None:
+        return 0
+    kindKey = _kindKeys.get(move.kind)
+    if kindKey is None:
+        kindKey = _kindKeys[move.kind] = random.Random(move.kind).getrandbits(BITS)
+    return kindKey ^ LEAD_KEYS[move.lead + 1] ^ LENGTH_KEYS[move.length]
+
+
+def position_key(myKey, oppKey, last=None):
+    """
+    1v1局面的键
+    :param myKey:  出牌方手牌与花色无关的键
+    :param oppKey: 对手手牌与花色无关的键
+    :param last:   需要压过的Move，自由出牌时为None
+    """
+    return myKey ^ rotate(oppKey) ^ move_key(last)